@@ -0,0 +1,72 @@
+##
+## Copyright (c) 2016-2019 Genomics England Ltd.
+##
+## This file is part of PanelApp
+## (see https://panelapp.genomicsengland.co.uk).
+##
+## Licensed to the Apache Software Foundation (ASF) under one
+## or more contributor license agreements.  See the NOTICE file
+## distributed with this work for additional information
+## regarding copyright ownership.  The ASF licenses this file
+## to you under the Apache License, Version 2.0 (the
+## "License"); you may not use this file except in compliance
+## with the License.  You may obtain a copy of the License at
+##
+##   http://www.apache.org/licenses/LICENSE-2.0
+##
+## Unless required by applicable law or agreed to in writing,
+## software distributed under the License is distributed on an
+## "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+## KIND, either express or implied.  See the License for the
+## specific language governing permissions and limitations
+## under the License.
+##
+from hashlib import sha1
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+class PanelResponseCache:
+    """Rendered panel API responses shared between the workers.
+
+    Keys contain the panel version, status and the time the active version was
+    last modified, so incrementing the version, changing the status of the
+    panel or changes which don't increment the version, like tags, make the old
+    responses unreachable, they expire with the cache timeout. The backend is
+    configured via `settings.API_CACHE` alias, it can point to any Django cache
+    backend (local memory, file based or Redis).
+    """
+
+    prefix = "api:v1:panel"
+
+    @property
+    def cache(self):
+        return caches[settings.API_CACHE]
+
+    def make_key(self, panel_id, version, status, modified, query_params):
+        variant = "&".join(
+            "{}={}".format(param, ",".join(sorted(query_params.getlist(param))))
+            for param in sorted(query_params)
+        )
+        return "{}:{}:{}:{}:{}:{}".format(
+            self.prefix,
+            panel_id,
+            version,
+            status,
+            modified.timestamp(),
+            sha1(variant.encode("utf-8")).hexdigest(),
+        )
+
+    @staticmethod
+    def get_etag(key):
+        return '"{}"'.format(sha1(key.encode("utf-8")).hexdigest())
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def set(self, key, content):
+        self.cache.set(key, content)
+
+
+panel_response_cache = PanelResponseCache()
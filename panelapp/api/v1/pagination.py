@@ -0,0 +1,214 @@
+##
+## Copyright (c) 2016-2019 Genomics England Ltd.
+##
+## This file is part of PanelApp
+## (see https://panelapp.genomicsengland.co.uk).
+##
+## Licensed to the Apache Software Foundation (ASF) under one
+## or more contributor license agreements.  See the NOTICE file
+## distributed with this work for additional information
+## regarding copyright ownership.  The ASF licenses this file
+## to you under the Apache License, Version 2.0 (the
+## "License"); you may not use this file except in compliance
+## with the License.  You may obtain a copy of the License at
+##
+##   http://www.apache.org/licenses/LICENSE-2.0
+##
+## Unless required by applicable law or agreed to in writing,
+## software distributed under the License is distributed on an
+## "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+## KIND, either express or implied.  See the License for the
+## specific language governing permissions and limitations
+## under the License.
+##
+import json
+from base64 import b64decode
+from base64 import urlsafe_b64encode
+from collections import OrderedDict
+
+from django.db.models import Q
+from rest_framework.compat import coreapi
+from rest_framework.compat import coreschema
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(PageNumberPagination):
+    """Page number pagination, with keyset pagination when `cursor` is passed
+
+    Keyset pages are selected with a filter on the view `cursor_ordering`
+    fields instead of an OFFSET, so deep pages are as fast as the first one.
+    The ordering fields must be non null and unique together. The total
+    count is only calculated for keyset pages when `count=true` is passed.
+    """
+
+    cursor_query_param = "cursor"
+    cursor_query_description = (
+        "Keyset pagination cursor, empty for the first page. "
+        "Use `next` and `previous` links for the other pages."
+    )
+    count_query_param = "count"
+    count_query_description = "Include total count with keyset pagination."
+    invalid_cursor_message = "Invalid cursor"
+
+    ordering = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.cursor_query_param not in request.query_params:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.ordering = view.cursor_ordering
+        page_size = self.get_page_size(request)
+        position, self.reverse = self.decode_cursor(request)
+
+        self.count = None
+        if request.query_params.get(self.count_query_param) == "true":
+            self.count = queryset.count()
+
+        ordering = self.ordering
+        if self.reverse:
+            ordering = [self.reverse_field(field) for field in ordering]
+
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self.get_keyset_filter(ordering, position))
+
+        results = list(queryset[: page_size + 1])
+        has_more = len(results) > page_size
+        results = results[:page_size]
+        if self.reverse:
+            results.reverse()
+
+        self.has_next = position is not None if self.reverse else has_more
+        self.has_previous = has_more if self.reverse else position is not None
+        self.results = results
+        return results
+
+    def get_paginated_response(self, data):
+        if self.ordering is None:
+            return super().get_paginated_response(data)
+
+        return Response(
+            OrderedDict(
+                [
+                    ("count", self.count),
+                    ("next", self.get_next_link()),
+                    ("previous", self.get_previous_link()),
+                    ("results", data),
+                ]
+            )
+        )
+
+    def get_next_link(self):
+        if self.ordering is None:
+            return super().get_next_link()
+
+        if not self.has_next or not self.results:
+            return None
+        return self.encode_cursor(self.get_position(self.results[-1]), False)
+
+    def get_previous_link(self):
+        if self.ordering is None:
+            return super().get_previous_link()
+
+        if not self.has_previous or not self.results:
+            return None
+        return self.encode_cursor(self.get_position(self.results[0]), True)
+
+    def get_schema_fields(self, view):
+        fields = super().get_schema_fields(view)
+        return fields + [
+            coreapi.Field(
+                name=self.cursor_query_param,
+                required=False,
+                location="query",
+                schema=coreschema.String(
+                    title="Cursor", description=self.cursor_query_description
+                ),
+            ),
+            coreapi.Field(
+                name=self.count_query_param,
+                required=False,
+                location="query",
+                schema=coreschema.Boolean(
+                    title="Count", description=self.count_query_description
+                ),
+            ),
+        ]
+
+    @staticmethod
+    def reverse_field(field):
+        return field[1:] if field.startswith("-") else "-" + field
+
+    @staticmethod
+    def get_keyset_filter(ordering, position):
+        """Filter rows after `position`
+
+        Row comparison `(a, b) > (x, y)` is expanded to
+        `a >= x AND (a > x OR (a = x AND b > y))`, the first condition lets
+        the database use an index on the ordering fields.
+
+        :param ordering: ordering fields, prefixed with `-` if descending
+        :param position: values of the ordering fields of the last row
+        :return: Q object
+        """
+
+        keyset_filter = None
+        for field, value in reversed(list(zip(ordering, position))):
+            name = field.lstrip("-")
+            lookup = "{}__{}".format(name, "lt" if field.startswith("-") else "gt")
+            if keyset_filter is None:
+                keyset_filter = Q(**{lookup: value})
+            else:
+                keyset_filter = Q(**{lookup: value}) | (
+                    Q(**{name: value}) & keyset_filter
+                )
+
+        field = ordering[0]
+        lookup = "{}__{}".format(
+            field.lstrip("-"), "lte" if field.startswith("-") else "gte"
+        )
+        return Q(**{lookup: position[0]}) & keyset_filter
+
+    def get_position(self, item):
+        fields = [field.lstrip("-") for field in self.ordering]
+        if isinstance(item, dict):
+            return [item[field] for field in fields]
+        return [getattr(item, field) for field in fields]
+
+    def encode_cursor(self, position, reverse):
+        cursor = json.dumps({"p": position, "r": reverse}, default=str)
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.page_query_param)
+        return replace_query_param(
+            url,
+            self.cursor_query_param,
+            urlsafe_b64encode(cursor.encode("utf-8")).decode("ascii"),
+        )
+
+    def decode_cursor(self, request):
+        """Get position and direction from the request cursor
+
+        :param request: request
+        :return: tuple of position (None for the first page) and reverse flag
+        """
+
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+
+        try:
+            cursor = json.loads(b64decode(encoded, altchars=b"-_").decode("utf-8"))
+            position = cursor["p"]
+            reverse = bool(cursor["r"])
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        return position, reverse
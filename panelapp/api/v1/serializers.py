@@ -29,6 +29,7 @@ from panels.models import Region
 from panels.models import Activity
 from panels.models import Evaluation
 from panels.models import PanelType
+from panels.genomic_intervals import genomic_intervals
 
 
 class NonEmptyItemsListField(serializers.ListField):
@@ -340,3 +341,71 @@ class EntitiesListSerializer(serializers.ListSerializer):
 class EntitySerializer(serializers.BaseSerializer):
     class Meta:
         list_serializer_class = EntitiesListSerializer
+
+
+class GeneResolveSerializer(serializers.Serializer):
+    identifiers = serializers.ListField(
+        child=serializers.CharField(max_length=255),
+        min_length=1,
+        max_length=50000,
+        help_text="Gene symbols, previous symbols, aliases or HGNC ids",
+    )
+
+
+def parse_chromosome(value):
+    """Chromosome name as stored, accepts the chr prefix and any case"""
+
+    chromosome = value.strip().upper()
+    if chromosome.startswith("CHR"):
+        chromosome = chromosome[3:]
+    if chromosome not in dict(Region.CHROMOSOMES):
+        raise serializers.ValidationError("Unknown chromosome {}".format(value))
+    return chromosome
+
+
+class OverlapSerializer(serializers.Serializer):
+    chrom = serializers.CharField(max_length=8)
+    start = serializers.IntegerField(min_value=1)
+    end = serializers.IntegerField(
+        min_value=1, required=False, help_text="Defaults to the start for a variant"
+    )
+    assembly = serializers.ChoiceField(
+        choices=list(genomic_intervals.ASSEMBLIES), default="GRCh38"
+    )
+
+    def validate_chrom(self, value):
+        return parse_chromosome(value)
+
+    def validate(self, data):
+        data.setdefault("end", data["start"])
+        if data["end"] < data["start"]:
+            raise serializers.ValidationError("End is before the start")
+        return data
+
+
+class BatchOverlapSerializer(serializers.Serializer):
+    intervals = serializers.ListField(
+        child=serializers.CharField(max_length=64),
+        min_length=1,
+        max_length=50000,
+        help_text="Intervals as chrom:start-end or variants as chrom:position",
+    )
+    assembly = serializers.ChoiceField(
+        choices=list(genomic_intervals.ASSEMBLIES), default="GRCh38"
+    )
+
+    def validate_intervals(self, value):
+        intervals = []
+        for interval in value:
+            try:
+                chromosome, positions = interval.rsplit(":", 1)
+                start, _, end = positions.replace(",", "").partition("-")
+                start, end = int(start), int(end or start)
+            except ValueError:
+                start, end = 0, 0
+            if start < 1 or end < start:
+                raise serializers.ValidationError(
+                    "Interval {} isn't chrom:start-end".format(interval)
+                )
+            intervals.append((parse_chromosome(chromosome), start, end))
+        return intervals
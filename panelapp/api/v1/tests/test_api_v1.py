@@ -21,15 +21,24 @@
 ## specific language governing permissions and limitations
 ## under the License.
 ##
+from unittest.mock import patch
+from psycopg2.extras import NumericRange
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse_lazy
 from accounts.tests.setup import LoginExternalUser
+from api.v1.pagination import KeysetPagination
+from panels.models import Activity
+from panels.models import EntitySearchEntry
 from panels.models import GenePanel
+from panels.tests.factories import GeneFactory
 from panels.tests.factories import GenePanelSnapshotFactory
 from panels.tests.factories import GenePanelEntrySnapshotFactory
 from panels.tests.factories import STRFactory
 from panels.tests.factories import RegionFactory
 from panels.tests.factories import PanelTypeFactory
+from panels.tests.factories import TagFactory
 
 
 class TestAPIV1(LoginExternalUser):
@@ -187,6 +196,39 @@ class TestAPIV1(LoginExternalUser):
         self.assertEqual(r.status_code, 200)
         self.assertTrue(b"Query Error" not in r.content)
 
+    def test_get_panel_cached(self):
+        url = reverse_lazy("api:v1:panels-detail", args=(self.gps.panel.pk,))
+        r = self.client.get(url)
+        self.assertEqual(r.status_code, 200)
+        etag = r["ETag"]
+        self.assertEqual(r.json()["version"], "0.0")
+
+        r = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code, 304)
+
+        r = self.client.get(url + "?exclude_entities=True", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code, 200)
+        self.assertNotIn("genes", r.json())
+
+        self.gps.increment_version()
+        r = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code, 200)
+        self.assertNotEqual(r["ETag"], etag)
+        self.assertEqual(r.json()["version"], "0.1")
+
+        tag = TagFactory()
+        self.str.update_tags(self.gel_user, [tag])
+        r = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.json()["strs"][0]["tags"], [tag.name])
+
+        etag = r["ETag"]
+        self.gps.panel.status = GenePanel.STATUS.promoted
+        self.gps.panel.save()
+        r = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.json()["status"], GenePanel.STATUS.promoted)
+
     def test_panel_created_timestamp(self):
         self.gpes.panel.increment_version()
         url = reverse_lazy("api:v1:panels-list")
@@ -583,11 +625,90 @@ class TestAPIV1(LoginExternalUser):
         self.assertEqual(r.status_code, 200)
         self.assertEqual(len(r.json()["results"]), 1)
 
+    def test_regions_overlap(self):
+        str_item = STRFactory(
+            panel=self.gps_public,
+            chromosome="Y",
+            position_37=None,
+            position_38=NumericRange(1000, 1100),
+        )
+        region = RegionFactory(
+            panel=self.gps_public,
+            chromosome="Y",
+            position_38=NumericRange(1050, 2050),
+            required_overlap_percentage=50,
+        )
+        RegionFactory(
+            panel__panel__status=GenePanel.STATUS.internal,
+            chromosome="Y",
+            position_38=NumericRange(1000, 3000),
+            required_overlap_percentage=0,
+        )
+
+        url = reverse_lazy("api:v1:regions-overlap")
+        for query, names in (
+            ("?chrom=chrY&start=1100", [str_item.name]),
+            ("?chrom=Y&start=1000&end=1600", [str_item.name, region.name]),
+            ("?chrom=Y&start=1000&end=1500", [str_item.name]),
+            ("?chrom=Y&start=1000&end=1600&assembly=GRCh37", []),
+        ):
+            r = self.client.get(url + query)
+            self.assertEqual(r.status_code, 200)
+            self.assertEqual([e["entity_name"] for e in r.json()["results"]], names)
+
+        r = self.client.get(url + "?chrom=Z&start=1000")
+        self.assertEqual(r.status_code, 400)
+
+        intervals = ["chrY:1100", "Y:1000-1600", "Y:1000-1500", "X:100000"]
+        r = self.client.post(
+            url, {"intervals": intervals}, content_type="application/json"
+        )
+        self.assertEqual(r.status_code, 200)
+        results = r.json()["results"]
+        self.assertEqual(
+            [[e["entity_name"] for e in result["entities"]] for result in results],
+            [[str_item.name], [str_item.name, region.name], [str_item.name], []],
+        )
+        self.assertEqual(
+            results[1]["entities"][1]["panel"]["id"], self.gps_public.panel.pk
+        )
+
+        region.position_38 = NumericRange(1050, 1500)
+        region.save()
+        r = self.client.post(
+            url, {"intervals": ["Y:1000-1500"]}, content_type="application/json"
+        )
+        self.assertEqual(
+            [e["entity_name"] for e in r.json()["results"][0]["entities"]],
+            [str_item.name, region.name],
+        )
+
+        r = self.client.post(
+            url, {"intervals": ["Y:2000-1000"]}, content_type="application/json"
+        )
+        self.assertEqual(r.status_code, 400)
+
     def test_entities_list(self):
         r = self.client.get(reverse_lazy("api:v1:entities-list"))
         self.assertEqual(r.status_code, 200)
         self.assertEqual(len(r.json()["results"]), 9)
 
+    def test_entities_list_payload(self):
+        url = reverse_lazy("api:v1:entities-list")
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+
+        # entities are read from the payloads, more of them need no queries
+        GenePanelEntrySnapshotFactory.create_batch(3, panel=self.gps_public)
+        with CaptureQueriesContext(connection) as more_queries:
+            r = self.client.get(url)
+        self.assertEqual(len(r.json()["results"]), 12)
+        self.assertEqual(len(more_queries), len(queries))
+
+        # entries without a payload are serialized from the entities
+        EntitySearchEntry.objects.update(payload=None)
+        self.assertEqual(self.client.get(url).json()["results"], r.json()["results"])
+
     def test_read_only_list_of_entities(self):
         r = self.client.post(
             reverse_lazy("api:v1:entities-list"), {"something": "something"}
@@ -609,6 +730,108 @@ class TestAPIV1(LoginExternalUser):
         self.assertEqual(r.status_code, 200)
         self.assertEqual(len(r.json()["results"]), 6)
 
+    def test_entities_list_filter_tags(self):
+        tag = TagFactory()
+        self.str.tags.add(tag)
+        url = reverse_lazy("api:v1:entities-list") + "?tags=" + tag.name
+        r = self.client.get(url)
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(
+            [e["entity_name"] for e in r.json()["results"]], [self.str.name]
+        )
+
+    def test_entities_list_cursor(self):
+        url = reverse_lazy("api:v1:entities-list")
+        expected = [e["entity_name"] for e in self.client.get(url).json()["results"]]
+
+        names = []
+        url += "?cursor=&count=true"
+        with patch.object(KeysetPagination, "page_size", 4):
+            while url:
+                r = self.client.get(url)
+                self.assertEqual(r.status_code, 200)
+                self.assertEqual(r.json()["count"], 9)
+                names.extend(e["entity_name"] for e in r.json()["results"])
+                previous, url = r.json()["previous"], r.json()["next"]
+
+            r = self.client.get(previous)
+        self.assertEqual(names, expected)
+        self.assertEqual([e["entity_name"] for e in r.json()["results"]], names[4:8])
+
+    def test_resolve_genes(self):
+        gene = self.gpes.gene_core
+        gene.alias = ["SHARED", "OWN"]
+        gene.previous_symbols = ["OLDSYMBOL"]
+        gene.hgnc_id = "HGNC:1"
+        gene.save()
+        other_gene = GeneFactory(alias=["SHARED"])
+
+        identifiers = [gene.gene_symbol.lower(), "oldsymbol", "OWN", "HGNC:1"]
+        r = self.client.post(
+            reverse_lazy("api:v1:genes-resolve"),
+            {"identifiers": identifiers + ["SHARED", "UNKNOWN"]},
+            content_type="application/json",
+        )
+        self.assertEqual(r.status_code, 200)
+        results = r.json()["results"]
+        self.assertEqual(
+            [result["match_type"] for result in results],
+            ["symbol", "previous_symbol", "alias", "hgnc_id", None, None],
+        )
+        for result in results[:4]:
+            self.assertEqual(result["gene_symbol"], gene.gene_symbol)
+            self.assertEqual(result["gene_data"]["hgnc_id"], "HGNC:1")
+            self.assertEqual(result["previous_symbols"], ["OLDSYMBOL"])
+            self.assertEqual(
+                [panel["id"] for panel in result["panels"]], [self.gps_public.panel.pk]
+            )
+        self.assertEqual(
+            sorted(results[4]["candidates"]),
+            sorted([gene.gene_symbol, other_gene.gene_symbol]),
+        )
+        self.assertIsNone(results[5]["gene_data"])
+        self.assertEqual(
+            results[0]["panels"][0]["confidence_level"],
+            str(self.gpes.saved_gel_status),
+        )
+
+        EntitySearchEntry.objects.update(saved_gel_status=None)
+        r = self.client.post(
+            reverse_lazy("api:v1:genes-resolve"),
+            {"identifiers": identifiers[:1]},
+            content_type="application/json",
+        )
+        self.assertIsNone(r.json()["results"][0]["panels"][0]["confidence_level"])
+
+    def test_genes_search_cursor(self):
+        url = reverse_lazy("api:v1:genes-list") + "?cursor="
+        with patch.object(KeysetPagination, "page_size", 3):
+            r = self.client.get(url)
+            self.assertIsNone(r.json()["count"])
+            self.assertEqual(len(r.json()["results"]), 3)
+            r = self.client.get(r.json()["next"])
+        self.assertEqual(len(r.json()["results"]), 2)
+        self.assertIsNone(r.json()["next"])
+
+    def test_activities_cursor(self):
+        for i in range(5):
+            Activity.objects.create(panel=self.gps.panel, text="activity {}".format(i))
+
+        url = reverse_lazy("api:v1:activities-list")
+        with patch.object(KeysetPagination, "page_size", 2):
+            r = self.client.get(url + "?cursor=")
+            self.assertEqual(
+                [a["text"] for a in r.json()["results"]], ["activity 4", "activity 3"]
+            )
+            self.assertIsNone(r.json()["previous"])
+            r = self.client.get(r.json()["next"])
+            r = self.client.get(r.json()["next"])
+            self.assertEqual([a["text"] for a in r.json()["results"]], ["activity 0"])
+            self.assertIsNone(r.json()["next"])
+
+        r = self.client.get(url + "?cursor=invalid")
+        self.assertEqual(r.status_code, 404)
+
 
 class NonAuthAPIv1Request(TestCase):
     def setUp(self):
@@ -660,6 +883,21 @@ class NonAuthAPIv1Request(TestCase):
         r = self.client.get(url)
         self.assertEqual(r.status_code, 200)
 
+    def test_resolve_genes(self):
+        r = self.client.post(
+            reverse_lazy("api:v1:genes-resolve"),
+            {"identifiers": [self.gpes.gene_core.gene_symbol]},
+            content_type="application/json",
+        )
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.json()["results"][0]["match_type"], "symbol")
+        r = self.client.post(
+            reverse_lazy("api:v1:genes-resolve"),
+            {"identifiers": []},
+            content_type="application/json",
+        )
+        self.assertEqual(r.status_code, 400)
+
     def test_region_search(self):
         url = reverse_lazy("api:v1:regions-detail", args=(self.region.name,))
         r = self.client.get(url)
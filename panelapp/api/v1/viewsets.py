@@ -21,6 +21,8 @@
 ## specific language governing permissions and limitations
 ## under the License.
 ##
+from collections import defaultdict
+from itertools import chain
 from math import ceil
 
 from rest_framework import status, viewsets
@@ -33,10 +35,14 @@ from panels.models import HistoricalSnapshot
 from panels.models import STR
 from panels.models import Region
 from panels.models import Activity
+from panels.models import EntitySearchEntry
+from panels.models import Gene
+from panels.gene_names import gene_names
+from panels.genomic_intervals import genomic_intervals
 from django import forms
 from django.db.models import Q
+from psycopg2.extras import NumericRange
 from django.db.models import ObjectDoesNotExist
-from django.utils.functional import cached_property
 from django_filters import rest_framework as filters
 from .serializers import PanelSerializer
 from .serializers import ActivitySerializer
@@ -45,7 +51,15 @@ from .serializers import STRSerializer
 from .serializers import EvaluationSerializer
 from .serializers import RegionSerializer
 from .serializers import EntitySerializer
+from .serializers import GeneResolveSerializer
+from .serializers import OverlapSerializer
+from .serializers import BatchOverlapSerializer
+from .cache import panel_response_cache
+from .pagination import KeysetPagination
 from django.http import Http404
+from django.http import HttpResponse
+from django.http import HttpResponseNotModified
+from django.utils.http import parse_etags
 from rest_framework.exceptions import APIException
 from panelapp.settings.base import REST_FRAMEWORK
 
@@ -146,6 +160,44 @@ class PanelsViewSet(ReadOnlyListViewset):
 
         raise Http404
 
+    def get_cache_key(self):
+        """Response cache key based on the requested panel version and status"""
+
+        if self.request.accepted_renderer.format != "json":
+            return
+
+        version = self.request.query_params.get("version", None)
+        if version:
+            panel_id = self.kwargs["pk"]
+            id_kwarg = "panel_id" if panel_id.isdigit() else "panel__old_pk"
+            qs = GenePanelSnapshot.objects.get_active(
+                all=True, deleted=True, internal=True
+            ).filter(**{id_kwarg: panel_id})
+        else:
+            qs = GenePanelSnapshot.objects.get_active(name=self.kwargs["pk"])
+
+        panel = (
+            qs.prefetch_related(None)
+            .values(
+                "panel_id",
+                "major_version",
+                "minor_version",
+                "panel__status",
+                "modified",
+            )
+            .first()
+        )
+        if not panel:
+            return
+
+        return panel_response_cache.make_key(
+            panel["panel_id"],
+            version or "{major_version}.{minor_version}".format(**panel),
+            panel["panel__status"],
+            panel["modified"],
+            self.request.query_params,
+        )
+
     def retrieve(self, request, *args, **kwargs):
         """Get individual Panel data
 
@@ -154,6 +206,9 @@ class PanelsViewSet(ReadOnlyListViewset):
         Additional parameters:
 
         ?version=1.1 - get a specific version for this panel
+
+        Responses are cached until the panel version, status or tags change, send
+        `If-None-Match` header with the `ETag` value to check if it's changed.
         """
         version = self.request.query_params.get("version", None)
         if version:
@@ -164,6 +219,33 @@ class PanelsViewSet(ReadOnlyListViewset):
                     detail="Incorrect version supplied", code="incorrect_version"
                 )
 
+        cache_key = self.get_cache_key()
+        if not cache_key:
+            return self.get_panel_response(request, *args, **kwargs)
+
+        etag = panel_response_cache.get_etag(cache_key)
+        if etag in parse_etags(request.META.get("HTTP_IF_NONE_MATCH", "")):
+            response = HttpResponseNotModified()
+            response["ETag"] = etag
+            return response
+
+        content = panel_response_cache.get(cache_key)
+        if content is None:
+            response = self.get_panel_response(request, *args, **kwargs)
+            content = request.accepted_renderer.render(
+                response.data, request.accepted_media_type, self.get_renderer_context()
+            )
+            panel_response_cache.set(cache_key, content)
+
+        response = HttpResponse(content, content_type=request.accepted_media_type)
+        response["ETag"] = etag
+        return response
+
+    def get_panel_response(self, request, *args, **kwargs):
+        version = self.request.query_params.get("version", None)
+        if version:
+            major_version, minor_version = version.split(".")
+
             panel_id = self.kwargs["pk"]
             id_kwarg = 'panel_id' if panel_id.isdigit() else 'panel__old_pk'
             filter_kwargs = {
@@ -213,6 +295,8 @@ class PanelsViewSet(ReadOnlyListViewset):
 class ActivityViewSet(viewsets.mixins.ListModelMixin, viewsets.GenericViewSet):
     permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
     serializer_class = ActivitySerializer
+    pagination_class = KeysetPagination
+    cursor_ordering = ("-created", "-id")
 
     def get_queryset(self):
         if self.request.user.is_authenticated and self.request.user.reviewer.is_GEL():
@@ -440,11 +524,22 @@ class EntitySearchFilter(filters.FilterSet):
         fields = ["type", "tags", "entity_name"]
 
 
+class EntitySearchEntryFilter(filters.FilterSet):
+    type = filters.BaseInFilter(field_name="panel_types", lookup_expr="overlap")
+    tags = filters.BaseInFilter(field_name="tags", lookup_expr="overlap")
+    entity_name = filters.BaseInFilter(field_name="entity_name", lookup_expr="in")
+
+    class Meta:
+        fields = ["type", "tags", "entity_name"]
+
+
 class EntitySearch(ReadOnlyListViewset):
     permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
     lookup_field = "entity_name"
     lookup_url_kwarg = "entity_name"
     filter_class = EntitySearchFilter
+    pagination_class = KeysetPagination
+    cursor_ordering = ("panel_id", "id")
 
     @property
     def active_snapshot_ids(self):
@@ -489,6 +584,12 @@ class GeneSearchViewSet(EntitySearch):
 
     permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
     serializer_class = GeneSerializer
+    match_types = {
+        gene_names.SYMBOL: "symbol",
+        gene_names.PREVIOUS_SYMBOL: "previous_symbol",
+        gene_names.ALIAS: "alias",
+        gene_names.HGNC_ID: "hgnc_id",
+    }
 
     def get_queryset(self):
         filters = {"pks": self.active_snapshot_ids}
@@ -500,6 +601,77 @@ class GeneSearchViewSet(EntitySearch):
     def retrieve(self, request, *args, **kwargs):
         return self.list(request, *args, **kwargs)
 
+    @action(
+        detail=False,
+        methods=["post"],
+        permission_classes=(permissions.AllowAny,),
+        serializer_class=GeneResolveSerializer,
+    )
+    def resolve(self, request):
+        """Resolve gene symbols, previous symbols, aliases and HGNC ids
+
+        Send the list as `{"identifiers": ["BRCA1", "HGNC:1101", ...]}`.
+
+        Results are in the same order, each with the current gene symbol and
+        data, `match_type` (`symbol`, `previous_symbol`, `alias`, `hgnc_id`),
+        the previous symbols of the gene and the public panels with the gene.
+        If the identifier is an alias of more than one gene their symbols are
+        returned in `candidates` instead.
+        """
+
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        identifiers = serializer.validated_data["identifiers"]
+
+        resolved = {}
+        candidates = {}
+        for identifier, matches in gene_names.lookup(set(identifiers)).items():
+            matches = gene_names.best_matches(matches)
+            if len(matches) == 1:
+                resolved[identifier] = (matches[0][0][0], matches[0][1])
+            else:
+                candidates[identifier] = [gene[0] for gene, _ in matches]
+
+        gene_symbols = set(gene_symbol for gene_symbol, _ in resolved.values())
+        genes = {
+            gene.gene_symbol: (gene.dict_tr(), gene.previous_symbols)
+            for gene in Gene.objects.filter(gene_symbol__in=gene_symbols)
+        }
+        panels = defaultdict(list)
+        for gene_symbol, panel_id, name, gel_status in (
+            EntitySearchEntry.objects.get_active()
+            .filter(entity_type="gene", gene_symbol__in=gene_symbols)
+            .order_by("panel__name")
+            .values_list("gene_symbol", "panel_id", "panel__name", "saved_gel_status")
+        ):
+            panels[gene_symbol].append(
+                {
+                    "id": panel_id,
+                    "name": name,
+                    "confidence_level": None
+                    if gel_status is None
+                    else str(gel_status),
+                }
+            )
+
+        results = []
+        for identifier in identifiers:
+            gene_symbol, match_type = resolved.get(identifier, (None, None))
+            gene_data, previous_symbols = genes.get(gene_symbol, (None, []))
+            results.append(
+                {
+                    "identifier": identifier,
+                    "gene_symbol": gene_symbol,
+                    "match_type": self.match_types.get(match_type),
+                    "candidates": candidates.get(identifier, []),
+                    "gene_data": gene_data,
+                    "previous_symbols": previous_symbols,
+                    "panels": panels.get(gene_symbol, []),
+                }
+            )
+
+        return Response({"results": results})
+
 
 class STRSearchViewSet(EntitySearch):
     """Search STRs"""
@@ -530,61 +702,127 @@ class RegionSearchViewSet(EntitySearch):
     def retrieve(self, request, *args, **kwargs):
         return self.list(request, *args, **kwargs)
 
+    @action(
+        detail=False,
+        methods=["get", "post"],
+        permission_classes=(permissions.AllowAny,),
+        serializer_class=BatchOverlapSerializer,
+    )
+    def overlap(self, request):
+        """STRs and regions overlapping an interval or a variant
 
-class EntitySearchViewSet(EntitySearch):
-    """Search Entities"""
-
-    permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
-    serializer_class = EntitySerializer
-    filter_class = EntitySearchFilter
+        `?chrom=X&start=1000&end=2000&assembly=GRCh38`, the end defaults to the
+        start and the assembly to GRCh38. Send many intervals and variants in
+        a POST as `{"intervals": ["X:1000-2000", "1:12345", ...]}`, results
+        are in the same order.
 
-    @cached_property
-    def snapshot_ids(self):
-        if self.request.query_params.get("panel_name"):
-            panel_names = self.request.query_params.get("panel_name").split(",")
-        else:
-            panel_names = None
+        Start and end positions are included. Regions only match if the
+        interval covers their `required_overlap_percentage`. Use `panel_name`
+        to only return the entities in these panels.
+        """
 
-        if panel_names:
-            all_panels = GenePanelSnapshot.objects.get_active_annotated().filter(
-                panel__name__in=panel_names
+        snapshot_ids = self.active_snapshot_ids
+        if request.method == "POST":
+            return self.batch_overlap(request, snapshot_ids)
+
+        serializer = OverlapSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        if not snapshot_ids:
+            return Response({"results": []})
+
+        field = genomic_intervals.ASSEMBLIES[data["assembly"]]
+        # stored ranges don't include the end position, starting the interval
+        # one position earlier also finds the entities ending at the start
+        interval = NumericRange(data["start"] - 1, data["end"], "[]")
+        entities = []
+        for model in (STR, Region):
+            for entity in model.objects.get_active(pks=snapshot_ids).filter(
+                **{"chromosome": data["chrom"], field + "__overlap": interval}
+            ):
+                position = getattr(entity, field)
+                if genomic_intervals.overlaps(
+                    position.lower,
+                    position.upper,
+                    getattr(entity, "required_overlap_percentage", 0) or 0,
+                    data["start"],
+                    data["end"],
+                ):
+                    entities.append(entity)
+
+        entities.sort(key=lambda entity: getattr(entity, field).lower)
+        serializer = EntitySerializer(entities, many=True)
+        return Response({"results": serializer.data})
+
+    def batch_overlap(self, request, snapshot_ids):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        assembly = serializer.validated_data["assembly"]
+        intervals = serializer.validated_data["intervals"]
+
+        snapshot_ids = set(snapshot_ids)
+        matches = [
+            [
+                (entity_type, entity_id, snapshot_id)
+                for entity_type, entity_id, snapshot_id in genomic_intervals.find(
+                    assembly, *interval
+                )
+                if snapshot_id in snapshot_ids
+            ]
+            for interval in intervals
+        ]
+
+        keys = {
+            (entity_type, entity_id)
+            for entity_type, entity_id, _ in chain.from_iterable(matches)
+        }
+        entries = [
+            entry
+            for entry in EntitySearchEntry.objects.filter(
+                snapshot_id__in=snapshot_ids,
+                entity_id__in={entity_id for _, entity_id in keys},
+            ).values("entity_type", "entity_id", "snapshot_id", "payload")
+            if (entry["entity_type"], entry["entity_id"]) in keys
+        ]
+        serialized = EntitySearchEntry.objects.serialize(entries)
+
+        results = []
+        for (chromosome, start, end), entities in zip(intervals, matches):
+            results.append(
+                {
+                    "chrom": chromosome,
+                    "start": start,
+                    "end": end,
+                    "entities": [
+                        serialized[(entity_type, entity_id)]
+                        for entity_type, entity_id, _ in entities
+                        if (entity_type, entity_id) in serialized
+                    ],
+                }
             )
-        else:
-            all_panels = GenePanelSnapshot.objects.get_active_annotated()
 
-        return all_panels.values_list("pk", flat=True)
+        return Response({"results": results})
 
-    def get_queryset(self):
-        filters = {}
 
-        if self.kwargs.get("entity_name"):
-            filters["entity_name__in"] = self.kwargs["entity_name"].split(",")
-        elif self.request.query_params.get("entity_name"):
-            filters["entity_name__in"] = self.request.query_params["entity_name"].split(
-                ","
-            )
-
-        if self.request.query_params.get("type"):
-            filters["panel__panel__types__slug__in"] = self.request.query_params[
-                "type"
-            ].split(",")
+class EntitySearchViewSet(EntitySearch):
+    """Search Entities"""
 
-        if self.request.query_params.get("tags"):
-            filters["tag__name__in"] = self.request.query_params["tags"].split(",")
+    permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
+    serializer_class = EntitySerializer
+    filter_class = EntitySearchEntryFilter
+    cursor_ordering = ("entity_name", "entity_type", "entity_id")
 
-        active_genes = GenePanelEntrySnapshot.objects.get_active_slim(
-            pks=self.snapshot_ids
+    def get_queryset(self):
+        panel_names = self.request.query_params.get("panel_name", "")
+        qs = EntitySearchEntry.objects.get_active(
+            panel_names=panel_names.split(",") if panel_names else None
         )
-        genes = active_genes.filter(**filters)
-
-        active_strs = STR.objects.get_active_slim(pks=self.snapshot_ids)
-        strs = active_strs.filter(**filters)
 
-        active_regions = Region.objects.get_active_slim(pks=self.snapshot_ids)
-        regions = active_regions.filter(**filters)
+        if self.kwargs.get("entity_name"):
+            qs = qs.filter(entity_name__in=self.kwargs["entity_name"].split(","))
 
-        return (
-            strs.union(genes).union(regions).values("entity_name", "entity_type", "pk")
+        return qs.values(
+            "entity_name", "entity_type", "entity_id", "snapshot_id", "payload"
         )
 
     def list(self, request, *args, **kwargs):
@@ -592,21 +830,9 @@ class EntitySearchViewSet(EntitySearch):
 
         page = self.paginate_queryset(queryset)
 
-        genes = GenePanelEntrySnapshot.objects.get_active().filter(
-            pk__in=[e.get("pk") for e in page if e.get("entity_type") == "gene"]
-        )
-        strs = STR.objects.get_active().filter(
-            pk__in=[e.get("pk") for e in page if e.get("entity_type") == "str"]
-        )
-        regions = Region.objects.get_active().filter(
-            pk__in=[e.get("pk") for e in page if e.get("entity_type") == "region"]
-        )
-
-        serializer = self.get_serializer(
-            list(genes) + list(strs) + list(regions), many=True
-        )
+        serialized = EntitySearchEntry.objects.serialize(page)
 
-        return self.get_paginated_response(serializer.data)
+        return self.get_paginated_response(list(serialized.values()))
 
     def retrieve(self, request, *args, **kwargs):
         return self.list(request, *args, **kwargs)
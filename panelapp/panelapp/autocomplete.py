@@ -24,6 +24,7 @@
 from django.db.models import Q
 from dal_select2.views import Select2QuerySetView
 from dal_select2.views import Select2ListView
+from panels.gene_names import gene_names
 from panels.models import Gene
 from panels.models import Evidence
 from panels.models import Tag
@@ -32,15 +33,26 @@ from panels.models import PanelType
 
 
 class GeneAutocomplete(Select2QuerySetView):
-    def get_queryset(self):
-        qs = Gene.objects.filter(active=True)
+    """Active genes from the in-memory gene index
+
+    Each keystroke only reads the index generation from the entities cache,
+    see `panels.cache.GenerationMixin.get_index`.
+    """
 
+    def get_queryset(self):
         if self.q:
-            qs = qs.filter(
-                Q(gene_symbol__istartswith=self.q) | Q(gene_name__istartswith=self.q)
-            )
+            return [gene for gene, _ in gene_names.find(self.q)]
 
-        return qs
+        return gene_names.all()
+
+    def get_result_value(self, result):
+        return result[0]
+
+    def get_result_label(self, result):
+        gene_symbol, hgnc_symbol, gene_name = result
+        return str(
+            Gene(gene_symbol=gene_symbol, hgnc_symbol=hgnc_symbol, gene_name=gene_name)
+        )
 
 
 class SourceAutocomplete(Select2ListView):
@@ -245,9 +245,54 @@ CACHES = {
         "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
         "LOCATION": "pa-cache-1",
         "TIMEOUT": None,
-    }
+    },
+    "api": {
+        "BACKEND": os.getenv(
+            "API_CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.getenv("API_CACHE_LOCATION", "pa-api-cache"),
+        "TIMEOUT": int(os.getenv("API_CACHE_TIMEOUT", 24 * 60 * 60)),
+    },
+    "entities": {
+        "BACKEND": os.getenv(
+            "ENTITIES_CACHE_BACKEND", "django.core.cache.backends.db.DatabaseCache"
+        ),
+        "LOCATION": os.getenv("ENTITIES_CACHE_LOCATION", "panelapp_entities_cache"),
+        "TIMEOUT": int(os.getenv("ENTITIES_CACHE_TIMEOUT", 24 * 60 * 60)),
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
 }
 
+# cache alias for the rendered API responses, see api.v1.cache
+API_CACHE = "api"
+
+# cache alias for the list of entities, see panels.cache. It must be shared
+# between the web and Celery workers, create the default database cache table
+# with `manage.py createcachetable` when deploying, after `migrate`, or point it
+# to memcached or Redis
+ENTITIES_CACHE = "entities"
+# local memory isn't shared, it's only allowed with DEBUG, see panels.checks
+ENTITIES_CACHE_SHARED = CACHES[ENTITIES_CACHE]["BACKEND"] not in (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+# rebuild the list of entities in the background after it's been invalidated
+ENTITIES_CACHE_PREBUILD = os.getenv("ENTITIES_CACHE_PREBUILD", "True") == "True"
+
+# seconds to wait before incrementing a super panel after its child panels have
+# changed, further changes made meanwhile are coalesced into the same increment,
+# see panels.cache.SuperPanelIncrements
+SUPER_PANEL_INCREMENT_COUNTDOWN = int(os.getenv("SUPER_PANEL_INCREMENT_COUNTDOWN", 10))
+
+# file with the prebuilt export of all genes, it's rebuilt in the background
+# after the panels change, see panels.tsv. Leave empty to stream the export from
+# the database. It includes internal panels, so it shouldn't be publicly served
+ALL_GENES_EXPORT_FILE = os.getenv("ALL_GENES_EXPORT_FILE", "")
+
+# store historical snapshots compressed with the gene data saved separately,
+# see panels.models.historical_snapshot
+HISTORICAL_SNAPSHOTS_PACKED = os.getenv("HISTORICAL_SNAPSHOTS_PACKED", "True") == "True"
+
 REST_FRAMEWORK = {
     "PAGE_SIZE": 100,
     "DEFAULT_VERSIONING_CLASS": "rest_framework.versioning.NamespaceVersioning",
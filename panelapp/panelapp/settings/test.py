@@ -22,7 +22,10 @@
 ## under the License.
 ##
 from .base import *  # noqa
+import atexit
 import logging
+import shutil
+import tempfile
 
 logging.disable(logging.CRITICAL)
 
@@ -45,4 +48,16 @@ BROKER_TRANSPORT_OPTIONS = {"socket_timeout": 5}
 CELERY_EAGER_PROPAGATES_EXCEPTIONS = True
 CELERY_BROKER = "pyamqp://localhost:5672/"
 
+# uploaded test files aren't kept in the source tree
+MEDIA_ROOT = tempfile.mkdtemp(prefix="panelapp-test-media-")
+atexit.register(shutil.rmtree, MEDIA_ROOT, True)
+
+ENTITIES_CACHE_PREBUILD = False
+# tests and eager Celery tasks run in one process, local memory is shared
+CACHES["entities"] = {  # noqa
+    "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    "LOCATION": "pa-entities-cache",
+}
+ENTITIES_CACHE_SHARED = True
+
 PASSWORD_HASHERS = ("django.contrib.auth.hashers.MD5PasswordHasher",)
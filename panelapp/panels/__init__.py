@@ -21,3 +21,4 @@
 ## specific language governing permissions and limitations
 ## under the License.
 ##
+default_app_config = "panels.apps.PanelsConfig"
@@ -26,3 +26,6 @@ from django.apps import AppConfig
 
 class PanelsConfig(AppConfig):
     name = "panels"
+
+    def ready(self):
+        from . import checks  # noqa
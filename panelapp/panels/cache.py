@@ -0,0 +1,378 @@
+##
+## Copyright (c) 2016-2019 Genomics England Ltd.
+##
+## This file is part of PanelApp
+## (see https://panelapp.genomicsengland.co.uk).
+##
+## Licensed to the Apache Software Foundation (ASF) under one
+## or more contributor license agreements.  See the NOTICE file
+## distributed with this work for additional information
+## regarding copyright ownership.  The ASF licenses this file
+## to you under the Apache License, Version 2.0 (the
+## "License"); you may not use this file except in compliance
+## with the License.  You may obtain a copy of the License at
+##
+##   http://www.apache.org/licenses/LICENSE-2.0
+##
+## Unless required by applicable law or agreed to in writing,
+## software distributed under the License is distributed on an
+## "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+## KIND, either express or implied.  See the License for the
+## specific language governing permissions and limitations
+## under the License.
+##
+import threading
+import weakref
+from hashlib import sha1
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+
+class OnCommitCallbacks(threading.local):
+    """Callbacks waiting for the commit of the current transaction
+
+    Only weak references to the callbacks are kept. Callbacks of a rolled back
+    transaction are dropped, so unlike a plain flag kept in the thread this
+    doesn't outlive the transaction.
+    """
+
+    def __init__(self):
+        self.pending = {}
+
+    def registered(self, func):
+        ref = self.pending.get(func)
+        return ref is not None and ref() is not None
+
+    def add(self, func):
+        """Call the function after the commit, once per transaction however
+        many times it's added"""
+
+        if self.registered(func):
+            return
+
+        def callback():
+            self.pending.pop(func, None)
+            func()
+
+        self.pending[func] = weakref.ref(callback)
+        transaction.on_commit(callback)
+
+
+on_commit_callbacks = OnCommitCallbacks()
+
+
+class GenerationMixin:
+    """Generation shared between the workers, used to mark cached data stale
+
+    It's stored in the entities cache, which must be shared between the web
+    and Celery workers and the management commands, see `panels.checks`.
+    Indexes kept in each process implement `build` and are rebuilt by
+    `get_index` when the generation has changed.
+    """
+
+    generation_key = None
+    generation = None
+    index = None
+
+    @property
+    def cache(self):
+        return caches[settings.ENTITIES_CACHE]
+
+    def get_generation(self):
+        generation = self.cache.get(self.generation_key)
+        if generation is None:
+            self.cache.add(self.generation_key, uuid4().hex, None)
+            generation = self.cache.get(self.generation_key)
+        return generation
+
+    def set_generation(self):
+        self.cache.set(self.generation_key, uuid4().hex, None)
+
+    def get_index(self):
+        """Index kept in the process, rebuilt when the generation has changed"""
+
+        generation = self.get_generation()
+        if self.index is None or self.generation != generation:
+            self.index = self.build()
+            self.generation = generation
+        return self.index
+
+    def build(self):
+        raise NotImplementedError
+
+    def invalidate(self):
+        """Rebuild the index in all processes
+
+        The generation is set again after the commit, so other processes don't
+        keep an index built while the transaction was still running. Both
+        happen once per transaction however many times it's invalidated.
+        """
+
+        if on_commit_callbacks.registered(self.set_generation):
+            return
+
+        self.set_generation()
+        on_commit_callbacks.add(self.set_generation)
+
+
+class EntitiesCache(GenerationMixin):
+    """List of all entities in the active panels, shared between the workers.
+
+    Every variant of the list (public, GEL users, tag filter) is stored under
+    a key with the current generation. Invalidating sets a new generation, so
+    all variants become stale at once on any cache backend, the old ones
+    expire with the cache timeout.
+    """
+
+    generation_key = "entities:generation"
+
+    def make_key(self, admin=False, tag=None):
+        return "entities:{}:{}:{}".format(
+            self.get_generation(),
+            "admin" if admin else "public",
+            sha1(tag.encode("utf-8")).hexdigest() if tag else "",
+        )
+
+    def get(self, admin=False, tag=None):
+        """Get the cached list, or build and cache it if it's not there"""
+
+        key = self.make_key(admin, tag)
+        entities = self.cache.get(key)
+        if entities is None:
+            entities = self.build(admin, tag)
+            self.cache.set(key, entities)
+        return entities
+
+    @staticmethod
+    def build(admin=False, tag=None):
+        """List of (entity type, name, label) tuples sorted by the name"""
+
+        from panels.models import GenePanelSnapshot
+        from panels.models import GenePanelEntrySnapshot
+        from panels.models import STR
+        from panels.models import Region
+
+        panel_ids = GenePanelSnapshot.objects.get_active(
+            all=admin, internal=admin
+        ).values_list("pk", flat=True)
+
+        qs = GenePanelEntrySnapshot.objects.filter(
+            gene_core__active=True, panel__in=panel_ids
+        )
+        strs_qs = STR.objects.filter(panel__in=panel_ids)
+        regions_qs = Region.objects.filter(panel__in=panel_ids)
+
+        if tag:
+            qs = qs.filter(tags__name=tag)
+            strs_qs = strs_qs.filter(tags__name=tag)
+            regions_qs = regions_qs.filter(tags__name=tag)
+
+        entities = set()
+        for gene in (
+            qs.order_by()
+            .distinct("gene_core__gene_symbol")
+            .values_list("gene_core__gene_symbol", flat=True)
+            .iterator()
+        ):
+            entities.add(("gene", gene, gene))
+
+        for name in strs_qs.values_list("name", flat=True).iterator():
+            entities.add(("str", name, name))
+
+        for name in regions_qs.values_list("name", flat=True).iterator():
+            entities.add(("region", name, name))
+
+        return sorted(entities, key=lambda i: i[1].lower())
+
+    prebuild_key = "entities:prebuild"
+
+    def invalidate(self):
+        """Mark all variants as stale, and prebuild the lists after the commit
+
+        The generation is set again after the commit, see
+        `GenerationMixin.invalidate`. Both happen once per transaction however many
+        times it's invalidated, and the prebuild task isn't queued again while
+        the previous one is waiting to run.
+        """
+
+        if on_commit_callbacks.registered(self.run):
+            return
+
+        self.set_generation()
+        on_commit_callbacks.add(self.run)
+
+    def run(self):
+        self.set_generation()
+
+        if settings.ENTITIES_CACHE_PREBUILD and self.cache.add(
+            self.prebuild_key, True, 3600
+        ):
+            from panels.tasks import prebuild_entities_cache
+
+            prebuild_entities_cache.delay()
+
+    def prebuild(self):
+        # changes from now on queue a new prebuild
+        self.cache.delete(self.prebuild_key)
+        for admin in (False, True):
+            self.get(admin=admin)
+
+
+entities_cache = EntitiesCache()
+
+
+class EntitySearchRefresh(threading.local):
+    """Changed entities and panel versions, see `panels.models.EntitySearchEntry`
+
+    Search entries are rebuilt once after the commit of each transaction,
+    however many times the entities have changed in it.
+    """
+
+    def __init__(self):
+        self.snapshot_ids = set()
+        self.entities = set()
+
+    def add_entities(self, entities, positions_changed=True):
+        """Rebuild the search entries of the entities after the commit
+
+        :param entities: list of GenePanelEntrySnapshot, STR or Region instances
+        :param positions_changed: rebuild the genomic intervals index, not
+            needed if only tags or evidences have changed
+        """
+
+        entities = [(entity._entity_type, entity.pk) for entity in entities]
+        self.entities.update(entities)
+        if positions_changed and any(
+            entity_type != "gene" for entity_type, _ in entities
+        ):
+            from panels.genomic_intervals import genomic_intervals
+
+            genomic_intervals.invalidate()
+        on_commit_callbacks.add(self.run)
+
+    def add_panels(self, snapshot_ids, positions_changed=True):
+        """Rebuild the search entries of all entities in the panel versions
+
+        :param snapshot_ids: list of GenePanelSnapshot ids
+        :param positions_changed: rebuild the genomic intervals index, not
+            needed if only the panel types have changed
+        """
+
+        self.snapshot_ids.update(pk for pk in snapshot_ids if pk)
+        if positions_changed:
+            from panels.genomic_intervals import genomic_intervals
+
+            genomic_intervals.invalidate()
+        on_commit_callbacks.add(self.run)
+
+    def run(self):
+        from panels.models import EntitySearchEntry
+
+        if self.snapshot_ids or self.entities:
+            snapshot_ids, self.snapshot_ids = self.snapshot_ids, set()
+            entities, self.entities = self.entities, set()
+            EntitySearchEntry.objects.refresh(snapshot_ids, entities)
+
+
+entity_search = EntitySearchRefresh()
+
+
+class SuperPanelIncrements:
+    """Super panels to increment after their child panels have changed
+
+    The increment task is queued after the commit and runs after
+    `SUPER_PANEL_INCREMENT_COUNTDOWN` seconds. It isn't queued again for the
+    super panels which are still waiting for it, so super panels get one new
+    version however many times their child panels have changed meanwhile.
+    Nothing is queued if the transaction is rolled back.
+
+    The queued flag expires shortly after the countdown, so a lost or failed
+    task only holds back the next increment of the super panel for a minute.
+
+    The queued flags and the counters are only seen by the worker running the
+    task if the entities cache is shared. With local memory, allowed with
+    DEBUG, super panels are incremented right away instead.
+    """
+
+    queued_key = "super_panel_increment:{}:{}"
+    counter_key = "super_panel_increments:{}"
+    # seconds the queued flag outlives the countdown, for tasks which start late
+    queued_margin = 60
+
+    @property
+    def cache(self):
+        return caches[settings.ENTITIES_CACHE]
+
+    def add(self, panel_ids, user_pk=None, major=False):
+        """Increment the super panels after the commit
+
+        :param panel_ids: list of GenePanelSnapshot ids of the super panels
+        :param user_pk: user who changed the child panel
+        :param major: increment the major version
+        """
+
+        panel_ids = list(panel_ids)
+        if not settings.ENTITIES_CACHE_SHARED:
+            from panels.tasks import increment_panel_async
+
+            for pk in panel_ids:
+                increment_panel_async(
+                    pk, user_pk=user_pk, major=major, update_stats=False
+                )
+            return
+
+        transaction.on_commit(lambda: self.run(panel_ids, user_pk, major))
+
+    def run(self, panel_ids, user_pk=None, major=False):
+        from panels.tasks import increment_super_panel
+
+        self.count("requested", len(panel_ids))
+        queued = 0
+        for pk in panel_ids:
+            if self.cache.add(
+                self.queued_key.format(pk, major),
+                True,
+                settings.SUPER_PANEL_INCREMENT_COUNTDOWN + self.queued_margin,
+            ):
+                increment_super_panel.apply_async(
+                    (pk,),
+                    {"user_pk": user_pk, "major": major},
+                    countdown=settings.SUPER_PANEL_INCREMENT_COUNTDOWN,
+                )
+                queued += 1
+
+        if queued:
+            self.count("queued", queued)
+
+    def dequeue(self, pk, major=False):
+        """Called by the task, changes made from now on queue a new increment"""
+
+        self.cache.delete(self.queued_key.format(pk, major))
+
+    def count(self, name, value):
+        key = self.counter_key.format(name)
+        self.cache.add(key, 0, None)
+        self.cache.incr(key, value)
+
+    def stats(self):
+        """Number of requested and queued increments, the rest were coalesced
+
+        Counts are approximate, increments aren't atomic on every cache
+        backend (e.g. the database cache), so concurrent workers can drop some.
+
+        :return: dict with requested, queued and coalesced counts
+        """
+
+        requested = self.cache.get(self.counter_key.format("requested"), 0)
+        queued = self.cache.get(self.counter_key.format("queued"), 0)
+        return {
+            "requested": requested,
+            "queued": queued,
+            "coalesced": requested - queued,
+        }
+
+
+super_panel_increments = SuperPanelIncrements()
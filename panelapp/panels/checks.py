@@ -0,0 +1,44 @@
+##
+## Copyright (c) 2016-2019 Genomics England Ltd.
+##
+## This file is part of PanelApp
+## (see https://panelapp.genomicsengland.co.uk).
+##
+## Licensed to the Apache Software Foundation (ASF) under one
+## or more contributor license agreements.  See the NOTICE file
+## distributed with this work for additional information
+## regarding copyright ownership.  The ASF licenses this file
+## to you under the Apache License, Version 2.0 (the
+## "License"); you may not use this file except in compliance
+## with the License.  You may obtain a copy of the License at
+##
+##   http://www.apache.org/licenses/LICENSE-2.0
+##
+## Unless required by applicable law or agreed to in writing,
+## software distributed under the License is distributed on an
+## "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+## KIND, either express or implied.  See the License for the
+## specific language governing permissions and limitations
+## under the License.
+##
+from django.conf import settings
+from django.core import checks
+
+
+@checks.register()
+def check_entities_cache(app_configs, **kwargs):
+    """Entities cache must be shared, generations set in one process are
+    otherwise never seen by the others, see `panels.cache.GenerationMixin`"""
+
+    if settings.ENTITIES_CACHE_SHARED or settings.DEBUG:
+        return []
+
+    return [
+        checks.Error(
+            "The entities cache isn't shared between the processes",
+            hint="Set ENTITIES_CACHE_BACKEND to a database, memcached or Redis "
+            "cache backend",
+            obj="ENTITIES_CACHE_BACKEND",
+            id="panels.E001",
+        )
+    ]
@@ -62,7 +62,6 @@ class UpdateGeneMOPForm(forms.ModelForm):
             pk=self.instance.panel.panel.pk
         ).active_panel.get_gene(self.instance.gene["gene_symbol"])
         self.instance.update_pathogenicity(mop, user, comment)
-        self.instance.panel._update_saved_stats()
 
 
 class UpdateGeneMOIForm(forms.ModelForm):
@@ -81,7 +80,6 @@ class UpdateGeneMOIForm(forms.ModelForm):
             pk=self.instance.panel.panel.pk
         ).active_panel.get_gene(self.instance.gene["gene_symbol"])
         self.instance.update_moi(moi, user, comment)
-        self.instance.panel._update_saved_stats()
 
 
 class UpdateGenePhenotypesForm(forms.ModelForm):
@@ -105,7 +103,6 @@ class UpdateGenePhenotypesForm(forms.ModelForm):
             pk=self.instance.panel.panel.pk
         ).active_panel.get_gene(self.instance.gene["gene_symbol"])
         self.instance.update_phenotypes(phenotypes, user, comment)
-        self.instance.panel._update_saved_stats()
 
 
 class UpdateGenePublicationsForm(forms.ModelForm):
@@ -130,7 +127,6 @@ class UpdateGenePublicationsForm(forms.ModelForm):
             pk=self.instance.panel.panel.pk
         ).active_panel.get_gene(self.instance.gene["gene_symbol"])
         self.instance.update_publications(publications, user, comment)
-        self.instance.panel._update_saved_stats()
 
 
 class UpdateGeneRatingForm(forms.ModelForm):
@@ -157,4 +153,3 @@ class UpdateGeneRatingForm(forms.ModelForm):
             pk=self.instance.panel.panel.pk
         ).active_panel.get_gene(self.instance.gene["gene_symbol"])
         self.instance.update_rating(status, user, self.cleaned_data["comment"])
-        self.instance.panel._update_saved_stats()
@@ -81,5 +81,4 @@ class GeneReviewForm(forms.ModelForm):
         ev = panel.get_gene(self.gene.gene.get("gene_symbol")).update_evaluation(
             self.request.user, evaluation_data
         )
-        panel._update_saved_stats()
         return ev
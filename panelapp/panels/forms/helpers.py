@@ -21,11 +21,22 @@
 ## specific language governing permissions and limitations
 ## under the License.
 ##
+from django import forms
 from django.utils.translation import gettext_lazy as _
 from django.contrib.postgres.forms import SimpleArrayField
+from panels.gene_names import gene_names
 
 
 class GELSimpleArrayField(SimpleArrayField):
     default_error_messages = {
         "item_invalid": _("Make sure there is no ; if no value after: %(nth)s item: ")
     }
+
+
+class GeneChoiceField(forms.ModelChoiceField):
+    """Gene found by its symbol, alias or HGNC id, case insensitive"""
+
+    def to_python(self, value):
+        if value not in self.empty_values:
+            value = gene_names.resolve(str(value)) or value
+        return super().to_python(value)
@@ -28,6 +28,7 @@ from panels.models import Level4Title
 from panels.models import GenePanel
 from panels.models import GenePanelSnapshot
 from panels.models import PanelType
+from panels.panel_names import panel_names
 
 
 class PanelForm(forms.ModelForm):
@@ -171,6 +172,7 @@ class PanelForm(forms.ModelForm):
                     )
                 )
                 self.instance.old_panels = self.cleaned_data["old_panels"]
+                panel_names.invalidate()
 
             if "status" in self.changed_data:
                 activities.append(
@@ -180,7 +182,6 @@ class PanelForm(forms.ModelForm):
                 )
                 self.instance.panel.status = self.cleaned_data["status"]
 
-            update_stats_superpanel = True
             if "child_panels" in self.changed_data:
                 self.instance.child_panels.set(self.cleaned_data["child_panels"])
                 activities.append(
@@ -192,7 +193,6 @@ class PanelForm(forms.ModelForm):
                         )
                     )
                 )
-                update_stats_superpanel = False
 
             if "types" in self.changed_data:
                 panel.types.set(self.cleaned_data["types"])
@@ -205,7 +205,8 @@ class PanelForm(forms.ModelForm):
             if data_changed or self.changed_data:
                 self.instance.increment_version()
                 panel.save()
-                self.instance._update_saved_stats(use_db=update_stats_superpanel)
+                if "child_panels" in self.changed_data:
+                    self.instance._update_saved_stats(use_db=False)
             else:
                 panel.save()
 
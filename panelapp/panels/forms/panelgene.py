@@ -26,6 +26,7 @@
 from collections import OrderedDict
 from django import forms
 from .helpers import GELSimpleArrayField
+from .helpers import GeneChoiceField
 from dal_select2.widgets import ModelSelect2
 from dal_select2.widgets import Select2Multiple
 from dal_select2.widgets import ModelSelect2Multiple
@@ -60,7 +61,7 @@ class PanelGeneForm(forms.ModelForm):
     6) Create new GenePanelEntrySnapshot with a link to the new GenePanelSnapshot
     """
 
-    gene = forms.ModelChoiceField(
+    gene = GeneChoiceField(
         label="Gene symbol",
         queryset=Gene.objects.filter(active=True),
         widget=ModelSelect2(
@@ -31,6 +31,7 @@ from dal_select2.widgets import ModelSelect2
 from dal_select2.widgets import Select2Multiple
 from dal_select2.widgets import ModelSelect2Multiple
 from panelapp.forms import Select2ListMultipleChoiceField
+from .helpers import GeneChoiceField
 from panels.models import Tag
 from panels.models import Gene
 from panels.models import Evidence
@@ -62,7 +63,7 @@ class PanelRegionForm(forms.ModelForm):
     6) Create new GenePanelEntrySnapshot with a link to the new GenePanelSnapshot
     """
 
-    gene = forms.ModelChoiceField(
+    gene = GeneChoiceField(
         label="Gene symbol",
         required=False,
         queryset=Gene.objects.filter(active=True),
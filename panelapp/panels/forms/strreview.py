@@ -80,5 +80,4 @@ class STRReviewForm(forms.ModelForm):
         ev = panel.get_str(self.str_item.name).update_evaluation(
             self.request.user, evaluation_data
         )
-        panel._update_saved_stats()
         return ev
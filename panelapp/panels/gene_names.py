@@ -0,0 +1,232 @@
+##
+## Copyright (c) 2016-2019 Genomics England Ltd.
+##
+## This file is part of PanelApp
+## (see https://panelapp.genomicsengland.co.uk).
+##
+## Licensed to the Apache Software Foundation (ASF) under one
+## or more contributor license agreements.  See the NOTICE file
+## distributed with this work for additional information
+## regarding copyright ownership.  The ASF licenses this file
+## to you under the Apache License, Version 2.0 (the
+## "License"); you may not use this file except in compliance
+## with the License.  You may obtain a copy of the License at
+##
+##   http://www.apache.org/licenses/LICENSE-2.0
+##
+## Unless required by applicable law or agreed to in writing,
+## software distributed under the License is distributed on an
+## "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+## KIND, either express or implied.  See the License for the
+## specific language governing permissions and limitations
+## under the License.
+##
+from array import array
+from bisect import bisect_left
+from difflib import get_close_matches
+
+from panels.cache import GenerationMixin
+
+
+class GeneNames(GenerationMixin):
+    """Find active genes by symbol, previous symbol, alias, HGNC id or the
+    beginning of these or the gene name
+
+    A sorted list of the uppercase identifiers of all active genes is kept in
+    each process, so searching is a binary search instead of a table scan.
+    The list is rebuilt when the shared generation changes, i.e. after a gene
+    is saved or the gene collection is updated.
+    """
+
+    generation_key = "gene_names:generation"
+
+    (
+        SYMBOL,
+        PREVIOUS_SYMBOL,
+        ALIAS,
+        HGNC_ID,
+        SYMBOL_PREFIX,
+        ALIAS_PREFIX,
+        NAME_PREFIX,
+        SIMILAR,
+    ) = range(8)
+    KEY_RANKS = {
+        SYMBOL: (SYMBOL, SYMBOL_PREFIX),
+        PREVIOUS_SYMBOL: (PREVIOUS_SYMBOL, ALIAS_PREFIX),
+        ALIAS: (ALIAS, ALIAS_PREFIX),
+        HGNC_ID: (HGNC_ID, ALIAS_PREFIX),
+        NAME_PREFIX: (NAME_PREFIX, NAME_PREFIX),
+    }
+
+    @staticmethod
+    def build():
+        """Sorted keys, array with the gene number and key type of each key,
+        list of (gene symbol, HGNC symbol, gene name) tuples sorted by the
+        symbol and the sorted symbol and alias keys"""
+
+        from panels.models import Gene
+
+        genes = []
+        entries = []
+        for (
+            gene_symbol,
+            hgnc_symbol,
+            gene_name,
+            aliases,
+            hgnc_id,
+            previous_symbols,
+        ) in (
+            Gene.objects.filter(active=True)
+            .order_by("gene_symbol")
+            .values_list(
+                "gene_symbol",
+                "hgnc_symbol",
+                "gene_name",
+                "alias",
+                "hgnc_id",
+                "previous_symbols",
+            )
+            .iterator()
+        ):
+            gene = len(genes)
+            genes.append((gene_symbol, hgnc_symbol, gene_name))
+            entries.append((gene_symbol.upper(), GeneNames.SYMBOL, gene))
+            for symbol in set(prev.upper() for prev in previous_symbols or [] if prev):
+                entries.append((symbol, GeneNames.PREVIOUS_SYMBOL, gene))
+            aliases = set(alias.upper() for alias in aliases or [] if alias)
+            if hgnc_symbol and hgnc_symbol != gene_symbol:
+                aliases.add(hgnc_symbol.upper())
+            for alias in aliases:
+                entries.append((alias, GeneNames.ALIAS, gene))
+            if hgnc_id:
+                entries.append((hgnc_id.upper(), GeneNames.HGNC_ID, gene))
+            if gene_name:
+                entries.append((gene_name.upper(), GeneNames.NAME_PREFIX, gene))
+
+        entries.sort()
+        keys = [key for key, _, _ in entries]
+        values = array("l", (gene * 8 + key_type for _, key_type, gene in entries))
+        symbols = sorted(
+            set(key for key, key_type, _ in entries if key_type < GeneNames.HGNC_ID)
+        )
+        return keys, values, genes, symbols
+
+    def find(self, term):
+        """Genes matching the term, the best matches first
+
+        Exact symbol, previous symbol, alias and HGNC id matches are followed
+        by symbol, alias and name prefix matches. If nothing starts with the
+        term, symbols and aliases similar to it are returned, for example for
+        typos.
+
+        :param term: gene symbol, previous symbol, alias, HGNC id or beginning
+            of these or the gene name, case insensitive
+        :return: list of ((gene symbol, HGNC symbol, gene name), rank) tuples
+        """
+
+        keys, values, genes, symbols = self.get_index()
+        term = term.strip().upper()
+        if not term:
+            return []
+
+        ranks = {}
+        position = bisect_left(keys, term)
+        while position < len(keys) and keys[position].startswith(term):
+            gene, key_type = divmod(values[position], 8)
+            exact_rank, prefix_rank = self.KEY_RANKS[key_type]
+            rank = exact_rank if keys[position] == term else prefix_rank
+            if rank < ranks.get(gene, self.SIMILAR):
+                ranks[gene] = rank
+            position += 1
+
+        if ranks:
+            return [
+                (genes[gene], rank)
+                for gene, rank in sorted(ranks.items(), key=lambda r: (r[1], r[0]))
+            ]
+
+        if len(term) < 3:
+            return []
+
+        # typos are rarely in the first character, only compare keys
+        # starting with it to keep this fast
+        candidates = [
+            key
+            for key in symbols[
+                bisect_left(symbols, term[0]) : bisect_left(
+                    symbols, chr(ord(term[0]) + 1)
+                )
+            ]
+            if abs(len(key) - len(term)) <= 1
+        ]
+        similar = []
+        for key in get_close_matches(term, candidates, n=10, cutoff=0.75):
+            for position in range(bisect_left(keys, key), len(keys)):
+                if keys[position] != key:
+                    break
+                gene, key_type = divmod(values[position], 8)
+                if key_type < self.HGNC_ID and gene not in similar:
+                    similar.append(gene)
+        return [(genes[gene], self.SIMILAR) for gene in similar]
+
+    def all(self):
+        """All active genes sorted by the symbol"""
+
+        return self.get_index()[2]
+
+    def lookup(self, identifiers):
+        """Genes with these symbols, previous symbols, aliases or HGNC ids
+
+        :param identifiers: list of gene symbols, previous symbols, aliases or
+            HGNC ids, case insensitive
+        :return: dict with the identifier and the list of
+            ((gene symbol, HGNC symbol, gene name), key type) tuples, the best
+            match first
+        """
+
+        keys, values, genes, _ = self.get_index()
+
+        results = {}
+        for identifier in identifiers:
+            term = identifier.strip().upper()
+            matches = {}
+            position = bisect_left(keys, term)
+            while position < len(keys) and keys[position] == term:
+                gene, key_type = divmod(values[position], 8)
+                if key_type < matches.get(gene, self.NAME_PREFIX):
+                    matches[gene] = key_type
+                position += 1
+
+            results[identifier] = [
+                (genes[gene], key_type)
+                for gene, key_type in sorted(
+                    matches.items(), key=lambda m: (m[1], m[0])
+                )
+            ]
+        return results
+
+    @staticmethod
+    def best_matches(matches):
+        """Matches with the best key type, more than one means it's ambiguous
+
+        :param matches: list of matches returned by `lookup`
+        :return: list of matches
+        """
+
+        return [match for match in matches if match[1] == matches[0][1]]
+
+    def resolve(self, identifier):
+        """Symbol of the gene with this symbol, previous symbol, alias or HGNC id
+
+        :param identifier: gene symbol, previous symbol, alias or HGNC id, case
+            insensitive
+        :return: gene symbol, or None if there are no matches or the best
+            matches are of more than one gene, i.e. a shared alias
+        """
+
+        matches = self.best_matches(self.lookup([identifier])[identifier])
+        if len(matches) == 1:
+            return matches[0][0][0]
+
+
+gene_names = GeneNames()
@@ -0,0 +1,142 @@
+##
+## Copyright (c) 2016-2019 Genomics England Ltd.
+##
+## This file is part of PanelApp
+## (see https://panelapp.genomicsengland.co.uk).
+##
+## Licensed to the Apache Software Foundation (ASF) under one
+## or more contributor license agreements.  See the NOTICE file
+## distributed with this work for additional information
+## regarding copyright ownership.  The ASF licenses this file
+## to you under the Apache License, Version 2.0 (the
+## "License"); you may not use this file except in compliance
+## with the License.  You may obtain a copy of the License at
+##
+##   http://www.apache.org/licenses/LICENSE-2.0
+##
+## Unless required by applicable law or agreed to in writing,
+## software distributed under the License is distributed on an
+## "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+## KIND, either express or implied.  See the License for the
+## specific language governing permissions and limitations
+## under the License.
+##
+from array import array
+from bisect import bisect_left
+from bisect import bisect_right
+from collections import defaultdict
+
+from panels.cache import GenerationMixin
+
+
+class GenomicIntervals(GenerationMixin):
+    """Find the STRs and regions of the active panels overlapping a position
+
+    Positions of all active STRs and regions are kept in each process, in
+    arrays sorted by the start for each assembly and chromosome, so looking
+    up thousands of variants is a binary search for each instead of a query.
+    The arrays are rebuilt when the shared generation changes, i.e. after an
+    STR or a region is changed, see `panels.cache.EntitySearchRefresh`.
+
+    Positions are compared as they are shown, with the start and end included.
+    """
+
+    generation_key = "genomic_intervals:generation"
+
+    ASSEMBLIES = {"GRCh37": "position_37", "GRCh38": "position_38"}
+
+    @staticmethod
+    def build():
+        """Dict with (assembly, chromosome) keys and (starts, ends, longest
+        interval, entities) values, sorted by the start. Entities are
+        (entity type, entity id, snapshot id, required overlap percentage)
+        tuples"""
+
+        from django.db.models import F
+        from panels.models import STR
+        from panels.models import Region
+
+        intervals = defaultdict(list)
+        for entity_type, model in (("str", STR), ("region", Region)):
+            for entity in (
+                model.objects.filter(panel_id=F("panel__panel__active_snapshot_id"))
+                .values()
+                .iterator()
+            ):
+                for assembly, field in GenomicIntervals.ASSEMBLIES.items():
+                    position = entity[field]
+                    if (
+                        position is None
+                        or position.lower is None
+                        or position.upper is None
+                    ):
+                        continue
+                    intervals[(assembly, entity["chromosome"])].append(
+                        (
+                            position.lower,
+                            position.upper,
+                            entity_type,
+                            entity["id"],
+                            entity["panel_id"],
+                            entity.get("required_overlap_percentage") or 0,
+                        )
+                    )
+
+        index = {}
+        for key, items in intervals.items():
+            items.sort()
+            index[key] = (
+                array("l", (item[0] for item in items)),
+                array("l", (item[1] for item in items)),
+                max(item[1] - item[0] for item in items),
+                [item[2:] for item in items],
+            )
+        return index
+
+    @staticmethod
+    def overlaps(lower, upper, percentage, start, end):
+        """Interval overlaps the entity and covers the required percentage of it
+
+        :param lower: entity start
+        :param upper: entity end
+        :param percentage: required overlap percentage, 0 for any overlap
+        :param start: interval start
+        :param end: interval end
+        :return: bool
+        """
+
+        overlap = min(upper, end) - max(lower, start) + 1
+        return overlap > 0 and overlap * 100 >= percentage * (upper - lower + 1)
+
+    def find(self, assembly, chromosome, start, end):
+        """STRs and regions overlapping the interval
+
+        Regions only match if the interval covers their required overlap
+        percentage.
+
+        :param assembly: GRCh37 or GRCh38
+        :param chromosome: chromosome name, without chr
+        :param start: interval start
+        :param end: interval end, same as the start for a variant
+        :return: list of (entity type, entity id, snapshot id) tuples sorted
+            by the entity start
+        """
+
+        index = self.get_index().get((assembly, chromosome))
+        if not index:
+            return []
+
+        starts, ends, longest, entities = index
+        results = []
+        # entities starting more than the longest interval before the start
+        # end before it, no need to check them
+        for position in range(
+            bisect_left(starts, start - longest), bisect_right(starts, end)
+        ):
+            entity_type, entity_id, snapshot_id, percentage = entities[position]
+            if self.overlaps(starts[position], ends[position], percentage, start, end):
+                results.append((entity_type, entity_id, snapshot_id))
+        return results
+
+
+genomic_intervals = GenomicIntervals()
@@ -1,6 +1,7 @@
 from django.core.management.base import BaseCommand
 from django.db.models import Q
 from panels.models import GenePanelSnapshot, GenePanelEntrySnapshot, Region, STR
+from panels.models import EntitySearchEntry
 
 
 class Command(BaseCommand):
@@ -29,3 +30,5 @@ class Command(BaseCommand):
             STR.objects.filter(panel=new_panel, saved_gel_status__gt=3).update(
                 saved_gel_status=3
             )
+
+            EntitySearchEntry.objects.refresh([new_panel.pk])
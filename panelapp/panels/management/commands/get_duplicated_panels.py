@@ -24,11 +24,6 @@
 import csv
 import sys
 import djclick as click
-from django.db import models
-from django.db.models import Case
-from django.db.models import Count
-from django.db.models import When
-from django.db.models import Value
 from panels.models import GenePanelSnapshot
 from panels.models import Evidence
 
@@ -57,14 +52,6 @@ def command():
 
     for gps in (
         GenePanelSnapshot.objects.all()
-        .annotate(child_panels_count=Count("child_panels"))
-        .annotate(
-            is_super_panel=Case(
-                When(child_panels_count__gt=0, then=Value(True)),
-                default=Value(False),
-                output_field=models.BooleanField(),
-            )
-        )
         .order_by("panel_id", "-major_version", "-minor_version")
         .iterator()
     ):
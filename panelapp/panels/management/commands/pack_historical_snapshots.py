@@ -0,0 +1,61 @@
+##
+## Copyright (c) 2016-2019 Genomics England Ltd.
+##
+## This file is part of PanelApp
+## (see https://panelapp.genomicsengland.co.uk).
+##
+## Licensed to the Apache Software Foundation (ASF) under one
+## or more contributor license agreements.  See the NOTICE file
+## distributed with this work for additional information
+## regarding copyright ownership.  The ASF licenses this file
+## to you under the Apache License, Version 2.0 (the
+## "License"); you may not use this file except in compliance
+## with the License.  You may obtain a copy of the License at
+##
+##   http://www.apache.org/licenses/LICENSE-2.0
+##
+## Unless required by applicable law or agreed to in writing,
+## software distributed under the License is distributed on an
+## "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+## KIND, either express or implied.  See the License for the
+## specific language governing permissions and limitations
+## under the License.
+##
+import djclick as click
+
+from django.db import transaction
+
+from panels.models import HistoricalSnapshot
+
+
+@click.command()
+@click.option(
+    "--chunk-size", default=100, help="Number of snapshots packed in one transaction"
+)
+def command(chunk_size):
+    """Pack historical snapshots which are stored with the full JSON data.
+
+    Snapshots are compressed and gene data is moved to HistoricalGeneData, see
+    `HistoricalSnapshot.pack`. The command can be stopped and run again, packed
+    snapshots are skipped.
+    """
+
+    total = 0
+    while True:
+        with transaction.atomic():
+            snapshots = list(
+                HistoricalSnapshot.objects.filter(raw_data__isnull=False)
+                .select_for_update(skip_locked=True)
+                .order_by("pk")[:chunk_size]
+            )
+            if not snapshots:
+                break
+
+            HistoricalSnapshot.pack(snapshots)
+            for snapshot in snapshots:
+                snapshot.save(update_fields=["raw_data", "packed_data"])
+
+        total += len(snapshots)
+        click.echo("Packed {} historical snapshots".format(total))
+
+    click.echo("Finished, packed {} historical snapshots".format(total))
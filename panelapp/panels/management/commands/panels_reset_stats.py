@@ -23,27 +23,44 @@
 ##
 
 import djclick as click
-from django.db import transaction
 
 from panels.models import GenePanelSnapshot
 
 
 @click.command()
-def command():
-    for panel in GenePanelSnapshot.objects.get_active_annotated(
-        all=True, internal=True, superpanels=False
-    ).filter(is_child_panel=True):
-        with transaction.atomic():
-            new_panel = panel.increment_version(include_superpanels=False)
-            new_panel._update_saved_stats(update_superpanels=False)
-
-    click.echo('Updated all simple panels')
-
-    for super_panel in GenePanelSnapshot.objects.get_active_annotated(
-        all=True, internal=True, superpanels=True
-    ).filter(is_super_panel=True):
-        with transaction.atomic():
-            new_super_panel = super_panel.increment_version()
-            new_super_panel._update_saved_stats(update_superpanels=False)
-
-    click.echo('Updated all super panels')
+@click.option("--dry-run", is_flag=True, help="Only report panels with incorrect stats")
+def command(dry_run):
+    """Compare saved panel stats with the full recount and fix the differences.
+
+    Stats are updated incrementally when entities change, this command verifies
+    them against the values calculated from the database.
+    """
+
+    panels = GenePanelSnapshot.objects.get_active_annotated(
+        all=True, internal=True, deleted=True
+    )
+
+    incorrect = 0
+    # super panels are checked after the child panels
+    for panel in sorted(panels, key=lambda p: p.is_super_panel):
+        stats = panel._get_stats()
+        if stats == panel.stats:
+            continue
+
+        incorrect += 1
+        diff = {
+            key: (panel.stats.get(key), value)
+            for key, value in stats.items()
+            if panel.stats.get(key) != value
+        }
+        click.secho("{} ({}): {}".format(panel, panel.pk, diff), fg="yellow")
+
+        if not dry_run:
+            panel.stats = stats
+            panel.save(update_fields=["stats"])
+
+    click.echo(
+        "{} panels with incorrect stats{}".format(
+            incorrect, "" if dry_run else " were updated"
+        )
+    )
@@ -24,11 +24,7 @@
 
 import djclick as click
 
-from django.db import models, transaction
-from django.db.models import Case
-from django.db.models import Count
-from django.db.models import When
-from django.db.models import Value
+from django.db import transaction
 
 from panels.models import GenePanelSnapshot
 from panels.models import HistoricalSnapshot
@@ -37,25 +33,12 @@ from panels.models import HistoricalSnapshot
 @click.command()
 def command():
 
-    latest_panels = (
-        GenePanelSnapshot.objects.all()
-        .distinct("panel_id")
-        .order_by("panel_id", "-major_version", "-minor_version", "-modified", "-pk")
-        .values_list("pk", flat=True)
-    )
+    latest_panels = GenePanelSnapshot.objects.get_latest_ids(deleted=True)
 
     completed = {'genepanel': 0, 'historical': 0}
 
     for gps in (
         GenePanelSnapshot.objects.all()
-        .annotate(child_panels_count=Count("child_panels"))
-        .annotate(
-            is_super_panel=Case(
-                When(child_panels_count__gt=0, then=Value(True)),
-                default=Value(False),
-                output_field=models.BooleanField(),
-            )
-        )
         .exclude(pk__in=latest_panels)
         .order_by("panel_id", "-major_version", "-minor_version")
         .iterator()
@@ -0,0 +1,53 @@
+##
+## Copyright (c) 2016-2019 Genomics England Ltd.
+##
+## This file is part of PanelApp
+## (see https://panelapp.genomicsengland.co.uk).
+##
+## Licensed to the Apache Software Foundation (ASF) under one
+## or more contributor license agreements.  See the NOTICE file
+## distributed with this work for additional information
+## regarding copyright ownership.  The ASF licenses this file
+## to you under the Apache License, Version 2.0 (the
+## "License"); you may not use this file except in compliance
+## with the License.  You may obtain a copy of the License at
+##
+##   http://www.apache.org/licenses/LICENSE-2.0
+##
+## Unless required by applicable law or agreed to in writing,
+## software distributed under the License is distributed on an
+## "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+## KIND, either express or implied.  See the License for the
+## specific language governing permissions and limitations
+## under the License.
+##
+import djclick as click
+
+from panels.models import EntitySearchEntry
+from panels.models import GenePanel
+
+
+@click.command()
+@click.option(
+    "--chunk-size", default=50, help="Number of panels rebuilt in one transaction"
+)
+def command(chunk_size):
+    """Rebuild the search entries for all entities of the active panels.
+
+    Entries are kept up to date when the entities change and are filled by
+    a migration, run it to repair them.
+    """
+
+    snapshot_ids = list(
+        GenePanel.objects.filter(active_snapshot__isnull=False)
+        .order_by("pk")
+        .values_list("active_snapshot_id", flat=True)
+    )
+
+    for start in range(0, len(snapshot_ids), chunk_size):
+        EntitySearchEntry.objects.refresh(snapshot_ids[start : start + chunk_size])
+        click.echo(
+            "Rebuilt {} of {} panels".format(
+                min(start + chunk_size, len(snapshot_ids)), len(snapshot_ids)
+            )
+        )
@@ -0,0 +1,57 @@
+##
+## Copyright (c) 2016-2019 Genomics England Ltd.
+##
+## This file is part of PanelApp
+## (see https://panelapp.genomicsengland.co.uk).
+##
+## Licensed to the Apache Software Foundation (ASF) under one
+## or more contributor license agreements.  See the NOTICE file
+## distributed with this work for additional information
+## regarding copyright ownership.  The ASF licenses this file
+## to you under the Apache License, Version 2.0 (the
+## "License"); you may not use this file except in compliance
+## with the License.  You may obtain a copy of the License at
+##
+##   http://www.apache.org/licenses/LICENSE-2.0
+##
+## Unless required by applicable law or agreed to in writing,
+## software distributed under the License is distributed on an
+## "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+## KIND, either express or implied.  See the License for the
+## specific language governing permissions and limitations
+## under the License.
+##
+from django.test import override_settings
+from accounts.tests.setup import LoginGELUser
+from panels.models import EntitySearchEntry
+from panels.models import HistoricalGeneData
+from panels.models import HistoricalSnapshot
+from panels.tests.factories import GenePanelSnapshotFactory
+from panels.tests.factories import GenePanelEntrySnapshotFactory
+from panels.management.commands.pack_historical_snapshots import command
+
+
+class CommandPackHistoricalSnapshotsTest(LoginGELUser):
+    @override_settings(HISTORICAL_SNAPSHOTS_PACKED=False)
+    def test_pack_historical_snapshots(self):
+        gps = GenePanelSnapshotFactory()
+        genes = GenePanelEntrySnapshotFactory.create_batch(2, panel=gps)
+        for _ in range(3):
+            gps = gps.increment_version()
+
+        snapshots = list(HistoricalSnapshot.objects.order_by("pk"))
+        self.assertIsNotNone(snapshots[0].raw_data)
+
+        command.main(["--chunk-size", "2"], standalone_mode=False)
+
+        for snapshot in snapshots:
+            packed = HistoricalSnapshot.objects.get(pk=snapshot.pk)
+            self.assertIsNone(packed.raw_data)
+            self.assertEqual(packed.data, snapshot.raw_data)
+
+        # the gene data of all versions is stored once
+        self.assertEqual(HistoricalGeneData.objects.count(), len(genes))
+        # the active version is still searchable
+        self.assertEqual(
+            EntitySearchEntry.objects.filter(snapshot=gps).count(), len(genes)
+        )
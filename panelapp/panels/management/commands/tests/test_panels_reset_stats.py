@@ -61,13 +61,20 @@ class CommandResetPanelsStatsTest(LoginGELUser):
         super_stats = gps2.stats
         super_version = gps2.version
 
-        command()
+        command.main(["--dry-run"], standalone_mode=False)
+
+        gps.refresh_from_db()
+        self.assertEqual(stats, gps.stats)
+
+        command.main([], standalone_mode=False)
 
         updated_gps = GenePanelSnapshot.objects.filter(panel_id=gps.panel_id).first()
         updated_gps2 = GenePanelSnapshot.objects.filter(panel_id=gps2.panel_id).first()
 
-        self.assertNotEqual(version, updated_gps.version)
+        self.assertEqual(version, updated_gps.version)
         self.assertNotEqual(stats, updated_gps.stats)
+        self.assertEqual(updated_gps.stats, updated_gps._get_stats())
 
-        self.assertNotEqual(super_version, updated_gps2.version)
-        self.assertNotEqual(super_stats, updated_gps2.stats)
\ No newline at end of file
+        self.assertEqual(super_version, updated_gps2.version)
+        self.assertNotEqual(super_stats, updated_gps2.stats)
+        self.assertEqual(updated_gps2.stats, updated_gps2._get_stats())
\ No newline at end of file
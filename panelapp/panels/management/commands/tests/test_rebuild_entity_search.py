@@ -0,0 +1,56 @@
+##
+## Copyright (c) 2016-2019 Genomics England Ltd.
+##
+## This file is part of PanelApp
+## (see https://panelapp.genomicsengland.co.uk).
+##
+## Licensed to the Apache Software Foundation (ASF) under one
+## or more contributor license agreements.  See the NOTICE file
+## distributed with this work for additional information
+## regarding copyright ownership.  The ASF licenses this file
+## to you under the Apache License, Version 2.0 (the
+## "License"); you may not use this file except in compliance
+## with the License.  You may obtain a copy of the License at
+##
+##   http://www.apache.org/licenses/LICENSE-2.0
+##
+## Unless required by applicable law or agreed to in writing,
+## software distributed under the License is distributed on an
+## "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+## KIND, either express or implied.  See the License for the
+## specific language governing permissions and limitations
+## under the License.
+##
+from accounts.tests.setup import LoginGELUser
+from panels.cache import entity_search
+from panels.models import EntitySearchEntry
+from panels.models import GenePanel
+from panels.tests.factories import GenePanelSnapshotFactory
+from panels.tests.factories import GenePanelEntrySnapshotFactory
+from panels.management.commands.rebuild_entity_search import command
+
+
+class CommandRebuildEntitySearchTest(LoginGELUser):
+    def test_rebuild_entity_search(self):
+        gps = GenePanelSnapshotFactory(panel__status=GenePanel.STATUS.public)
+        genes = GenePanelEntrySnapshotFactory.create_batch(3, panel=gps)
+        GenePanelEntrySnapshotFactory()
+        # entries are added after the commit of each change
+        self.assertEqual(EntitySearchEntry.objects.count(), 4)
+        self.assertFalse(entity_search.entities)
+
+        EntitySearchEntry.objects.filter(entity_id=genes[0].pk).delete()
+        EntitySearchEntry.objects.update(payload=None)
+
+        command.main(["--chunk-size", "1"], standalone_mode=False)
+
+        self.assertEqual(EntitySearchEntry.objects.count(), 4)
+        self.assertFalse(EntitySearchEntry.objects.filter(payload__isnull=True))
+        self.assertEqual(
+            sorted(
+                EntitySearchEntry.objects.get_active().values_list(
+                    "entity_id", flat=True
+                )
+            ),
+            sorted(gene.pk for gene in genes),
+        )
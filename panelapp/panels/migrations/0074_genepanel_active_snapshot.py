@@ -0,0 +1,37 @@
+# Generated by Django 2.1.10 on 2026-10-18 02:19
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_active_snapshot(apps, schema_editor):
+    GenePanel = apps.get_model("panels", "GenePanel")
+    GenePanelSnapshot = apps.get_model("panels", "GenePanelSnapshot")
+
+    latest = (
+        GenePanelSnapshot.objects.distinct("panel_id")
+        .order_by("panel_id", "-major_version", "-minor_version", "-modified", "-pk")
+        .values_list("panel_id", "pk")
+    )
+    for panel_id, snapshot_id in latest.iterator():
+        GenePanel.objects.filter(pk=panel_id).update(active_snapshot_id=snapshot_id)
+
+
+def skip(apps, schema_editor):
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('panels', '0073_auto_20190710_0811'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='genepanel',
+            name='active_snapshot',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='panels.GenePanelSnapshot'),
+        ),
+        migrations.RunPython(populate_active_snapshot, skip),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 2.1.10 on 2026-10-18 02:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('panels', '0074_genepanel_active_snapshot'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='genepanelentrysnapshot',
+            index=models.Index(fields=['panel', 'gene_core'], name='panels_gene_panel_i_8351be_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='region',
+            index=models.Index(fields=['panel', 'name'], name='panels_regi_panel_i_d56ebd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='str',
+            index=models.Index(fields=['panel', 'name'], name='panels_str_panel_i_b35baf_idx'),
+        ),
+    ]
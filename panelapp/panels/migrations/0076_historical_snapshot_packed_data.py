@@ -0,0 +1,36 @@
+# Generated by Django 2.1.10 on 2026-10-18 09:12
+
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('panels', '0075_entity_panel_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HistoricalGeneData',
+            fields=[
+                ('hash', models.CharField(max_length=40, primary_key=True, serialize=False)),
+                ('data', django.contrib.postgres.fields.jsonb.JSONField()),
+            ],
+        ),
+        migrations.RenameField(
+            model_name='historicalsnapshot',
+            old_name='data',
+            new_name='raw_data',
+        ),
+        migrations.AlterField(
+            model_name='historicalsnapshot',
+            name='raw_data',
+            field=django.contrib.postgres.fields.jsonb.JSONField(db_column='data', null=True),
+        ),
+        migrations.AddField(
+            model_name='historicalsnapshot',
+            name='packed_data',
+            field=models.BinaryField(null=True),
+        ),
+    ]
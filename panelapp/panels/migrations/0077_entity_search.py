@@ -0,0 +1,55 @@
+# Generated by Django 2.1.10 on 2026-10-18 04:46
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('panels', '0076_historical_snapshot_packed_data'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EntitySearchEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entity_type', models.CharField(choices=[('gene', 'gene'), ('str', 'str'), ('region', 'region')], max_length=8)),
+                ('entity_id', models.IntegerField()),
+                ('entity_name', models.CharField(max_length=255)),
+                ('gene_symbol', models.CharField(max_length=255, null=True)),
+                ('saved_gel_status', models.IntegerField(null=True)),
+                ('moi', models.CharField(max_length=255, null=True)),
+                ('mode_of_pathogenicity', models.CharField(max_length=255, null=True)),
+                ('penetrance', models.CharField(max_length=255, null=True)),
+                ('tags', django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=255), default=list, size=None)),
+                ('evidences', django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=255), default=list, size=None)),
+                ('panel_types', django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=255), default=list, size=None)),
+                ('panel', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='panels.GenePanel')),
+                ('snapshot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='panels.GenePanelSnapshot')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='entitysearchentry',
+            index=models.Index(fields=['entity_name', 'entity_type', 'entity_id'], name='panels_enti_entity__ab9594_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='entitysearchentry',
+            index=models.Index(fields=['gene_symbol'], name='panels_enti_gene_sy_df9686_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='entitysearchentry',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['tags'], name='panels_enti_tags_9e17d2_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='entitysearchentry',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['evidences'], name='panels_enti_evidenc_98f839_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='entitysearchentry',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['panel_types'], name='panels_enti_panel_t_2bb8e1_gin'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 2.1.10 on 2026-10-18 05:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('panels', '0077_entity_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='activity',
+            index=models.Index(fields=['created', 'id'], name='panels_acti_created_756ac2_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 2.1.10 on 2026-10-18 05:51
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('panels', '0078_activity_created_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gene',
+            name='previous_symbols',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=255), default=list, size=None),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 2.1.10 on 2026-10-18 06:10
+
+from django.contrib.postgres.fields.jsonb import KeyTextTransform
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def populate_panel_version(apps, schema_editor):
+    Activity = apps.get_model("panels", "Activity")
+
+    chunk_size = 50000
+    last_id = Activity.objects.aggregate(Max("id"))["id__max"] or 0
+    for start in range(0, last_id + 1, chunk_size):
+        Activity.objects.filter(
+            id__gte=start, id__lt=start + chunk_size, panel_version__isnull=True
+        ).update(panel_version=KeyTextTransform("panel_version", "extra_data"))
+
+
+def skip(apps, schema_editor):
+    pass
+
+
+class Migration(migrations.Migration):
+    # each chunk is committed separately, so the table isn't locked for the
+    # whole backfill
+    atomic = False
+
+    dependencies = [
+        ('panels', '0079_gene_previous_symbols'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='activity',
+            name='panel_version',
+            field=models.CharField(max_length=32, null=True),
+        ),
+        migrations.RunPython(populate_panel_version, skip),
+        migrations.AddIndex(
+            model_name='activity',
+            index=models.Index(fields=['panel', 'created', 'id'], name='panels_acti_panel_i_c56adc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='activity',
+            index=models.Index(fields=['panel', 'panel_version'], name='panels_acti_panel_i_bd3e8a_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 2.1.10 on 2026-10-18 06:32
+
+from django.db import migrations, models
+from django.db.models import Exists
+from django.db.models import OuterRef
+
+
+def populate_roles(apps, schema_editor):
+    GenePanelSnapshot = apps.get_model("panels", "GenePanelSnapshot")
+    through = GenePanelSnapshot.child_panels.through
+
+    GenePanelSnapshot.objects.update(
+        is_super_panel=Exists(
+            through.objects.filter(from_genepanelsnapshot=OuterRef("pk"))
+        ),
+        is_child_panel=Exists(
+            through.objects.filter(to_genepanelsnapshot=OuterRef("pk"))
+        ),
+    )
+
+
+def skip(apps, schema_editor):
+    pass
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('panels', '0080_activity_panel_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='genepanelsnapshot',
+            name='is_child_panel',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='genepanelsnapshot',
+            name='is_super_panel',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(populate_roles, skip),
+    ]
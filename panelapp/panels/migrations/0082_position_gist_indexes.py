@@ -0,0 +1,30 @@
+# Generated by Django 2.1.10 on 2026-10-18 07:17
+
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('panels', '0081_genepanelsnapshot_roles'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='region',
+            index=django.contrib.postgres.indexes.GistIndex(fields=['position_37'], name='panels_regi_positio_46d35c_gist'),
+        ),
+        migrations.AddIndex(
+            model_name='region',
+            index=django.contrib.postgres.indexes.GistIndex(fields=['position_38'], name='panels_regi_positio_9d7d23_gist'),
+        ),
+        migrations.AddIndex(
+            model_name='str',
+            index=django.contrib.postgres.indexes.GistIndex(fields=['position_37'], name='panels_str_positio_9a66ff_gist'),
+        ),
+        migrations.AddIndex(
+            model_name='str',
+            index=django.contrib.postgres.indexes.GistIndex(fields=['position_38'], name='panels_str_positio_ca028a_gist'),
+        ),
+    ]
@@ -0,0 +1,12 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # the entities cache table is created with `manage.py createcachetable`
+    # when deploying, see ENTITIES_CACHE in the settings
+
+    dependencies = [
+        ('panels', '0082_position_gist_indexes'),
+    ]
+
+    operations = []
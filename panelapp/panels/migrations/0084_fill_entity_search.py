@@ -0,0 +1,96 @@
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.db import migrations
+from django.db import transaction
+from django.db.models import F
+
+
+ENTITY_MODELS = (
+    ("GenePanelEntrySnapshot", "gene", "gene_core__gene_symbol"),
+    ("STR", "str", "name"),
+    ("Region", "region", "name"),
+)
+
+
+def fill_snapshots(apps, snapshot_ids):
+    # frozen copy of EntitySearchManager.refresh as of this migration
+    EntitySearchEntry = apps.get_model("panels", "EntitySearchEntry")
+
+    entries = []
+    for model_name, entity_type, entity_name in ENTITY_MODELS:
+        model = apps.get_model("panels", model_name)
+        entities = (
+            model.objects.filter(panel_id__in=snapshot_ids)
+            .annotate(
+                entity_name=F(entity_name),
+                tag_names=ArrayAgg("tags__name", distinct=True),
+                evidence_names=ArrayAgg("evidence__name", distinct=True),
+                panel_types=ArrayAgg("panel__panel__types__slug", distinct=True),
+            )
+            .values(
+                "pk",
+                "panel_id",
+                "panel__panel_id",
+                "entity_name",
+                "gene_core__gene_symbol",
+                "saved_gel_status",
+                "moi",
+                "mode_of_pathogenicity",
+                "penetrance",
+                "tag_names",
+                "evidence_names",
+                "panel_types",
+            )
+        )
+        for entity in entities:
+            entries.append(
+                EntitySearchEntry(
+                    entity_type=entity_type,
+                    entity_id=entity["pk"],
+                    entity_name=entity["entity_name"],
+                    gene_symbol=entity["gene_core__gene_symbol"],
+                    panel_id=entity["panel__panel_id"],
+                    snapshot_id=entity["panel_id"],
+                    saved_gel_status=entity["saved_gel_status"],
+                    moi=entity["moi"],
+                    mode_of_pathogenicity=entity["mode_of_pathogenicity"],
+                    penetrance=entity["penetrance"],
+                    tags=[name for name in entity["tag_names"] if name],
+                    evidences=[name for name in entity["evidence_names"] if name],
+                    panel_types=[slug for slug in entity["panel_types"] if slug],
+                )
+            )
+
+    with transaction.atomic():
+        EntitySearchEntry.objects.filter(snapshot_id__in=snapshot_ids).delete()
+        EntitySearchEntry.objects.bulk_create(entries)
+
+
+def fill_entity_search(apps, schema_editor):
+    GenePanel = apps.get_model("panels", "GenePanel")
+
+    chunk_size = 50
+    snapshot_ids = list(
+        GenePanel.objects.filter(active_snapshot__isnull=False)
+        .order_by("pk")
+        .values_list("active_snapshot_id", flat=True)
+    )
+    for start in range(0, len(snapshot_ids), chunk_size):
+        fill_snapshots(apps, snapshot_ids[start : start + chunk_size])
+
+
+def skip(apps, schema_editor):
+    pass
+
+
+class Migration(migrations.Migration):
+    # each chunk is committed separately, so the panels aren't locked for the
+    # whole backfill
+    atomic = False
+
+    dependencies = [
+        ('panels', '0083_entities_cache_table'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_entity_search, skip),
+    ]
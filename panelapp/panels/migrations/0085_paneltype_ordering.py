@@ -0,0 +1,17 @@
+# Generated by Django 2.1.10 on 2026-10-18 07:59
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('panels', '0084_fill_entity_search'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='paneltype',
+            options={'ordering': ['name']},
+        ),
+    ]
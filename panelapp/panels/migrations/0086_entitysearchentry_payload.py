@@ -0,0 +1,21 @@
+# Generated by Django 2.1.10 on 2026-10-18 08:07
+
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # existing entries are serialized from the entities until they're rebuilt,
+    # after any change or with the rebuild_entity_search command
+
+    dependencies = [
+        ('panels', '0085_paneltype_ordering'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='entitysearchentry',
+            name='payload',
+            field=django.contrib.postgres.fields.jsonb.JSONField(null=True),
+        ),
+    ]
@@ -70,4 +70,6 @@ from .import_tools import UploadedReviewsList  # noqa
 from .strs import STR  # noqa
 from .region import Region  # noqa
 from .panel_types import PanelType  # noqa
-from .historical_snapshot import HistoricalSnapshot #noqa
+from .entity_search import EntitySearchEntry  # noqa
+from .historical_snapshot import HistoricalSnapshot  # noqa
+from .historical_snapshot import HistoricalGeneData  # noqa
@@ -52,6 +52,11 @@ class ActivityManager(models.Manager):
 class Activity(TimeStampedModel):
     class Meta:
         ordering = ("-created",)
+        indexes = [
+            models.Index(fields=["created", "id"]),
+            models.Index(fields=["panel", "created", "id"]),
+            models.Index(fields=["panel", "panel_version"]),
+        ]
 
     objects = ActivityManager()
 
@@ -61,12 +66,9 @@ class Activity(TimeStampedModel):
     item_type = models.CharField(max_length=32, null=True)  # TODO (Oleg) change to Enum
     entity_type = models.CharField(max_length=32, null=True)
     entity_name = models.CharField(max_length=128, null=True)
+    panel_version = models.CharField(max_length=32, null=True)
     extra_data = JSONField(default=dict, encoder=DjangoJSONEncoder)
 
-    @property
-    def panel_version(self):
-        return self.extra_data.get("panel_version")
-
     @property
     def panel_name(self):
         return self.extra_data.get("panel_name")
@@ -77,6 +79,12 @@ class Activity(TimeStampedModel):
 
     @classmethod
     def log(cls, user, panel_snapshot, text, extra_info):
+        cls.build(user, panel_snapshot, text, extra_info).save()
+
+    @classmethod
+    def build(cls, user, panel_snapshot, text, extra_info):
+        """Activity instance which isn't saved yet, used for bulk inserts"""
+
         extra_data = deepcopy(extra_info)
 
         if user:
@@ -93,7 +101,7 @@ class Activity(TimeStampedModel):
         else:
             extra_data["item_type"] = "panel"
 
-        cls.objects.create(
+        return cls(
             user=user,
             panel=panel_snapshot.panel,
             text=text,
@@ -101,4 +109,5 @@ class Activity(TimeStampedModel):
             item_type=extra_data["item_type"],
             entity_type=extra_data.get("entity_type"),
             entity_name=extra_data.get("entity_name"),
+            panel_version=extra_data["panel_version"],
         )
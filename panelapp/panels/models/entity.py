@@ -28,6 +28,8 @@ Author: Oleg Gerasimenko
 (c) 2018 Genomics England
 """
 
+from contextlib import contextmanager
+from functools import wraps
 from django.db.models import Manager
 from django.db.models import Count
 from django.db.models import Subquery
@@ -39,27 +41,36 @@ from .comment import Comment
 from .trackrecord import TrackRecord
 from .evidence import Evidence
 from .genepanel import GenePanel
+from panels.cache import entities_cache
+from panels.tsv import all_genes_export
 from panels.templatetags.panel_helpers import get_gene_list_data
 from panels.templatetags.panel_helpers import GeneDataType
 
 
+def tracks_panel_stats(method):
+    """Apply changes made by the entity method to the panel stats"""
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.track_panel_stats():
+            return method(self, *args, **kwargs)
+
+    return wrapper
+
+
 class EntityManager(Manager):
     """Entity Objects manager."""
 
+    entity_type = None
+
     def get_latest_ids(self, deleted=False):
         """Get latest GenePanelSnapshot ids"""
 
-        qs = super().get_queryset()
+        qs = GenePanel.objects.filter(active_snapshot__isnull=False)
         if not deleted:
-            qs = qs.exclude(panel__panel__status=GenePanel.STATUS.deleted)
+            qs = qs.exclude(status=GenePanel.STATUS.deleted)
 
-        return (
-            qs.distinct("panel__panel_id")
-            .values_list("panel_id", flat=True)
-            .order_by(
-                "panel__panel_id", "-panel__major_version", "-panel__minor_version"
-            )
-        )
+        return qs.values_list("active_snapshot_id", flat=True)
 
     def get_active(self, deleted=False, gene_symbol=None, name=None, pks=None):
         """Get active Entities"""
@@ -95,9 +106,19 @@ class EntityManager(Manager):
         )
 
     def get_gene_panels(self, gene_symbol, deleted=False, pks=None):
-        """Get panels for the specified Gene"""
+        """Get panels for the specified Gene, see `EntitySearchEntry`"""
 
-        return self.get_active(deleted=deleted, gene_symbol=gene_symbol, pks=pks)
+        from .entity_search import EntitySearchEntry
+
+        entries = EntitySearchEntry.objects.get_active(
+            all=True, internal=True, deleted=deleted
+        ).filter(entity_type=self.entity_type, gene_symbol=gene_symbol)
+        if pks:
+            entries = entries.filter(snapshot_id__in=pks)
+
+        return self.get_active(deleted=deleted, pks=pks).filter(
+            pk__in=entries.order_by().values("entity_id")
+        )
 
 
 class AbstractEntity:
@@ -131,17 +152,24 @@ class AbstractEntity:
         if self.flagged:
             return 0
 
+        gel_status = self.get_evidence_status(self.evidence.all())
+
+        if update:
+            self.saved_gel_status = gel_status
+            self.save()
+
+        return gel_status
+
+    @staticmethod
+    def get_evidence_status(evidences):
+        """Status for the list of evidences, see `evidence_status`"""
+
         gel_status = 0
         has_gel_reviews = False
-        for evidence in self.evidence.all():
+        for evidence in evidences:
             if evidence.is_GEL:
                 has_gel_reviews = True
                 if evidence.name in evidence.EXPERT_REVIEWS:
-                    if update:
-                        self.saved_gel_status = evidence.EXPERT_REVIEWS.get(
-                            evidence.name
-                        )
-                        self.save()
                     return evidence.EXPERT_REVIEWS.get(evidence.name)
                 if (
                     evidence.name in evidence.HIGH_CONFIDENCE_SOURCES
@@ -155,12 +183,42 @@ class AbstractEntity:
         if gel_status > 3:
             gel_status = 3
 
-        if update:
-            self.saved_gel_status = gel_status
-            self.save()
-
         return gel_status
 
+    def get_stats_contribution(self):
+        """Values this entity adds to the panel stats
+
+        See `GenePanelSnapshot._get_stats`
+        """
+
+        evaluators = list(self.evaluation.values_list("user_id", flat=True))
+        return {
+            "entity_type": self._entity_type,
+            "evaluated": len(evaluators) > 0,
+            "ready": bool(self.ready),
+            "green": self.saved_gel_status is not None and self.saved_gel_status >= 3,
+            "reviewers": sorted(set(user_id for user_id in evaluators if user_id)),
+        }
+
+    @contextmanager
+    def track_panel_stats(self):
+        """Update panel stats with the changes made to this entity inside the block
+
+        Nested blocks are ignored, so the change is applied only once.
+        """
+
+        if getattr(self, "_tracking_panel_stats", False):
+            yield
+            return
+
+        self._tracking_panel_stats = True
+        try:
+            before = self.get_stats_contribution()
+            yield
+            self.panel.update_entity_stats(before, self.get_stats_contribution())
+        finally:
+            self._tracking_panel_stats = False
+
     def is_str(self):
         # TODO (Oleg) enums... we need enums
         return self._entity_type == "str"
@@ -218,6 +276,7 @@ class AbstractEntity:
         else:
             return False
 
+    @tracks_panel_stats
     def add_review_comment(self, user, comment):
         comment = Comment.objects.create(
             user=user,
@@ -235,6 +294,7 @@ class AbstractEntity:
         evaluation.comments.add(comment)
         self.panel.add_activity(user, "Added comment: {}".format(comment.comment), self)
 
+    @tracks_panel_stats
     def delete_evaluation(self, evaluation_pk, user=None):
         self.evaluation.get(pk=evaluation_pk).delete()
         if user:
@@ -303,6 +363,7 @@ class AbstractEntity:
             evaluation__in=self.evaluation.values_list("pk", flat=True)
         ).prefetch_related("user", "user__reviewer")
 
+    @tracks_panel_stats
     def clear_evidences(self, user, evidence=None):
         """Remove sources from this entity. If `evidence` argument provided, check only that source"""
 
@@ -342,6 +403,7 @@ class AbstractEntity:
 
         return True
 
+    @tracks_panel_stats
     def set_rating(self, user, status=None):
         """This method is used when a GeL curator changes the rating via website"""
 
@@ -406,6 +468,7 @@ class AbstractEntity:
         self.save()
         return True
 
+    @tracks_panel_stats
     def mark_as_ready(self, user, ready_comment):
         self.ready = True
 
@@ -447,6 +510,13 @@ class AbstractEntity:
                 tracks.append((TrackRecord.ISSUE_TYPES.AddedTag, description))
 
             if tracks:
+                entities_cache.invalidate()
+                all_genes_export.invalidate()
+                # tags don't increment the version, mark the panel as modified
+                # so its cached API responses aren't used
+                type(self.panel).objects.filter(pk=self.panel_id).update(
+                    modified=timezone.now()
+                )
                 description = "\n".join([t[1] for t in tracks])
                 track = TrackRecord.objects.create(
                     gel_status=self.status,
@@ -544,6 +614,7 @@ class AbstractEntity:
                 user, "Comment on publications: {}".format(publications_comment)
             )
 
+    @tracks_panel_stats
     def update_rating(self, rating, user, rating_comment=None):
         rating_set = self.set_rating(user, rating)
         if not rating_set:
@@ -560,6 +631,7 @@ class AbstractEntity:
             user, "Classified {} as {}".format(self.label, human_status), self
         )
 
+    @tracks_panel_stats
     def update_evaluation(self, user, evaluation_data):
         """
         This method adds or updates an evaluation in case the user has already
@@ -679,18 +751,8 @@ class AbstractEntity:
             return evaluation
 
         except Evaluation.DoesNotExist:
-            evaluation = Evaluation.objects.create(
-                user=user,
-                rating=evaluation_data.get("rating"),
-                mode_of_pathogenicity=evaluation_data.get("mode_of_pathogenicity"),
-                publications=evaluation_data.get("publications"),
-                phenotypes=evaluation_data.get("phenotypes"),
-                moi=evaluation_data.get("moi"),
-                current_diagnostic=evaluation_data.get("current_diagnostic"),
-                clinically_relevant=evaluation_data.get("clinically_relevant"),
-                version=self.panel.version,
-                last_updated=timezone.now(),
-            )
+            evaluation = self.build_evaluation(user, evaluation_data)
+            evaluation.save()
             self.evaluation.add(evaluation)
 
             if evaluation_data.get("comment"):
@@ -702,42 +764,60 @@ class AbstractEntity:
                 )
                 evaluation.comments.add(comment)
 
-            if evaluation.is_comment_without_review():
-                activity_text = "commented on {}".format(self.label)
-            else:
-                activities = [
-                    "Rating: {}".format(evaluation_data.get("rating")),
-                    "Mode of pathogenicity: {}".format(
-                        evaluation_data.get("mode_of_pathogenicity")
-                    ),
-                    "Publications: {}".format(
-                        ", ".join(evaluation_data.get("publications"))
-                    ),
-                    "Phenotypes: {}".format(
-                        ", ".join(evaluation_data.get("phenotypes"))
-                    ),
-                    "Mode of inheritance: {}".format(evaluation_data.get("moi")),
-                ]
-                if evaluation_data.get("current_diagnostic"):
-                    activities.append(
-                        "Current diagnostic: {}".format(
-                            "yes" if evaluation_data.get("current_diagnostic") else "no"
-                        )
+            activity_text = self.get_new_evaluation_activity(
+                evaluation, evaluation_data
+            )
+            self.panel.add_activity(user, activity_text, self)
+            return evaluation
+
+    def build_evaluation(self, user, evaluation_data):
+        """New evaluation by the user, it isn't saved to the database"""
+
+        return Evaluation(
+            user=user,
+            rating=evaluation_data.get("rating"),
+            mode_of_pathogenicity=evaluation_data.get("mode_of_pathogenicity"),
+            publications=evaluation_data.get("publications"),
+            phenotypes=evaluation_data.get("phenotypes"),
+            moi=evaluation_data.get("moi"),
+            current_diagnostic=evaluation_data.get("current_diagnostic"),
+            clinically_relevant=evaluation_data.get("clinically_relevant"),
+            version=self.panel.version,
+            last_updated=timezone.now(),
+        )
+
+    def get_new_evaluation_activity(self, evaluation, evaluation_data):
+        """Activity text for a newly added evaluation"""
+
+        if evaluation.is_comment_without_review():
+            activity_text = "commented on {}".format(self.label)
+        else:
+            activities = [
+                "Rating: {}".format(evaluation_data.get("rating")),
+                "Mode of pathogenicity: {}".format(
+                    evaluation_data.get("mode_of_pathogenicity")
+                ),
+                "Publications: {}".format(
+                    ", ".join(evaluation_data.get("publications"))
+                ),
+                "Phenotypes: {}".format(", ".join(evaluation_data.get("phenotypes"))),
+                "Mode of inheritance: {}".format(evaluation_data.get("moi")),
+            ]
+            if evaluation_data.get("current_diagnostic"):
+                activities.append(
+                    "Current diagnostic: {}".format(
+                        "yes" if evaluation_data.get("current_diagnostic") else "no"
                     )
-                if evaluation_data.get("clinically_relevant"):
-                    activities.append(
-                        "Clinically relevant: {}".format(
-                            "yes"
-                            if evaluation_data.get("clinically_relevant")
-                            else "no"
-                        )
+                )
+            if evaluation_data.get("clinically_relevant"):
+                activities.append(
+                    "Clinically relevant: {}".format(
+                        "yes" if evaluation_data.get("clinically_relevant") else "no"
                     )
-                activity_text = "reviewed {}: {}".format(
-                    self.label, "; ".join(activities)
                 )
+            activity_text = "reviewed {}: {}".format(self.label, "; ".join(activities))
 
-            self.panel.add_activity(user, activity_text, self)
-            return evaluation
+        return activity_text
 
     @property
     def gene_list_class(self):
@@ -0,0 +1,293 @@
+##
+## Copyright (c) 2016-2019 Genomics England Ltd.
+##
+## This file is part of PanelApp
+## (see https://panelapp.genomicsengland.co.uk).
+##
+## Licensed to the Apache Software Foundation (ASF) under one
+## or more contributor license agreements.  See the NOTICE file
+## distributed with this work for additional information
+## regarding copyright ownership.  The ASF licenses this file
+## to you under the Apache License, Version 2.0 (the
+## "License"); you may not use this file except in compliance
+## with the License.  You may obtain a copy of the License at
+##
+##   http://www.apache.org/licenses/LICENSE-2.0
+##
+## Unless required by applicable law or agreed to in writing,
+## software distributed under the License is distributed on an
+## "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+## KIND, either express or implied.  See the License for the
+## specific language governing permissions and limitations
+## under the License.
+##
+import operator
+from collections import defaultdict
+from functools import reduce
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.fields import JSONField
+from django.contrib.postgres.indexes import GinIndex
+from django.db import models
+from django.db import transaction
+from django.db.models import F
+from django.db.models import Q
+from django.db.models import Value
+from django.db.models.signals import m2m_changed
+from django.db.models.signals import post_delete
+from django.db.models.signals import post_save
+from panels.cache import entity_search
+from .genepanel import GenePanel
+from .genepanelsnapshot import GenePanelSnapshot
+from .genepanelentrysnapshot import GenePanelEntrySnapshot
+from .strs import STR
+from .region import Region
+
+
+ENTITY_MODELS = (
+    (GenePanelEntrySnapshot, "gene", "gene_core__gene_symbol"),
+    (STR, "str", "name"),
+    (Region, "region", "name"),
+)
+
+
+class EntitySearchManager(models.Manager):
+    def get_active(self, panel_names=None, all=False, internal=False, deleted=False):
+        """Entries for the active versions of the panels
+
+        Answers which panels contain an entity from the `gene_symbol` or
+        `entity_name` index, without joining the entities.
+
+        :param panel_names: list of panel names, all panels if empty
+        :param all: include panels which aren't public or promoted
+        :param internal: include internal panels, with `all`
+        :param deleted: include deleted panels, with `all`
+        :return: QuerySet ordered by entity name
+        """
+
+        qs = self.filter(snapshot_id=F("panel__active_snapshot_id"))
+        if not all:
+            qs = qs.filter(
+                panel__status__in=[GenePanel.STATUS.public, GenePanel.STATUS.promoted]
+            )
+        else:
+            if not internal:
+                qs = qs.exclude(panel__status=GenePanel.STATUS.internal)
+            if not deleted:
+                qs = qs.exclude(panel__status=GenePanel.STATUS.deleted)
+        if panel_names:
+            qs = qs.filter(panel__name__in=panel_names)
+
+        return qs.order_by("entity_name", "entity_type", "entity_id")
+
+    def get_entities(self, entries):
+        """Genes, STRs and regions of the entries, in the same order
+
+        :param entries: list of dicts with entity_type, entity_id and snapshot_id
+        :return: list of entities annotated with entity_type and entity_name
+        """
+
+        entities = {}
+        for model, entity_type, _ in ENTITY_MODELS:
+            selected = [e for e in entries if e["entity_type"] == entity_type]
+            if not selected:
+                continue
+
+            qs = model.objects.get_active(
+                pks=list({entry["snapshot_id"] for entry in selected})
+            ).filter(pk__in=[entry["entity_id"] for entry in selected])
+            for entity in qs:
+                entities[(entity_type, entity.pk)] = entity
+
+        return [
+            entities[(entry["entity_type"], entry["entity_id"])]
+            for entry in entries
+            if (entry["entity_type"], entry["entity_id"]) in entities
+        ]
+
+    def serialize(self, entries):
+        """API representation of the entities of the entries, in the same order
+
+        Entities are read from the payloads, only the panel versions are
+        loaded. Entries without a payload, i.e. not rebuilt since the payload
+        was added, are serialized from the entities.
+
+        :param entries: list of dicts with entity_type, entity_id, snapshot_id
+            and payload
+        :return: dict with the (entity type, entity id) and the representation,
+            without the entries of deleted entities
+        """
+
+        from api.v1.serializers import EntitySerializer
+        from api.v1.serializers import PanelSerializer
+
+        missing = [entry for entry in entries if entry["payload"] is None]
+        entities = self.get_entities(missing)
+        serialized = dict(
+            zip(
+                ((entity.entity_type, entity.pk) for entity in entities),
+                EntitySerializer(entities, many=True).data,
+            )
+        )
+
+        snapshots = (
+            GenePanelSnapshot.objects.filter(
+                pk__in={entry["snapshot_id"] for entry in entries if entry["payload"]}
+            )
+            .select_related("panel", "level4title")
+            .prefetch_related("panel__types")
+        )
+        panels = {snapshot.pk: PanelSerializer(snapshot).data for snapshot in snapshots}
+
+        results = {}
+        for entry in entries:
+            key = (entry["entity_type"], entry["entity_id"])
+            if entry["payload"] is not None:
+                results[key] = dict(
+                    entry["payload"], panel=panels[entry["snapshot_id"]]
+                )
+            elif key in serialized:
+                results[key] = serialized[key]
+        return results
+
+    def refresh(self, snapshot_ids, entities=()):
+        """Rebuild the entries for the entities
+
+        :param snapshot_ids: list of GenePanelSnapshot ids, all entities of
+            these panel versions are rebuilt
+        :param entities: list of (entity type, entity id) tuples
+        """
+
+        snapshot_ids = list(snapshot_ids)
+        entity_ids = defaultdict(list)
+        for entity_type, entity_id in entities:
+            entity_ids[entity_type].append(entity_id)
+
+        selected = [Q(snapshot_id__in=snapshot_ids)] + [
+            Q(entity_type=entity_type, entity_id__in=ids)
+            for entity_type, ids in entity_ids.items()
+        ]
+
+        # the panel is serialized when the entries are read, see `serialize`,
+        # so the payloads don't change with the panel
+        from api.v1.serializers import GeneSerializer
+        from api.v1.serializers import STRSerializer
+        from api.v1.serializers import RegionSerializer
+
+        serializers = {
+            "gene": GeneSerializer(no_panel=True),
+            "str": STRSerializer(no_panel=True),
+            "region": RegionSerializer(no_panel=True),
+        }
+
+        entries = []
+        for model, entity_type, entity_name in ENTITY_MODELS:
+            entities = (
+                model.objects.filter(
+                    Q(panel_id__in=snapshot_ids) | Q(pk__in=entity_ids[entity_type])
+                )
+                .annotate(
+                    entity_type=Value(entity_type, output_field=models.CharField()),
+                    entity_name=F(entity_name),
+                    tag_names=ArrayAgg("tags__name", distinct=True),
+                    evidence_names=ArrayAgg("evidence__name", distinct=True),
+                    panel_types=ArrayAgg("panel__panel__types__slug", distinct=True),
+                )
+                .select_related("panel", "gene_core")
+                .prefetch_related("tags", "evidence")
+            )
+            for entity in entities:
+                entries.append(
+                    self.model(
+                        entity_type=entity_type,
+                        entity_id=entity.pk,
+                        entity_name=entity.entity_name,
+                        gene_symbol=entity.gene_core.gene_symbol
+                        if entity.gene_core
+                        else None,
+                        panel_id=entity.panel.panel_id,
+                        snapshot_id=entity.panel_id,
+                        saved_gel_status=entity.saved_gel_status,
+                        moi=entity.moi,
+                        mode_of_pathogenicity=entity.mode_of_pathogenicity,
+                        penetrance=entity.penetrance,
+                        tags=[name for name in entity.tag_names if name],
+                        evidences=[name for name in entity.evidence_names if name],
+                        panel_types=[slug for slug in entity.panel_types if slug],
+                        payload=serializers[entity_type].to_representation(entity),
+                    )
+                )
+
+        with transaction.atomic():
+            self.filter(reduce(operator.or_, selected)).delete()
+            self.bulk_create(entries)
+
+
+class EntitySearchEntry(models.Model):
+    """Searchable columns of the genes, STRs and regions in one table
+
+    Entries of an entity are rebuilt when it changes, all entries of a panel
+    version when its panel types change or the gene collection is updated, see
+    `panels.cache.EntitySearchRefresh`. Panel name and status are read from
+    the panel, so entries don't change when the panel is updated.
+    The payload is the API representation of the entity without the panel.
+    """
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["entity_name", "entity_type", "entity_id"]),
+            models.Index(fields=["gene_symbol"]),
+            GinIndex(fields=["tags"]),
+            GinIndex(fields=["evidences"]),
+            GinIndex(fields=["panel_types"]),
+        ]
+
+    ENTITY_TYPES = [(entity_type, entity_type) for _, entity_type, _ in ENTITY_MODELS]
+
+    entity_type = models.CharField(max_length=8, choices=ENTITY_TYPES)
+    entity_id = models.IntegerField()
+    entity_name = models.CharField(max_length=255)
+    gene_symbol = models.CharField(max_length=255, null=True)
+    panel = models.ForeignKey(GenePanel, on_delete=models.CASCADE, related_name="+")
+    snapshot = models.ForeignKey(
+        GenePanelSnapshot, on_delete=models.CASCADE, related_name="+"
+    )
+    saved_gel_status = models.IntegerField(null=True)
+    moi = models.CharField(max_length=255, null=True)
+    mode_of_pathogenicity = models.CharField(max_length=255, null=True)
+    penetrance = models.CharField(max_length=255, null=True)
+    tags = ArrayField(models.CharField(max_length=255), default=list)
+    evidences = ArrayField(models.CharField(max_length=255), default=list)
+    panel_types = ArrayField(models.CharField(max_length=255), default=list)
+    payload = JSONField(null=True)
+
+    objects = EntitySearchManager()
+
+    def __str__(self):
+        return "{} {}".format(self.entity_type, self.entity_name)
+
+
+def entity_changed(sender, instance, **kwargs):
+    entity_search.add_entities([instance])
+
+
+def entity_relations_changed(sender, instance, action, reverse, **kwargs):
+    # entities only change their own tags and evidences
+    if not reverse and action in ("post_add", "post_remove", "post_clear"):
+        entity_search.add_entities([instance], positions_changed=False)
+
+
+def panel_types_changed(sender, instance, action, reverse, **kwargs):
+    if not reverse and action in ("post_add", "post_remove", "post_clear"):
+        entity_search.add_panels(
+            [instance.active_snapshot_id], positions_changed=False
+        )
+
+
+for model, _, _ in ENTITY_MODELS:
+    post_save.connect(entity_changed, sender=model)
+    post_delete.connect(entity_changed, sender=model)
+    m2m_changed.connect(entity_relations_changed, sender=model.tags.through)
+    m2m_changed.connect(entity_relations_changed, sender=model.evidence.through)
+
+m2m_changed.connect(panel_types_changed, sender=GenePanel.types.through)
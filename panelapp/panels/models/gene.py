@@ -25,6 +25,7 @@ from datetime import datetime
 from django.core.exceptions import ValidationError
 from django.db import models
 from django.contrib.postgres.fields import JSONField, ArrayField
+from panels.gene_names import gene_names
 
 
 class Gene(models.Model):
@@ -40,6 +41,7 @@ class Gene(models.Model):
     hgnc_release = models.DateField(null=True)
     hgnc_id = models.CharField(max_length=255, null=True)
     active = models.BooleanField(default=True, db_index=True)
+    previous_symbols = ArrayField(models.CharField(max_length=255), default=list)
 
     class Meta:
         indexes = [models.Index(fields=["gene_symbol", "active"])]
@@ -51,6 +53,10 @@ class Gene(models.Model):
             gene_name=self.gene_name,
         )
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        gene_names.invalidate()
+
     def dict_tr(self):
         return {
             "gene_symbol": self.gene_symbol,
@@ -68,7 +74,7 @@ class Gene(models.Model):
 
     def clean_import_dates(self, record):
         try:
-            self.full_clean()
+            self.clean_fields()
         except ValidationError as err:
             if "hgnc_date_symbol_changed" in err.error_dict:
                 val = record.get("hgnc_date_symbol_changed", None)
@@ -30,6 +30,9 @@ from django.urls import reverse
 from django.utils.functional import cached_property
 from model_utils import Choices
 from model_utils.models import TimeStampedModel
+from panels.cache import entities_cache
+from panels.panel_names import panel_names
+from panels.tsv import all_genes_export
 from .panel_types import PanelType
 
 
@@ -55,6 +58,14 @@ class GenePanel(TimeStampedModel):
         choices=STATUS, default=STATUS.internal, max_length=36, db_index=True
     )
     types = models.ManyToManyField(PanelType)
+    active_snapshot = models.ForeignKey(
+        "GenePanelSnapshot",
+        null=True,
+        blank=True,
+        editable=False,
+        related_name="+",
+        on_delete=models.SET_NULL,
+    )  # maintained by GenePanelSnapshot.save, see `update_active_snapshot`
 
     objects = GenePanelManager()
 
@@ -62,6 +73,59 @@ class GenePanel(TimeStampedModel):
         ap = self.active_panel
         return "{} version {}.{}".format(self.name, ap.major_version, ap.minor_version)
 
+    def save(self, *args, **kwargs):
+        """Never overwrite `active_snapshot` from a possibly stale instance"""
+
+        status_changed = False
+        identifiers_changed = False
+        if not self._state.adding:
+            if kwargs.get("update_fields") is None:
+                kwargs["update_fields"] = [
+                    field.name
+                    for field in self._meta.concrete_fields
+                    if not field.primary_key and field.name != "active_snapshot"
+                ]
+            checked_fields = {"name", "old_pk", "status"}.intersection(
+                kwargs["update_fields"]
+            )
+            if checked_fields:
+                stored = (
+                    GenePanel.objects.filter(pk=self.pk).values(*checked_fields).first()
+                    or {}
+                )
+                changed = {
+                    field for field in stored if stored[field] != getattr(self, field)
+                }
+                status_changed = "status" in changed
+                identifiers_changed = bool(changed & {"name", "old_pk"})
+
+        super().save(*args, **kwargs)
+
+        if status_changed:
+            entities_cache.invalidate()
+            all_genes_export.invalidate()
+        if identifiers_changed:
+            panel_names.invalidate()
+
+    def update_active_snapshot(self):
+        """Point `active_snapshot` to the snapshot with the largest version"""
+
+        had_snapshot = self.active_snapshot_id is not None
+        self.active_snapshot_id = (
+            self.genepanelsnapshot_set.order_by(
+                "-major_version", "-minor_version", "-modified", "-pk"
+            )
+            .values_list("pk", flat=True)
+            .first()
+        )
+        GenePanel.objects.filter(pk=self.pk).update(
+            active_snapshot_id=self.active_snapshot_id
+        )
+
+        if had_snapshot != (self.active_snapshot_id is not None):
+            # panel has been added or all its versions removed
+            panel_names.invalidate()
+
     @property
     def unique_id(self):
         return self.old_pk if self.old_pk else str(self.pk)
@@ -36,7 +36,6 @@ from django.contrib.postgres.fields import IntegerRangeField
 from model_utils.models import TimeStampedModel
 
 from .gene import Gene
-from .genepanel import GenePanel
 from .evidence import Evidence
 from .evaluation import Evaluation
 from .trackrecord import TrackRecord
@@ -50,24 +49,7 @@ from .entity import EntityManager
 class GenePanelEntrySnapshotManager(EntityManager):
     """Objects manager for GenePanelEntrySnapshot."""
 
-    def get_latest_ids(self, deleted=False):
-        """Get GenePanelSnapshot ids"""
-
-        qs = super().get_queryset()
-        if not deleted:
-            qs = qs.exclude(panel__panel__status=GenePanel.STATUS.deleted)
-
-        return (
-            qs.distinct("panel__panel_id")
-            .values_list("panel_id", flat=True)
-            .order_by(
-                "panel__panel_id",
-                "-panel__major_version",
-                "-panel__minor_version",
-                "-panel__modified",
-                "-panel_id",
-            )
-        )
+    entity_type = "gene"
 
     def get_active_slim(self, pks):
         qs = super().get_queryset().filter(panel_id__in=pks)
@@ -118,11 +100,6 @@ class GenePanelEntrySnapshotManager(EntityManager):
             )
         )
 
-    def get_gene_panels(self, gene_symbol, deleted=False, pks=None):
-        """Get panels for the specified gene"""
-
-        return self.get_active(deleted=deleted, gene_symbol=gene_symbol, pks=pks)
-
 
 class GenePanelEntrySnapshot(AbstractEntity, TimeStampedModel):
     class Meta:
@@ -131,6 +108,7 @@ class GenePanelEntrySnapshot(AbstractEntity, TimeStampedModel):
         indexes = [
             models.Index(fields=["ready"]),
             models.Index(fields=["saved_gel_status"]),
+            models.Index(fields=["panel", "gene_core"]),
         ]
 
     panel = models.ForeignKey(GenePanelSnapshot, on_delete=models.CASCADE)
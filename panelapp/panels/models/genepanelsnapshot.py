@@ -23,16 +23,19 @@
 ##
 import logging
 import itertools
+from collections import defaultdict
 from psycopg2.extras import NumericRange
 from copy import deepcopy
-from django.core.cache import cache
 from django.db import models
 from django.db.utils import DatabaseError
 from django.db import transaction
 from django.db.models import Count
 from django.db.models import Case
-from django.db.models import When
+from django.db.models import Exists
+from django.db.models import Func
+from django.db.models import OuterRef
 from django.db.models import Subquery
+from django.db.models import When
 from django.db.models import CharField, Value as V
 from django.db.models.functions import Concat
 from django.db.models import Q, Value
@@ -41,14 +44,21 @@ from django.urls import reverse
 from django.utils import timezone
 from django.contrib.postgres.fields import ArrayField
 from django.contrib.postgres.aggregates import ArrayAgg
+from django.db.models.signals import m2m_changed
 from django.utils.functional import cached_property
 from model_utils.models import TimeStampedModel
 
 from accounts.models import User
 from panels.tasks import email_panel_promoted
 from panels.exceptions import IsSuperPanelException
+from panels.cache import entities_cache
+from panels.cache import entity_search
+from panels.panel_names import panel_names
+from panels.cache import super_panel_increments
+from panels.tsv import all_genes_export
 from .activity import Activity
 from .genepanel import GenePanel
+from .panel_types import PanelType
 from .Level4Title import Level4Title
 from .trackrecord import TrackRecord
 from .evidence import Evidence
@@ -56,24 +66,21 @@ from .evaluation import Evaluation
 from .gene import Gene
 from .comment import Comment
 from .tag import Tag
-from panels.tasks import increment_panel_async
 
 
 class GenePanelSnapshotManager(models.Manager):
     def get_latest_ids(self, deleted=False, exclude_superpanels=False):
-        """Get latest versions for GenePanelsSnapshots"""
+        """Get latest versions for GenePanelsSnapshots
 
-        qs = super().get_queryset()
+        Reads `GenePanel.active_snapshot` pointer which is maintained on save,
+        so we don't need to sort the whole snapshots table.
+        """
+
+        qs = super().get_queryset().filter(panel__active_snapshot=models.F("pk"))
         if not deleted:
             qs = qs.exclude(panel__status=GenePanel.STATUS.deleted)
 
-        return (
-            qs.distinct("panel_id")
-            .values("pk")
-            .order_by(
-                "panel_id", "-major_version", "-minor_version", "-modified", "-pk"
-            )
-        )
+        return qs.values("pk")
 
     def get_active(
         self,
@@ -111,29 +118,35 @@ class GenePanelSnapshotManager(models.Manager):
 
         if not superpanels:
             # exclude super panels when incrementing versions for all panels
-            qs = qs.annotate(child_panels_count=Count("child_panels")).exclude(
-                child_panels_count__gt=0
-            )
+            qs = qs.exclude(is_super_panel=True)
+
+        qs = qs.filter(panel__active_snapshot=models.F("pk"))
+        if not deleted:
+            qs = qs.exclude(panel__status=GenePanel.STATUS.deleted)
 
-        qs = qs.filter(pk__in=Subquery(self.get_latest_ids(deleted)))
+        ordering = [
+            "level4title__name", "-major_version", "-minor_version", "-modified", "-pk"
+        ]
 
         if name:
-            if name.isdigit():
-                filters = Q(panel_id=name)
-            else:
-                filters = (
-                    Q(panel__old_pk=name)
-                    | Q(panel__name=name)
-                    | Q(old_panels__contains=[name])
-                    | Q(panel__name__icontains=name)
-                )
-            qs = qs.filter(filters)
+            # matching panels ranked by the in-process map, best matches first
+            matches = panel_names.find(name)
+            qs = qs.filter(panel_id__in=[panel_id for panel_id, rank in matches])
+            ordering.insert(
+                0,
+                Case(
+                    *[
+                        When(panel_id=panel_id, then=Value(rank))
+                        for panel_id, rank in matches
+                    ],
+                    default=Value(panel_names.SUBSTRING),
+                    output_field=models.IntegerField(),
+                ),
+            )
 
         return qs.prefetch_related(
             "panel", "panel__types", "child_panels", "level4title"
-        ).order_by(
-            "level4title__name", "-major_version", "-minor_version", "-modified", "-pk"
-        )
+        ).order_by(*ordering)
 
     def get_active_annotated(
         self, all=False, deleted=False, internal=False, name=None, panel_types=None, superpanels=True
@@ -146,19 +159,14 @@ class GenePanelSnapshotManager(models.Manager):
 
     def annotate_panels(self, qs):
         return qs.annotate(
-            child_panels_count=Count("child_panels"),
-            superpanels_count=Count("genepanelsnapshot"),
-            panel_type_slugs=ArrayAgg("panel__types__slug", distinct=True),
-        ).annotate(
-            is_super_panel=Case(
-                When(child_panels_count__gt=0, then=Value(True)),
-                default=Value(False),
-                output_field=models.BooleanField(),
-            ),
-            is_child_panel=Case(
-                When(superpanels_count__gt=0, then=Value(True)),
-                default=Value(False),
-                output_field=models.BooleanField(),
+            panel_type_slugs=Func(
+                Subquery(
+                    PanelType.objects.filter(genepanel=OuterRef("panel_id"))
+                    .order_by("slug")
+                    .values("slug")
+                ),
+                function="ARRAY",
+                output_field=ArrayField(models.CharField()),
             ),
             unique_id=Case(
                 When(panel__old_pk__isnull=False, then=(Value("panel__old_pk"))),
@@ -167,6 +175,23 @@ class GenePanelSnapshotManager(models.Manager):
             ),
         )
 
+    def update_panel_roles(self, pks):
+        """Set `is_super_panel` and `is_child_panel` after the child panels changed
+
+        :param pks: list of GenePanelSnapshot ids with changed child or super
+            panels
+        """
+
+        through = self.model.child_panels.through
+        self.filter(pk__in=pks).update(
+            is_super_panel=Exists(
+                through.objects.filter(from_genepanelsnapshot=OuterRef("pk"))
+            ),
+            is_child_panel=Exists(
+                through.objects.filter(to_genepanelsnapshot=OuterRef("pk"))
+            ),
+        )
+
     def get_panel_version(self, name, version):
         qs = super().get_queryset()
 
@@ -187,37 +212,56 @@ class GenePanelSnapshotManager(models.Manager):
             qs.filter(major_version=major_version, minor_version=minor_version)
         )
 
+    def get_entity_panel_ids(
+        self, gene_symbol, entity_type=None, all=False, internal=False
+    ):
+        """Ids of the active panels with entities of the gene
+
+        Read from the `EntitySearchEntry` index instead of joining the entities.
+
+        :param gene_symbol: gene symbol
+        :param entity_type: gene, str or region, all entity types if empty
+        :param all: include panels which aren't public or promoted
+        :param internal: include internal panels
+        :return: QuerySet with snapshot_id values, to use as a subquery
+        """
+
+        from .entity_search import EntitySearchEntry
+
+        qs = EntitySearchEntry.objects.get_active(all=all, internal=internal).filter(
+            gene_symbol=gene_symbol
+        )
+        if entity_type:
+            qs = qs.filter(entity_type=entity_type)
+        return qs.order_by().values("snapshot_id")
+
     def get_gene_panels(self, gene_symbol, all=False, internal=False):
         """Get all panels for a specific gene in Gene entities"""
 
         return self.get_active_annotated(all=all, internal=internal).filter(
-            genepanelentrysnapshot__gene__gene_symbol=gene_symbol
+            pk__in=self.get_entity_panel_ids(gene_symbol, "gene", all, internal)
         )
 
     def get_strs_panels(self, gene_symbol, all=False, internal=False):
         """Get all panels for a specific gene in STR entities"""
 
         return self.get_active_annotated(all=all, internal=internal).filter(
-            str__gene__gene_symbol=gene_symbol
+            pk__in=self.get_entity_panel_ids(gene_symbol, "str", all, internal)
         )
 
     def get_region_panels(self, gene_symbol, all=False, internal=False):
         """Get all panels for a specific gene in Region entities"""
 
         return self.get_active_annotated(all=all, internal=internal).filter(
-            str__gene__gene_symbol=gene_symbol
+            pk__in=self.get_entity_panel_ids(gene_symbol, "region", all, internal)
         )
 
     def get_shared_panels(self, gene_symbol, all=False, internal=False):
         """Get all panels for a specific gene"""
 
-        qs = self.get_active(all=all, internal=internal)
-        qs = (
-            qs.filter(genepanelentrysnapshot__gene_core__gene_symbol=gene_symbol)
-            .union(qs.filter(str__gene_core__gene_symbol=gene_symbol))
-            .union(qs.filter(region__gene_core__gene_symbol=gene_symbol))
+        return self.get_active(all=all, internal=internal).filter(
+            pk__in=self.get_entity_panel_ids(gene_symbol, all=all, internal=internal)
         )
-        return qs
 
     def get_panels_active_panels(self, all=False, deleted=False, internal=False):
         return (
@@ -325,6 +369,11 @@ class GenePanelSnapshot(TimeStampedModel):
     """
 
     SUPPORTED_ENTITIES = ["str", "region", "genepanelentrysnapshot"]
+    STATS_ENTITIES = [
+        ("gene", "genes", "genepanelentrysnapshot"),
+        ("str", "strs", "str"),
+        ("region", "regions", "region"),
+    ]
 
     class Meta:
         get_latest_by = "created"
@@ -342,6 +391,11 @@ class GenePanelSnapshot(TimeStampedModel):
     child_panels = models.ManyToManyField("self", symmetrical=False)
     stats = JSONField(default=dict, blank=True)
 
+    # Super panels only reference other panels and don't store any entities.
+    # Kept in sync with child_panels by `child_panels_changed`
+    is_super_panel = models.BooleanField(default=False)
+    is_child_panel = models.BooleanField(default=False)
+
     def __str__(self):
         return "{} v{}.{}".format(
             self.level4title.name, self.major_version, self.minor_version
@@ -350,44 +404,52 @@ class GenePanelSnapshot(TimeStampedModel):
     def get_absolute_url(self):
         return reverse("panels:detail", args=(self.panel.pk,))
 
-    @cached_property
-    def is_child_panel(self):
-        return bool(self.genepanelsnapshot_set.count())
-
-    @cached_property
-    def is_super_panel(self):
-        """Check if panel is super panel
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
 
-        Useful as we need to check in gene evaluations, updates, rendering, imports.
-
-        We don't store any information about entities in this panel. This panel is only for the referencing
-        other panels.
+        if (
+            update_fields is None
+            and not args
+            and not kwargs.get("force_insert")
+            and self.pk
+            and not self._state.adding
+        ):
+            # this instance may have been loaded before the child panels changed
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in ("is_super_panel", "is_child_panel")
+            ]
 
-        :return: bool if panel is super panel
-        """
-        return bool(self.child_panels.count())
+        super().save(*args, **kwargs)
+
+        if update_fields is None or {
+            "panel",
+            "major_version",
+            "minor_version",
+            "modified",
+        }.intersection(update_fields):
+            self.panel.update_active_snapshot()
+
+    def delete(self, *args, **kwargs):
+        panel = self.panel
+        related_pks = set()
+        for pks in self.child_panels.through.objects.filter(
+            Q(from_genepanelsnapshot=self) | Q(to_genepanelsnapshot=self)
+        ).values_list("from_genepanelsnapshot_id", "to_genepanelsnapshot_id"):
+            related_pks.update(pks)
+        related_pks.discard(self.pk)
+
+        res = super().delete(*args, **kwargs)
+        panel.update_active_snapshot()
+        if related_pks:
+            GenePanelSnapshot.objects.update_panel_roles(related_pks)
+        return res
 
     def _get_stats(self, use_db=True):
         """Get stats for a panel, i.e. number of reviewers, genes, evaluated genes, etc"""
 
-        keys = [
-            "gene_reviewers",
-            "number_of_evaluated_genes",
-            "number_of_genes",
-            "number_of_ready_genes",
-            "number_of_green_genes",
-            "str_reviewers",
-            "number_of_evaluated_strs",
-            "number_of_strs",
-            "number_of_ready_strs",
-            "number_of_green_strs",
-            "region_reviewers",
-            "number_of_evaluated_regions",
-            "number_of_regions",
-            "number_of_ready_regions",
-            "number_of_green_regions",
-        ]
-
         pks = [self.pk]
         if self.is_super_panel:
             if use_db:
@@ -403,131 +465,117 @@ class GenePanelSnapshot(TimeStampedModel):
                                 combined_stats[key] = list(
                                     set(combined_stats[key] + stats[key])
                                 )
+                            elif isinstance(combined_stats[key], dict):
+                                combined_stats[key] = self._sum_reviewer_counts(
+                                    combined_stats[key], stats[key]
+                                )
                             elif isinstance(combined_stats[key], int):
                                 combined_stats[key] = combined_stats[key] + stats[key]
                         else:
                             combined_stats[key] = stats[key]
+
+                if self._has_incremental_stats(combined_stats):
+                    return self._finalise_stats(combined_stats)
                 return combined_stats
 
-        # another way to refactor below info: when copying data, just count the numbers...
+        out = {}
+        for entity_type, plural, field in self.STATS_ENTITIES:
+            # Count unique entities, an entity with more than 1 evaluation is
+            # counted once
+            info = GenePanelSnapshot.objects.filter(pk__in=pks).aggregate(
+                **{
+                    "number_of_evaluated_{}".format(plural): Count(
+                        Case(
+                            When(
+                                **{"{}__evaluation__isnull".format(field): False},
+                                then=models.F(field),
+                            )
+                        ),
+                        distinct=True,
+                    ),
+                    "number_of_{}".format(plural): Count(field, distinct=True),
+                    "number_of_ready_{}".format(plural): Count(
+                        Case(
+                            When(
+                                **{"{}__ready".format(field): True},
+                                then=models.F(field),
+                            )
+                        ),
+                        distinct=True,
+                    ),
+                    "number_of_green_{}".format(plural): Count(
+                        Case(
+                            When(
+                                **{"{}__saved_gel_status__gte".format(field): 3},
+                                then=models.F(field),
+                            )
+                        ),
+                        distinct=True,
+                    ),
+                }
+            )
+            out.update(info)
 
-        info_genes = GenePanelSnapshot.objects.filter(pk__in=pks).aggregate(
-            gene_reviewers=ArrayAgg(
-                "genepanelentrysnapshot__evaluation__user", distinct=True
-            ),
-            number_of_evaluated_genes=Count(
-                Case(
-                    # Count unique genes if that gene has more than 1 evaluation
-                    When(
-                        genepanelentrysnapshot__evaluation__isnull=False,
-                        then=models.F("genepanelentrysnapshot"),
-                    )
-                ),
-                distinct=True,
-            ),
-            number_of_genes=Count("genepanelentrysnapshot", distinct=True),
-            number_of_ready_genes=Count(
-                Case(
-                    When(
-                        genepanelentrysnapshot__ready=True,
-                        then=models.F("genepanelentrysnapshot"),
-                    )
-                ),
-                distinct=True,
-            ),
-            number_of_green_genes=Count(
-                Case(
-                    When(
-                        genepanelentrysnapshot__saved_gel_status__gte=3,
-                        then=models.F("genepanelentrysnapshot"),
-                    )
-                ),
-                distinct=True,
-            ),
-        )
+            reviewers = (
+                getattr(self, "{}_set".format(field))
+                .model.objects.filter(panel_id__in=pks, evaluation__user__isnull=False)
+                .values("evaluation__user")
+                .annotate(entities=Count("pk", distinct=True))
+            )
+            out["{}_reviewer_counts".format(entity_type)] = {
+                str(r["evaluation__user"]): r["entities"] for r in reviewers
+            }
 
-        info_strs = GenePanelSnapshot.objects.filter(pk__in=pks).aggregate(
-            str_reviewers=ArrayAgg("str__evaluation__user", distinct=True),
-            number_of_evaluated_strs=Count(
-                Case(
-                    # Count unique genes if that gene has more than 1 evaluation
-                    When(str__evaluation__isnull=False, then=models.F("str"))
-                ),
-                distinct=True,
-            ),
-            number_of_strs=Count("str", distinct=True),
-            number_of_ready_strs=Count(
-                Case(When(str__ready=True, then=models.F("str"))), distinct=True
-            ),
-            number_of_green_strs=Count(
-                Case(When(str__saved_gel_status__gte=3, then=models.F("str"))),
-                distinct=True,
-            ),
-        )
+        return self._finalise_stats(out)
 
-        info_regions = GenePanelSnapshot.objects.filter(pk__in=pks).aggregate(
-            region_reviewers=ArrayAgg("region__evaluation__user", distinct=True),
-            number_of_evaluated_regions=Count(
-                Case(
-                    # Count unique genes if that gene has more than 1 evaluation
-                    When(region__evaluation__isnull=False, then=models.F("region"))
-                ),
-                distinct=True,
-            ),
-            number_of_regions=Count("region", distinct=True),
-            number_of_ready_regions=Count(
-                Case(When(region__ready=True, then=models.F("region"))), distinct=True
-            ),
-            number_of_green_regions=Count(
-                Case(When(region__saved_gel_status__gte=3, then=models.F("region"))),
-                distinct=True,
-            ),
+    @staticmethod
+    def _has_incremental_stats(stats):
+        """Check if stats have per reviewer counts required for the
+        incremental updates"""
+
+        return all(
+            isinstance(stats.get("{}_reviewer_counts".format(entity_type)), dict)
+            for entity_type, _, _ in GenePanelSnapshot.STATS_ENTITIES
         )
 
-        out = {"gene_reviewers": [], "str_reviewers": [], "region_reviewers": []}
+    @staticmethod
+    def _sum_reviewer_counts(counts, other_counts, sign=1):
+        out = dict(counts)
+        for user_id, entities in other_counts.items():
+            out[user_id] = out.get(user_id, 0) + sign * entities
+            if out[user_id] <= 0:
+                del out[user_id]
+        return out
 
-        for key in keys:
-            if key not in ['str_reviewers', 'region_reviewers']:
-                out[key] = out.get(key, 0) + info_genes.get(key, 0)
-
-            if key not in ['gene_reviewers', 'region_reviewers']:
-                out[key] = out.get(key, 0) + info_strs.get(key, 0)
-
-            if key not in ['str_reviewers', 'gene_reviewers']:
-                out[key] = out.get(key, 0) + info_regions.get(key, 0)
-
-        out["gene_reviewers"] = list(
-            set([r for r in out["gene_reviewers"] if r])
-        )  #  remove None
-        out["str_reviewers"] = list(
-            set([r for r in out["str_reviewers"] if r])
-        )  # remove None
-        out["region_reviewers"] = list(
-            set([r for r in out["region_reviewers"] if r])
-        )  # remove None
-        out["entity_reviewers"] = list(
-            set(out["gene_reviewers"] + out["str_reviewers"] + out["region_reviewers"])
-        )
-        out["number_of_reviewers"] = len(out["entity_reviewers"])
-        out["number_of_evaluated_entities"] = (
-            out["number_of_evaluated_genes"]
-            + out["number_of_evaluated_strs"]
-            + out["number_of_evaluated_regions"]
-        )
-        out["number_of_entities"] = (
-            out["number_of_genes"] + out["number_of_strs"] + out["number_of_regions"]
-        )
-        out["number_of_ready_entities"] = (
-            out["number_of_ready_genes"]
-            + out["number_of_ready_strs"]
-            + out["number_of_ready_regions"]
-        )
-        out["number_of_green_entities"] = (
-            out["number_of_green_genes"]
-            + out["number_of_green_strs"]
-            + out["number_of_green_regions"]
+    @staticmethod
+    def _finalise_stats(stats):
+        """Set reviewers and totals from the per entity type values"""
+
+        for entity_type, _, _ in GenePanelSnapshot.STATS_ENTITIES:
+            stats["{}_reviewers".format(entity_type)] = sorted(
+                int(user_id)
+                for user_id in stats["{}_reviewer_counts".format(entity_type)]
+            )
+
+        stats["entity_reviewers"] = sorted(
+            set(
+                stats["gene_reviewers"]
+                + stats["str_reviewers"]
+                + stats["region_reviewers"]
+            )
         )
-        return out
+        stats["number_of_reviewers"] = len(stats["entity_reviewers"])
+        for key in [
+            "number_of_{}",
+            "number_of_evaluated_{}",
+            "number_of_ready_{}",
+            "number_of_green_{}",
+        ]:
+            stats[key.format("entities")] = sum(
+                stats.get(key.format(plural), 0)
+                for _, plural, _ in GenePanelSnapshot.STATS_ENTITIES
+            )
+        return stats
 
     def _update_saved_stats(self, use_db=True, update_superpanels=True):
         """Get the new values from the database"""
@@ -538,6 +586,66 @@ class GenePanelSnapshot(TimeStampedModel):
             for super_panel in self.genepanelsnapshot_set.all():
                 super_panel._update_saved_stats(use_db=use_db)
 
+    def update_entity_stats(self, before=None, after=None, update_superpanels=True):
+        """Apply the change of a single entity to the saved stats
+
+        Instead of aggregating all entities again we subtract the old entity values
+        and add the new ones, reviewers are tracked with the number of entities they
+        reviewed so we know when to remove them.
+
+        :param before: dict from `AbstractEntity.get_stats_contribution` before the
+            change, None if the entity has been added
+        :param after: dict from `AbstractEntity.get_stats_contribution` after the
+            change, None if the entity has been removed
+        :param update_superpanels: apply the same change to the super panels
+        """
+
+        if before == after:
+            return
+
+        with transaction.atomic():
+            stats = (
+                GenePanelSnapshot.objects.select_for_update()
+                .filter(pk=self.pk)
+                .values_list("stats", flat=True)
+                .get()
+            )
+
+            if self._has_incremental_stats(stats):
+                for contribution, sign in ((before, -1), (after, 1)):
+                    if contribution:
+                        self._add_stats_contribution(stats, contribution, sign)
+                self.stats = self._finalise_stats(stats)
+                self.save(update_fields=["stats"])
+            else:
+                # stats saved before we started tracking reviewer counts
+                self._update_saved_stats(update_superpanels=False)
+
+        if update_superpanels:
+            for super_panel in self.genepanelsnapshot_set.all():
+                super_panel.update_entity_stats(before, after)
+
+    @staticmethod
+    def _add_stats_contribution(stats, contribution, sign=1):
+        entity_type = contribution["entity_type"]
+        plural = "{}s".format(entity_type)
+
+        keys = ["number_of_{}".format(plural)]
+        if contribution["evaluated"]:
+            keys.append("number_of_evaluated_{}".format(plural))
+        if contribution["ready"]:
+            keys.append("number_of_ready_{}".format(plural))
+        if contribution["green"]:
+            keys.append("number_of_green_{}".format(plural))
+
+        for key in keys:
+            stats[key] = stats.get(key, 0) + sign
+
+        counts_key = "{}_reviewer_counts".format(entity_type)
+        stats[counts_key] = GenePanelSnapshot._sum_reviewer_counts(
+            stats[counts_key], {str(r): 1 for r in contribution["reviewers"]}, sign
+        )
+
     @property
     def version(self):
         return "{}.{}".format(self.major_version, self.minor_version)
@@ -561,12 +669,22 @@ class GenePanelSnapshot(TimeStampedModel):
         if panels_changed:
             self.child_panels.set(updated_child_panels)
 
-    def increment_version(self, major=False, user=None, comment=None, include_superpanels=True):
+    def increment_version(
+        self,
+        major=False,
+        user=None,
+        comment=None,
+        include_superpanels=True,
+        historical_snapshot=True,
+    ):
         """Creates a new version of the panel.
 
         This script copies all genes, all information for these genes, and also
         you can add a comment and a user if it's a major version increment.
 
+        Set `historical_snapshot` to False if the current version has already
+        been saved with `HistoricalSnapshot.import_panels`.
+
         DO NOT use it inside the methods of either genes or GenePanelSnapshot.
         This has weird behaviour as self references still goes to the previous
         snapshot and not the new one.
@@ -577,7 +695,8 @@ class GenePanelSnapshot(TimeStampedModel):
             raise Exception("Cannot increment non recent version")
 
         with transaction.atomic():
-            HistoricalSnapshot.import_panel(self, comment=comment)
+            if historical_snapshot:
+                HistoricalSnapshot.import_panel(self, comment=comment)
 
             self.created = timezone.now()
             self.modified = timezone.now()
@@ -610,11 +729,13 @@ class GenePanelSnapshot(TimeStampedModel):
                 if include_superpanels:
                     super_panel_ids = self.genepanelsnapshot_set.values_list('pk', flat=True)
                     super_panels = self.genepanelsnapshot_set.get_active_annotated(all=True, deleted=True, internal=True).filter(pk__in=super_panel_ids)
-                    for panel in super_panels:
-                        if user:
-                            increment_panel_async(panel.pk, user_pk=user.pk, major=major, update_stats=False)
-                        else:
-                            increment_panel_async(panel.pk, major=major, update_stats=False)
+                    super_panel_increments.add(
+                        super_panels.values_list("pk", flat=True),
+                        user_pk=user.pk if user else None,
+                        major=major,
+                    )
+
+            all_genes_export.invalidate()
 
         return self
 
@@ -723,40 +844,58 @@ class GenePanelSnapshot(TimeStampedModel):
             entity_name=models.F("name"),
         ).order_by("entity_name")
 
+    @cached_property
+    def entities_index(self):
+        """Entity names in this panel mapped to the list of entity pks
+
+        Built with a single query per entity type, the number of pks is the
+        number of times the entity is in the panel (super panels can have
+        duplicates).
+        """
+
+        index = {}
+        for entity_type, qs in (
+            ("gene", self.cached_genes),
+            ("str", self.cached_strs),
+            ("region", self.cached_regions),
+        ):
+            names = defaultdict(list)
+            for pk, name in qs.prefetch_related(None).values_list("pk", "entity_name"):
+                if name:
+                    names[name].append(pk)
+            index[entity_type] = dict(names)
+        return index
+
     @cached_property
     def current_genes(self):
         """Select and cache gene names"""
-        return list(self.current_genes_count.keys())
+        return list(self.entities_index["gene"])
 
     @cached_property
     def current_strs(self):
         """Select and cache gene names"""
-        return list(self.current_strs_count.keys())
+        return list(self.entities_index["str"])
 
     @cached_property
     def current_regions(self):
         """Select and cache gene names"""
-        return list(self.current_regions_count.keys())
+        return list(self.entities_index["region"])
 
     @cached_property
     def current_genes_count(self):
-        genes_list = [
-            g.get("gene_symbol")
-            for g in self.cached_genes.values_list("gene", flat=True)
-        ]
-        return {gene: genes_list.count(gene) for gene in genes_list if gene}
+        return {gene: len(pks) for gene, pks in self.entities_index["gene"].items()}
 
     @cached_property
     def current_strs_count(self):
-        strs_list = [s for s in self.cached_strs.values_list("name", flat=True)]
         return {
-            str_item: strs_list.count(str_item) for str_item in strs_list if str_item
+            str_item: len(pks) for str_item, pks in self.entities_index["str"].items()
         }
 
     @cached_property
     def current_regions_count(self):
-        regions_list = [r for r in self.cached_regions.values_list("name", flat=True)]
-        return {region: regions_list.count(region) for region in regions_list if region}
+        return {
+            region: len(pks) for region, pks in self.entities_index["region"].items()
+        }
 
     @cached_property
     def current_genes_duplicates(self):
@@ -980,16 +1119,30 @@ class GenePanelSnapshot(TimeStampedModel):
 
         return self.get_entity(gene_symbol, "genes", True, prefetch_extra)
 
+    def has_entity(self, entity_type, entity_name):
+        """Check if the panel has an entity with the provided name
+
+        Uses entities index if it's already loaded, otherwise runs EXISTS query.
+        """
+
+        if "entities_index" in self.__dict__:
+            return entity_name in self.entities_index[entity_type]
+
+        if entity_type == "gene":
+            qs = self.genepanelentrysnapshot_set.filter(gene_core_id=entity_name)
+        elif entity_type == "str":
+            qs = self.str_set.filter(name=entity_name)
+        else:
+            qs = self.region_set.filter(name=entity_name)
+        return qs.exists()
+
     def has_gene(self, gene_symbol):
         """Check if the panel has a gene with the provided gene symbol"""
 
         if self.is_super_panel:
             raise IsSuperPanelException
 
-        return gene_symbol in [
-            symbol.get("gene_symbol")
-            for symbol in self.cached_genes.values_list("gene", flat=True)
-        ]
+        return self.has_entity("gene", gene_symbol)
 
     def get_str(self, name, prefetch_extra=False):
         """Get a STR."""
@@ -1003,7 +1156,7 @@ class GenePanelSnapshot(TimeStampedModel):
         if self.is_super_panel:
             raise IsSuperPanelException
 
-        return self.str_set.filter(name=str_name).count() > 0
+        return self.has_entity("str", str_name)
 
     def get_region(self, name, prefetch_extra=False):
         """Get a Region."""
@@ -1011,15 +1164,20 @@ class GenePanelSnapshot(TimeStampedModel):
         return self.get_entity(name, "regions", False, prefetch_extra)
 
     def has_region(self, region_name):
-        return self.region_set.filter(name=region_name).count() > 0
+        return self.has_entity("region", region_name)
 
     def clear_cache(self, to_clear=None):
         if not to_clear:
             to_clear = [
+                "entities_index",
                 "cached_genes",
                 "current_genes_count",
                 "current_genes_duplicates",
                 "current_genes",
+                "current_strs_count",
+                "current_strs",
+                "current_regions_count",
+                "current_regions",
                 "get_all_genes",
                 "get_all_genes_extra",
                 "cached_strs",
@@ -1032,13 +1190,12 @@ class GenePanelSnapshot(TimeStampedModel):
             ]
 
         for item in to_clear:
-            if self.__dict__.get(item):
+            if item in self.__dict__:
                 del self.__dict__[item]
 
     @staticmethod
     def clear_django_cache():
-        cache.delete("entities")
-        cache.delete("entities_admin")
+        entities_cache.invalidate()
 
     def delete_gene(self, gene_symbol, increment=True, user=None):
         """Removes gene from a panel, but leaves it in the previous versions of the same panel"""
@@ -1050,7 +1207,9 @@ class GenePanelSnapshot(TimeStampedModel):
             if increment:
                 self = self.increment_version()
 
-            self.get_all_genes.get(gene__gene_symbol=gene_symbol).delete()
+            gene = self.get_all_genes.get(gene__gene_symbol=gene_symbol)
+            stats = gene.get_stats_contribution()
+            gene.delete()
             self.clear_cache()
             self.clear_django_cache()
 
@@ -1059,7 +1218,7 @@ class GenePanelSnapshot(TimeStampedModel):
                     user, "removed gene:{} from the panel".format(gene_symbol)
                 )
 
-            self._update_saved_stats()
+            self.update_entity_stats(before=stats)
             return True
         else:
             return False
@@ -1074,7 +1233,9 @@ class GenePanelSnapshot(TimeStampedModel):
             if increment:
                 self = self.increment_version()
 
-            self.cached_strs.get(name=str_name).delete()
+            str_item = self.cached_strs.get(name=str_name)
+            stats = str_item.get_stats_contribution()
+            str_item.delete()
             self.clear_cache()
             self.clear_django_cache()
 
@@ -1083,7 +1244,7 @@ class GenePanelSnapshot(TimeStampedModel):
                     user, "removed STR:{} from the panel".format(str_name)
                 )
 
-            self._update_saved_stats()
+            self.update_entity_stats(before=stats)
             return True
         else:
             return False
@@ -1095,7 +1256,9 @@ class GenePanelSnapshot(TimeStampedModel):
             if increment:
                 self = self.increment_version()
 
-            self.cached_regions.get(name=region_name).delete()
+            region = self.cached_regions.get(name=region_name)
+            stats = region.get_stats_contribution()
+            region.delete()
             self.clear_cache()
             self.clear_django_cache()
 
@@ -1104,7 +1267,7 @@ class GenePanelSnapshot(TimeStampedModel):
                     user, "removed region:{} from the panel".format(region_name)
                 )
 
-            self._update_saved_stats()
+            self.update_entity_stats(before=stats)
             return True
         else:
             return False
@@ -1132,6 +1295,70 @@ class GenePanelSnapshot(TimeStampedModel):
             entity.evidence.add(evidence)
 
         evidence_status = entity.evidence_status()
+
+        if entity_data.get("tags", []):
+            entity.tags.add(*entity_data.get("tags", []))
+
+        tracks = self.get_new_entity_tracks(entity, entity_name, entity_data)
+
+        comment_text = entity_data.get("comment", "")
+        if (
+            entity_data.get("rating")
+            or entity_data.get("comment")
+            or entity_data.get("source")
+        ):
+            evaluation = Evaluation.objects.create(
+                user=user,
+                rating=entity_data.get("rating"),
+                mode_of_pathogenicity=entity_data.get("mode_of_pathogenicity"),
+                phenotypes=entity_data.get("phenotypes"),
+                publications=entity_data.get("publications"),
+                moi=entity_data.get("moi"),
+                current_diagnostic=entity_data.get("current_diagnostic"),
+                clinically_relevant=entity_data.get("clinically_relevant"),
+                version=self.version,
+            )
+            comment_text = entity_data.get("comment", "")
+            sources = ", ".join(entity_data.get("sources", []))
+            if sources and comment_text:
+                comment_text = comment_text + " \nSources: " + sources
+            else:
+                comment_text = "Sources: " + sources
+            comment = Comment.objects.create(user=user, comment=comment_text)
+            if entity_data.get("comment") or entity_data.get("sources", []):
+                evaluation.comments.add(comment)
+            entity.evaluation.add(evaluation)
+
+        if tracks:
+            description = "\n".join([t[1] for t in tracks])
+            track = TrackRecord.objects.create(
+                gel_status=evidence_status,
+                curator_status=0,
+                user=user,
+                issue_type=",".join([t[0] for t in tracks if t[0]]),
+                issue_description=description,
+            )
+            entity.track.add(track)
+
+            if comment_text:
+                description = description + "\nAdded comment: " + comment_text
+            self.add_activity(user, description, entity)
+
+        self.clear_cache()
+        self.clear_django_cache()
+        return entity
+
+    def get_new_entity_tracks(self, entity, entity_name, entity_data):
+        """TrackRecord issue types and descriptions for a new entity
+
+        Also sets mode of inheritance for mitochondrial genes.
+
+        :param entity: Entity object
+        :param entity_name: str - Entity name
+        :param entity_data: Dict entity data (form)
+        :return: list of (issue type, description) tuples
+        """
+
         tracks = []
 
         tracks.append(
@@ -1145,7 +1372,6 @@ class GenePanelSnapshot(TimeStampedModel):
 
         if entity_data.get("tags", []):
             tags = Tag.objects.filter(pk__in=entity_data.get("tags", []))
-            entity.tags.add(*entity_data.get("tags", []))
 
             description = "{} tags were added to {}.".format(
                 ", ".join([str(tag) for tag in tags]), entity_name
@@ -1204,52 +1430,141 @@ class GenePanelSnapshot(TimeStampedModel):
             description = "{} was marked as current diagnostic".format(entity.label)
             tracks.append((None, description))
 
-        comment_text = entity_data.get("comment", "")
-        if (
-            entity_data.get("rating")
-            or entity_data.get("comment")
-            or entity_data.get("source")
-        ):
-            evaluation = Evaluation.objects.create(
-                user=user,
-                rating=entity_data.get("rating"),
-                mode_of_pathogenicity=entity_data.get("mode_of_pathogenicity"),
-                phenotypes=entity_data.get("phenotypes"),
-                publications=entity_data.get("publications"),
-                moi=entity_data.get("moi"),
-                current_diagnostic=entity_data.get("current_diagnostic"),
-                clinically_relevant=entity_data.get("clinically_relevant"),
-                version=self.version,
+        return tracks
+
+    def bulk_add_entities(self, user, entities):
+        """Add new entities to the panel with a few bulk inserts
+
+        Does the same as `add_gene`, `add_str` and `add_region`: adds sources,
+        tags, TrackRecord and Activity for each entity. Entities with ratings or
+        comments are added one by one as they also need evaluations.
+
+        :param user: User adding the entities
+        :param entities: list of (entity, entity data) tuples, entities are
+            built with `build_gene`, `build_str` or `build_region`
+        :return: list of added entities
+        """
+
+        if self.is_super_panel:
+            raise IsSuperPanelException
+
+        if not entities:
+            return []
+
+        new_entities = defaultdict(list)
+        evidences = []
+        tracks = []
+        activities = []
+        for entity, entity_data in entities:
+            if (
+                entity_data.get("rating")
+                or entity_data.get("comment")
+                or entity_data.get("source")
+            ):
+                entity.save()
+                self.add_entity_info(entity, user, entity.label, entity_data)
+                entity.evidence_status(update=True)
+                continue
+
+            entity_evidences = [
+                Evidence(rating=5, reviewer=user.reviewer, name=source.strip())
+                for source in entity_data.get("sources")
+            ]
+            evidence_status = (
+                0 if entity.flagged else entity.get_evidence_status(entity_evidences)
             )
-            comment_text = entity_data.get("comment", "")
-            sources = ", ".join(entity_data.get("sources", []))
-            if sources and comment_text:
-                comment_text = comment_text + " \nSources: " + sources
-            else:
-                comment_text = "Sources: " + sources
-            comment = Comment.objects.create(user=user, comment=comment_text)
-            if entity_data.get("comment") or entity_data.get("sources", []):
-                evaluation.comments.add(comment)
-            entity.evaluation.add(evaluation)
+            entity.saved_gel_status = evidence_status
 
-        if tracks:
-            description = "\n".join([t[1] for t in tracks])
-            track = TrackRecord.objects.create(
+            entity_tracks = self.get_new_entity_tracks(
+                entity, entity.label, entity_data
+            )
+            description = "\n".join([t[1] for t in entity_tracks])
+            track = TrackRecord(
                 gel_status=evidence_status,
                 curator_status=0,
                 user=user,
-                issue_type=",".join([t[0] for t in tracks if t[0]]),
+                issue_type=",".join([t[0] for t in entity_tracks if t[0]]),
                 issue_description=description,
             )
-            entity.track.add(track)
 
-            if comment_text:
-                description = description + "\nAdded comment: " + comment_text
-            self.add_activity(user, description, entity)
+            new_entities[entity.__class__].append(
+                (entity, entity_evidences, track, entity_data.get("tags", []))
+            )
+            evidences.extend(entity_evidences)
+            tracks.append(track)
+
+        Evidence.objects.bulk_create(evidences)
+        TrackRecord.objects.bulk_create(tracks)
+
+        for model, items in new_entities.items():
+            model.objects.bulk_create([item[0] for item in items])
+
+            evidence_through = model.evidence.through
+            track_through = model.track.through
+            tags_through = model.tags.through
+            entity_field = "{}_id".format(model._meta.model_name)
+            evidence_through.objects.bulk_create(
+                [
+                    evidence_through(**{entity_field: entity.pk, "evidence_id": e.pk})
+                    for entity, entity_evidences, _, _ in items
+                    for e in entity_evidences
+                ]
+            )
+            track_through.objects.bulk_create(
+                [
+                    track_through(**{entity_field: entity.pk, "trackrecord_id": t.pk})
+                    for entity, _, t, _ in items
+                ]
+            )
+            tags_through.objects.bulk_create(
+                [
+                    tags_through(
+                        **{entity_field: entity.pk, "tag_id": getattr(tag, "pk", tag)}
+                    )
+                    for entity, _, _, tags in items
+                    for tag in tags
+                ]
+            )
+            entity_search.add_entities(entity for entity, _, _, _ in items)
+
+            activities.extend(
+                Activity.build(
+                    user,
+                    self,
+                    track.issue_description,
+                    {"entity_name": entity.name, "entity_type": entity._entity_type},
+                )
+                for entity, _, track, _ in items
+            )
+
+        Activity.objects.bulk_create(activities)
 
         self.clear_cache()
         self.clear_django_cache()
-        return entity
+        self._update_saved_stats()
+        return [entity for entity, _ in entities]
+
+    def build_gene(self, user, gene_core, gene_data):
+        """New gene for this panel, it isn't saved to the database
+
+        :param user: User adding the gene
+        :param gene_core: Gene instance
+        :param gene_data: Dict gene data, see `add_gene`
+        :return: GenePanelEntrySnapshot instance
+        """
+
+        return self.genepanelentrysnapshot_set.model(
+            gene=gene_core.dict_tr(),
+            panel=self,
+            gene_core=gene_core,
+            moi=gene_data.get("moi"),
+            penetrance=gene_data.get("penetrance"),
+            publications=gene_data.get("publications"),
+            phenotypes=gene_data.get("phenotypes"),
+            mode_of_pathogenicity=gene_data.get("mode_of_pathogenicity"),
+            saved_gel_status=0,
+            flagged=False if user.reviewer.is_GEL() else True,
+        )
 
     def add_gene(self, user, gene_symbol, gene_data, increment_version=True):
         """Adds a new gene to the panel
@@ -1285,26 +1600,13 @@ class GenePanelSnapshot(TimeStampedModel):
             self = self.increment_version(user=user)
 
         gene_core = Gene.objects.get(gene_symbol=gene_symbol)
-        gene_info = gene_core.dict_tr()
-
-        gene = self.genepanelentrysnapshot_set.model(
-            gene=gene_info,
-            panel=self,
-            gene_core=gene_core,
-            moi=gene_data.get("moi"),
-            penetrance=gene_data.get("penetrance"),
-            publications=gene_data.get("publications"),
-            phenotypes=gene_data.get("phenotypes"),
-            mode_of_pathogenicity=gene_data.get("mode_of_pathogenicity"),
-            saved_gel_status=0,
-            flagged=False if user.reviewer.is_GEL() else True,
-        )
+        gene = self.build_gene(user, gene_core, gene_data)
         gene.save()
 
         gene = self.add_entity_info(gene, user, gene.label, gene_data)
 
         gene.evidence_status(update=True)
-        self._update_saved_stats()
+        self.update_entity_stats(after=gene.get_stats_contribution())
         return gene
 
     def update_gene(self, user, gene_symbol, gene_data, append_only=False):
@@ -1348,6 +1650,7 @@ class GenePanelSnapshot(TimeStampedModel):
                 )
             )
             gene = self.get_gene(gene_symbol=gene_symbol)
+            stats = gene.get_stats_contribution()
 
             if gene_data.get("flagged") is not None:
                 gene.flagged = gene_data.get("flagged")
@@ -1547,6 +1850,9 @@ class GenePanelSnapshot(TimeStampedModel):
                     description = "Tag {} tag was added to {}.".format(tag, gene_symbol)
                     tracks.append((TrackRecord.ISSUE_TYPES.AddedTag, description))
 
+                if add_tags or (delete_tags and not append_only):
+                    self.clear_django_cache()
+
             if tracks:
                 logging.debug(
                     "Adding tracks for gene:{} in panel:{}".format(gene_symbol, self)
@@ -1696,6 +2002,7 @@ class GenePanelSnapshot(TimeStampedModel):
                         for tag in tags
                     ]
                 )
+                entity_search.add_entities([new_gpes])
 
                 Comment.objects.bulk_create(comments)
                 new_gpes.comments.through.objects.bulk_create(
@@ -1741,7 +2048,7 @@ class GenePanelSnapshot(TimeStampedModel):
                 self.delete_gene(old_gene_symbol, increment=False)
                 self.clear_cache()
                 self.clear_django_cache()
-                self._update_saved_stats()
+                self.update_entity_stats(after=new_gpes.get_stats_contribution())
                 return new_gpes
             elif gene_name and gene.gene.get("gene_name") != gene_name:
                 logging.debug(
@@ -1754,11 +2061,43 @@ class GenePanelSnapshot(TimeStampedModel):
             else:
                 gene.save()
             self.clear_cache()
-            self._update_saved_stats()
+            self.update_entity_stats(stats, gene.get_stats_contribution())
             return gene
         else:
             return False
 
+    def build_str(self, user, str_name, str_data):
+        """New STR for this panel, it isn't saved to the database
+
+        :param user: User adding the STR
+        :param str_name: STR name
+        :param str_data: Dict STR data, see `add_str`
+        :return: STR instance
+        """
+
+        str_item = self.str_set.model(
+            name=str_name,
+            chromosome=str_data.get("chromosome"),
+            position_37=str_data.get("position_37"),
+            position_38=str_data.get("position_38"),
+            normal_repeats=str_data.get("normal_repeats"),
+            repeated_sequence=str_data.get("repeated_sequence"),
+            pathogenic_repeats=str_data.get("pathogenic_repeats"),
+            panel=self,
+            moi=str_data.get("moi"),
+            penetrance=str_data.get("penetrance"),
+            publications=str_data.get("publications"),
+            phenotypes=str_data.get("phenotypes"),
+            saved_gel_status=0,
+            flagged=False if user.reviewer.is_GEL() else True,
+        )
+
+        if str_data.get("gene"):
+            str_item.gene_core = str_data["gene"]
+            str_item.gene = str_data["gene"].dict_tr()
+
+        return str_item
+
     def add_str(self, user, str_name, str_data, increment_version=True):
         """Adds a new gene to the panel
 
@@ -1795,35 +2134,12 @@ class GenePanelSnapshot(TimeStampedModel):
         if increment_version:
             self = self.increment_version()
 
-        str_item = self.str_set.model(
-            name=str_name,
-            chromosome=str_data.get("chromosome"),
-            position_37=str_data.get("position_37"),
-            position_38=str_data.get("position_38"),
-            normal_repeats=str_data.get("normal_repeats"),
-            repeated_sequence=str_data.get("repeated_sequence"),
-            pathogenic_repeats=str_data.get("pathogenic_repeats"),
-            panel=self,
-            moi=str_data.get("moi"),
-            penetrance=str_data.get("penetrance"),
-            publications=str_data.get("publications"),
-            phenotypes=str_data.get("phenotypes"),
-            saved_gel_status=0,
-            flagged=False if user.reviewer.is_GEL() else True,
-        )
-
-        if str_data.get("gene"):
-            gene_core = Gene.objects.get(gene_symbol=str_data["gene"].gene_symbol)
-            gene_info = gene_core.dict_tr()
-
-            str_item.gene_core = gene_core
-            str_item.gene = gene_info
-
+        str_item = self.build_str(user, str_name, str_data)
         str_item.save()
         str_item = self.add_entity_info(str_item, user, str_item.label, str_data)
 
         str_item.evidence_status(update=True)
-        self._update_saved_stats()
+        self.update_entity_stats(after=str_item.get_stats_contribution())
         return str_item
 
     def update_str(
@@ -1873,6 +2189,7 @@ class GenePanelSnapshot(TimeStampedModel):
                 "Found STR:{} in panel:{}. Incrementing version.".format(str_name, self)
             )
             str_item = self.get_str(str_name)
+            stats = str_item.get_stats_contribution()
 
             if str_data.get("flagged") is not None:
                 str_item.flagged = str_data.get("flagged")
@@ -1986,6 +2303,7 @@ class GenePanelSnapshot(TimeStampedModel):
                 description = "{} was changed to {}".format(old_str_name, str_item.name)
                 tracks.append((TrackRecord.ISSUE_TYPES.ChangedSTRName, description))
                 self.delete_str(old_str_name, increment=False)
+                stats = None  # old STR has been removed from the stats
                 logging.debug(
                     "Changed STR name:{} to {} panel:{}".format(
                         str_name, str_data.get("name"), self
@@ -2324,6 +2642,9 @@ class GenePanelSnapshot(TimeStampedModel):
                     description = "Tag {} was added to {}.".format(tag, str_item.label)
                     tracks.append((TrackRecord.ISSUE_TYPES.AddedTag, description))
 
+                if add_tags or (delete_tags and not append_only):
+                    self.clear_django_cache()
+
             new_gene = str_data.get("gene")
             gene_name = str_data.get("gene_name")
 
@@ -2411,11 +2732,47 @@ class GenePanelSnapshot(TimeStampedModel):
 
             str_item.save()
             self.clear_cache()
-            self._update_saved_stats()
+            self.update_entity_stats(stats, str_item.get_stats_contribution())
             return str_item
         else:
             return False
 
+    def build_region(self, user, region_name, region_data):
+        """New region for this panel, it isn't saved to the database
+
+        :param user: User adding the region
+        :param region_name: Region name
+        :param region_data: Dict region data, see `add_region`
+        :return: Region instance
+        """
+
+        region = self.region_set.model(
+            name=region_name,
+            verbose_name=region_data.get("verbose_name"),
+            chromosome=region_data.get("chromosome"),
+            position_37=region_data.get("position_37"),
+            position_38=region_data.get("position_38"),
+            haploinsufficiency_score=region_data.get("haploinsufficiency_score"),
+            triplosensitivity_score=region_data.get("triplosensitivity_score"),
+            required_overlap_percentage=region_data.get("required_overlap_percentage"),
+            type_of_variants=region_data.get(
+                "type_of_variants", self.cached_regions.model.VARIANT_TYPES.small
+            ),
+            panel=self,
+            moi=region_data.get("moi"),
+            penetrance=region_data.get("penetrance"),
+            publications=region_data.get("publications"),
+            phenotypes=region_data.get("phenotypes"),
+            saved_gel_status=0,
+            flagged=False if user.reviewer.is_GEL() else True,
+        )
+
+        if region_data.get("gene"):
+            region.gene_core = region_data["gene"]
+            region.gene = region_data["gene"].dict_tr()
+
+        return region
+
     def add_region(self, user, region_name, region_data, increment_version=True):
         """Adds a new gene to the panel
 
@@ -2451,39 +2808,12 @@ class GenePanelSnapshot(TimeStampedModel):
         if increment_version:
             self = self.increment_version()
 
-        region = self.region_set.model(
-            name=region_name,
-            verbose_name=region_data.get("verbose_name"),
-            chromosome=region_data.get("chromosome"),
-            position_37=region_data.get("position_37"),
-            position_38=region_data.get("position_38"),
-            haploinsufficiency_score=region_data.get("haploinsufficiency_score"),
-            triplosensitivity_score=region_data.get("triplosensitivity_score"),
-            required_overlap_percentage=region_data.get("required_overlap_percentage"),
-            type_of_variants=region_data.get(
-                "type_of_variants", self.cached_regions.model.VARIANT_TYPES.small
-            ),
-            panel=self,
-            moi=region_data.get("moi"),
-            penetrance=region_data.get("penetrance"),
-            publications=region_data.get("publications"),
-            phenotypes=region_data.get("phenotypes"),
-            saved_gel_status=0,
-            flagged=False if user.reviewer.is_GEL() else True,
-        )
-
-        if region_data.get("gene"):
-            gene_core = Gene.objects.get(gene_symbol=region_data["gene"].gene_symbol)
-            gene_info = gene_core.dict_tr()
-
-            region.gene_core = gene_core
-            region.gene = gene_info
-
+        region = self.build_region(user, region_name, region_data)
         region.save()
         region = self.add_entity_info(region, user, region.label, region_data)
 
         region.evidence_status(update=True)
-        self._update_saved_stats()
+        self.update_entity_stats(after=region.get_stats_contribution())
         return region
 
     def update_region(
@@ -2534,6 +2864,7 @@ class GenePanelSnapshot(TimeStampedModel):
                 )
             )
             region = self.get_region(region_name)
+            stats = region.get_stats_contribution()
 
             if region_data.get("flagged") is not None:
                 region.flagged = region_data.get("flagged")
@@ -2650,6 +2981,7 @@ class GenePanelSnapshot(TimeStampedModel):
                 tracks.append((TrackRecord.ISSUE_TYPES.ChangedName, description))
 
                 self.delete_region(old_region_name, increment=False)
+                stats = None  # old region has been removed from the stats
                 logging.debug(
                     "Changed region name:{} to {} panel:{}".format(
                         region_name, region_data.get("name"), self
@@ -3008,6 +3340,9 @@ class GenePanelSnapshot(TimeStampedModel):
                     description = "Tag {} was added to {}.".format(tag, region.label)
                     tracks.append((TrackRecord.ISSUE_TYPES.AddedTag, description))
 
+                if add_tags or (delete_tags and not append_only):
+                    self.clear_django_cache()
+
             new_gene = region_data.get("gene")
             gene_name = region_data.get("gene_name")
 
@@ -3096,7 +3431,7 @@ class GenePanelSnapshot(TimeStampedModel):
 
             region.save()
             self.clear_cache()
-            self._update_saved_stats()
+            self.update_entity_stats(stats, region.get_stats_contribution())
             return region
         else:
             return False
@@ -3236,6 +3571,10 @@ class GenePanelSnapshot(TimeStampedModel):
             Evaluation.comments.through.objects.bulk_create(
                 [Evaluation.comments.through(**c) for c in comments]
             )
+            # bulk inserts don't send m2m_changed, refresh the copied evidences
+            entity_search.add_entities(
+                gene_user["gene"] for gene_user in new_evaluations.values()
+            )
 
             self._update_saved_stats()
             return len(evaluations)
@@ -3251,3 +3590,20 @@ class GenePanelSnapshot(TimeStampedModel):
             }
 
         Activity.log(user=user, panel_snapshot=self, text=text, extra_info=extra_info)
+
+
+def child_panels_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Keep `is_super_panel` and `is_child_panel` in sync with child panels"""
+
+    if action == "pre_clear":
+        related = instance.genepanelsnapshot_set if reverse else instance.child_panels
+        instance._cleared_panel_ids = set(related.values_list("pk", flat=True))
+    elif action in ("post_add", "post_remove", "post_clear"):
+        pks = set(pk_set or ())
+        pks.update(instance.__dict__.pop("_cleared_panel_ids", ()))
+        pks.add(instance.pk)
+        GenePanelSnapshot.objects.update_panel_roles(pks)
+        instance.refresh_from_db(fields=["is_super_panel", "is_child_panel"])
+
+
+m2m_changed.connect(child_panels_changed, sender=GenePanelSnapshot.child_panels.through)
@@ -21,242 +21,204 @@
 ## specific language governing permissions and limitations
 ## under the License.
 ##
-import csv
+import hashlib
+import itertools
+import json
+import zlib
+from django.conf import settings
 from django.contrib.postgres.fields import JSONField
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
 from django.db import models
-from django.http import HttpResponse
 
 
 from .genepanel import GenePanel
-from api.v1.serializers import PanelSerializer
-from panels.utils import remove_non_ascii
+from .snapshot_writer import SnapshotWriter
+from panels.tsv import tsv_response
 from webservices.utils import make_null, convert_moi, convert_gel_status
 import panelapp
 
 
+class HistoricalGeneData(models.Model):
+    """Gene data used by the historical snapshots
+
+    The same gene data is used by many panels and versions, so it's stored once
+    and referenced by the hash of its content.
+    """
+
+    hash = models.CharField(max_length=40, primary_key=True)
+    data = JSONField()
+
+    @staticmethod
+    def get_hash(gene_data):
+        content = json.dumps(gene_data, sort_keys=True, cls=DjangoJSONEncoder)
+        return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+    @classmethod
+    def store(cls, gene_data, batch_size=1000):
+        """Save gene data which isn't stored yet
+
+        :param gene_data: dict with the hash and gene data
+        """
+
+        table = connection.ops.quote_name(cls._meta.db_table)
+        data_field = cls._meta.get_field("data")
+        items = list(gene_data.items())
+
+        with connection.cursor() as cursor:
+            for start in range(0, len(items), batch_size):
+                batch = items[start : start + batch_size]
+                params = []
+                for gene_hash, data in batch:
+                    params.extend(
+                        [gene_hash, data_field.get_db_prep_save(data, connection)]
+                    )
+                cursor.execute(
+                    "INSERT INTO {} (hash, data) VALUES {} "
+                    "ON CONFLICT DO NOTHING".format(
+                        table, ", ".join(["(%s, %s)"] * len(batch))
+                    ),
+                    params,
+                )
+
+
 class HistoricalSnapshot(models.Model):
+    ENTITY_TYPES = ["genes", "strs", "regions"]
+
     panel = models.ForeignKey(GenePanel, on_delete=models.PROTECT)
     major_version = models.IntegerField(default=0, db_index=True)
     minor_version = models.IntegerField(default=0, db_index=True)
     reason = models.TextField(null=True)
     schema_version = models.CharField(max_length=100)  # JSON schema version
-    data = JSONField()
+    raw_data = JSONField(null=True, db_column="data")  # saved before packing
+    packed_data = models.BinaryField(null=True)
 
-    def to_tsv(self):
-        data = self.data
-        panel_name = self.panel.name
+    @property
+    def data(self):
+        """Panel data, unpacked if the snapshot is stored packed"""
 
-        response = HttpResponse(content_type="text/tab-separated-values")
-        panel_name = remove_non_ascii(panel_name, replacemenet="_")
-        response["Content-Disposition"] = (
-            'attachment; filename="' + panel_name + '.tsv"'
-        )
+        if not hasattr(self, "_data"):
+            if self.raw_data is not None:
+                self._data = self.raw_data
+            else:
+                self._data = self.unpack_data(self.packed_data)
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        self._data = value
+        self.raw_data = value
+        self.packed_data = None
+
+    @classmethod
+    def pack_data(cls, data, gene_data):
+        """Compressed panel data with gene data replaced by its hash
+
+        :param data: panel data
+        :param gene_data: dict, hash and gene data of the packed entities are
+            added to it, they need to be saved with `HistoricalGeneData.store`
+        :return: bytes
+        """
+
+        packed = dict(data)
+        for entity_type in cls.ENTITY_TYPES:
+            entities = []
+            for entity in data.get(entity_type, []):
+                entity = dict(entity)
+                if entity.get("gene_data") is not None:
+                    gene_hash = HistoricalGeneData.get_hash(entity["gene_data"])
+                    gene_data[gene_hash] = entity.pop("gene_data")
+                    entity["gene_data_hash"] = gene_hash
+                entities.append(entity)
+            packed[entity_type] = entities
+
+        content = json.dumps(packed, cls=DjangoJSONEncoder)
+        return zlib.compress(content.encode("utf-8"))
+
+    @classmethod
+    def unpack_data(cls, packed_data):
+        """Panel data from the value created with `pack_data`"""
 
-        writer = csv.writer(response, delimiter="\t")
-
-        writer.writerow(
-            (
-                "Entity Name",
-                "Entity type",
-                "Gene Symbol",
-                "Sources(; separated)",
-                "Level4",
-                "Level3",
-                "Level2",
-                "Model_Of_Inheritance",
-                "Phenotypes",
-                "Omim",
-                "Orphanet",
-                "HPO",
-                "Publications",
-                "Description",
-                "Flagged",
-                "GEL_Status",
-                "UserRatings_Green_amber_red",
-                "version",
-                "ready",
-                "Mode of pathogenicity",
-                "EnsemblId(GRch37)",
-                "EnsemblId(GRch38)",
-                "HGNC",
-                "Position Chromosome",
-                "Position GRCh37 Start",
-                "Position GRCh37 End",
-                "Position GRCh38 Start",
-                "Position GRCh38 End",
-                "STR Repeated Sequence",
-                "STR Normal Repeats",
-                "STR Pathogenic Repeats",
-                "Region Haploinsufficiency Score",
-                "Region Triplosensitivity Score",
-                "Region Required Overlap Percentage",
-                "Region Variant Type",
-                "Region Verbose Name",
+        data = json.loads(zlib.decompress(bytes(packed_data)).decode("utf-8"))
+
+        gene_hashes = set(
+            entity["gene_data_hash"]
+            for entity_type in cls.ENTITY_TYPES
+            for entity in data.get(entity_type, [])
+            if "gene_data_hash" in entity
+        )
+        gene_data = dict(
+            HistoricalGeneData.objects.filter(pk__in=gene_hashes).values_list(
+                "pk", "data"
             )
         )
 
-        for gene in data["genes"]:
-            writer.writerow(
-                (
-                    gene.get("entity_name", ""),
-                    gene.get("entity_type", ""),
-                    gene.get("entity_name", ""),
-                    ";".join([ev for ev in gene["evidence"] if ev]),
-                    panel_name,
-                    data.get("panel", {}).get("disease_sub_group", ""),
-                    data.get("panel", {}).get("disease_group", ""),
-                    gene.get("mode_of_inheritance", ""),
-                    ";".join(map(remove_non_ascii, gene["phenotypes"]))
-                    if gene.get("phenotypes") else "",
-                    ";".join(map(remove_non_ascii, gene["gene_data"]["omim_gene"]))
-                    if gene.get("gene_data").get("omim_gene") else "",
-                    "",
-                    "",
-                    ";".join(map(remove_non_ascii, gene["publications"]))
-                    if gene.get("publications") else "",
-                    "",
-                    "",
-                    gene.get("confidence_level", ""),
-                    "",
-                    "{}.{}".format(self.major_version, self.minor_version),
-                    "",
-                    gene.get("mode_of_pathogenicity", ""),
-                    gene.get("gene_data", {}).get("ensembl_genes", {})
-                        .get("GRch38", {}).get("90", {}).get("ensembl_id", "")
-                    if gene.get("gene_data") is not None else "",
-                    gene.get("gene_data", {}).get("ensembl_genes", {})
-                        .get("GRch37", {}).get("82", {}).get("ensembl_id", "")
-                    if gene.get("gene_data") is not None else "",
-                    gene.get("gene_data", {}).get("hgnc_id", ""),
-                    "",
-                    "",
-                    "",
-                    "",
-                    "",
-                    "",
-                    "",
-                    "",
-                    "",
-                    "",
-                    "",
-                    "",
-                    "",
-                )
-            )
+        for entity_type in cls.ENTITY_TYPES:
+            for entity in data.get(entity_type, []):
+                if "gene_data_hash" in entity:
+                    entity["gene_data"] = gene_data[entity.pop("gene_data_hash")]
+                elif "gene_data" not in entity:
+                    entity["gene_data"] = None
+        return data
 
-        for str in data["strs"]:
-            writer.writerow(
-                (
-                    str.get("entity_name", ""),
-                    str.get("entity_type", ""),
-                    str["gene_data"].get("gene_symbol", "") if str.get("gene_data") else "",
-                    ";".join([ev for ev in str["evidence"] if ev])
-                    if str.get("evidence") else "",
-                    panel_name,
-                    data.get("panel", {}).get("disease_sub_group", ""),
-                    data.get("panel", {}).get("disease_group", ""),
-                    str.get("mode_of_inheritance", ""),
-                    ";".join(map(remove_non_ascii, str["phenotypes"]))
-                    if str.get('phenotypes') else "",
-                    ";".join(map(remove_non_ascii, str["gene_data"].get("omim_gene", "")))
-                    if str.get("gene_data") else "",
-                    "",
-                    "",
-                    ";".join(map(remove_non_ascii, str["publications"]))
-                    if str.get("publications") else "",
-                    "",
-                    "",
-                    str.get("confidence_level", ""),
-                    "",
-                    "{}.{}".format(self.major_version, self.minor_version),
-                    "",
-                    "",
-                    str.get("gene_data", {}).get("ensembl_genes", {})
-                        .get("GRch38", {}).get("90", {}).get("ensembl_id", "")
-                    if str.get("gene_data") is not None else "",
-                    str.get("gene_data", {}).get("ensembl_genes", {})
-                        .get("GRch37", {}).get("82", {}).get("ensembl_id", "")
-                    if str.get("gene_data") is not None else "",
-                    str.get("gene_data", {}).get("hgnc_id", ""),
-                    str.get("chromosome", ""),
-                    str["grch37_coordinates"][0] if str.get("grch37_coordinates") else "",
-                    str["grch37_coordinates"][1] if str.get("grch37_coordinates") else "",
-                    str["grch38_coordinates"][0] if str.get("grch38_coordinates") else "",
-                    str["grch38_coordinates"][1] if str.get("grch38_coordinates") else "",
-                    str.get("repeated_sequence", ""),
-                    str.get("normal_repeats", ""),
-                    str.get("pathogenic_repeats", ""),
-                    "",
-                    "",
-                    "",
-                    "",
-                    "",
-                )
-            )
+    @classmethod
+    def pack(cls, snapshots):
+        """Pack the data of the snapshots, they still need to be saved
 
-        for region in data["regions"]:
-            writer.writerow(
-                (
-                    region.get("entity_name", ""),
-                    region.get("entity_type", ""),
-                    region["gene_data"].get("gene_symbol", "") if region.get("gene_data") else "",
-                    ";".join([ev for ev in region["evidence"] if ev]) if region.get("evidence") else "",
-                    panel_name,
-                    data.get("panel", {}).get("disease_sub_group", ""),
-                    data.get("panel", {}).get("disease_group", ""),
-                    region.get("mode_of_inheritance", ""),
-                    ";".join(map(remove_non_ascii, region["phenotypes"]))
-                    if region.get("phenotypes") else "",
-                    region["gene_data"].get("omim_gene", "") if region.get("gene_data") is not None else "",
-                    "",
-                    "",
-                    ";".join(map(remove_non_ascii, region["publications"]))
-                    if region.get("publications") else "",
-                    "",
-                    "",
-                    region.get("confidence_level", ""),
-                    "",
-                    "{}.{}".format(self.major_version, self.minor_version),
-                    "",
-                    "",
-                    region.get("gene_data", {}).get("ensembl_genes", {})
-                        .get("GRch38", {}).get("90", {}).get("ensembl_id", "")
-                    if region.get("gene_data") is not None else "",
-                    region.get("gene_data", {}).get("ensembl_genes", {})
-                        .get("GRch37", {}).get("82", {}).get("ensembl_id", "")
-                    if region.get("gene_data") is not None else "",
-                    region.get("gene_data", {}).get("hgnc_id", "") if region.get("gene_data") is not None else "",
-                    region.get("chromosome", ""),
-                    region["grch37_coordinates"][0] if region.get("grch37_coordinates") else "",
-                    region["grch37_coordinates"][1] if region.get("grch37_coordinates") else "",
-                    region["grch38_coordinates"][0] if region.get("grch38_coordinates") else "",
-                    region["grch38_coordinates"][1] if region.get("grch38_coordinates") else "",
-                    "",
-                    "",
-                    "",
-                    region.get("haploinsufficiency_score", ""),
-                    region.get("triplosensitivity_score", ""),
-                    region.get("required_overlap_percentage", ""),
-                    region.get("type_of_variants", ""),
-                    region.get("verbose_name", ""),
-                )
-            )
-        return response
+        :param snapshots: list of HistoricalSnapshot instances
+        """
+
+        gene_data = {}
+        for snapshot in snapshots:
+            data = snapshot.data
+            snapshot.packed_data = cls.pack_data(data, gene_data)
+            snapshot.raw_data = None
+        HistoricalGeneData.store(gene_data)
+
+    def to_tsv(self):
+        data = self.data
+        panel = {
+            "name": self.panel.name,
+            "disease_sub_group": data.get("disease_sub_group", ""),
+            "disease_group": data.get("disease_group", ""),
+        }
+        entities = itertools.chain(
+            data.get("genes", []), data.get("strs", []), data.get("regions", [])
+        )
+        return tsv_response(
+            panel, "{}.{}".format(self.major_version, self.minor_version), entities
+        )
 
     @classmethod
     def import_panel(cls, panel, comment=None):
-        json = PanelSerializer(panel, include_entities=True)
-
-        instance = cls()
-        instance.panel = panel.panel
-        instance.major_version = panel.major_version
-        instance.minor_version = panel.minor_version
-        instance.reason = comment
-        instance.schema_version = panelapp.__version__
-        instance.data = json.data
-
-        instance.save()
-        return instance
+        return cls.import_panels([panel], comment=comment)[0]
+
+    @classmethod
+    def import_panels(cls, panels, comment=None):
+        """Save the current version of the panels
+
+        :param panels: list of GenePanelSnapshot instances
+        :param comment: reason for the new version
+        :return: list of HistoricalSnapshot instances
+        """
+
+        data = SnapshotWriter([panel.pk for panel in panels]).get_data()
+
+        instances = []
+        for panel in panels:
+            instance = cls()
+            instance.panel = panel.panel
+            instance.major_version = panel.major_version
+            instance.minor_version = panel.minor_version
+            instance.reason = comment
+            instance.schema_version = panelapp.__version__
+            instance.data = data[panel.pk]
+            instances.append(instance)
+
+        if settings.HISTORICAL_SNAPSHOTS_PACKED:
+            cls.pack(instances)
+
+        return cls.objects.bulk_create(instances)
 
     @staticmethod
     def ensemble(entity):
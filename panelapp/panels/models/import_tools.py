@@ -25,25 +25,36 @@ import json
 import re
 import csv
 import logging
+from collections import defaultdict
+from itertools import islice
 from datetime import datetime
 from django.db import models
+from django.db import connection
 from django.db import transaction
+from django.utils import timezone
 from model_utils.models import TimeStampedModel
 from accounts.models import User, Reviewer
 from .genepanelentrysnapshot import GenePanelEntrySnapshot
+from .evaluation import Evaluation
+from .comment import Comment
+from .activity import Activity
+from .trackrecord import TrackRecord
 from .strs import STR
 from panels.tasks import import_panel
 from panels.tasks import import_reviews
 from panels.exceptions import TSVIncorrectFormat
-from panels.exceptions import GeneDoesNotExist
 from panels.exceptions import UsersDoNotExist
 from panels.exceptions import GenesDoNotExist
 from panels.exceptions import IncorrectGeneRating
 from panels.exceptions import IsSuperPanelException
+from panels.cache import entities_cache
+from panels.cache import entity_search
+from panels.gene_names import gene_names
 from .gene import Gene
 from .genepanel import GenePanel
 from .region import Region
 from .genepanelsnapshot import GenePanelSnapshot
+from .historical_snapshot import HistoricalSnapshot
 from .Level4Title import Level4Title
 from .codes import ProcessingRunCode
 
@@ -51,66 +62,116 @@ from .codes import ProcessingRunCode
 logger = logging.getLogger(__name__)
 
 
+def update_from_values(model, key, fields, rows, panels=None, batch_size=1000):
+    """Update many rows with a few UPDATE ... FROM (VALUES ...) statements
+
+    :param model: Django model
+    :param key: name of the field used to find the rows
+    :param fields: list of the updated field names
+    :param rows: list of tuples with the key value followed by the new values
+    :param panels: only update rows which belong to these panel snapshot ids
+    :param batch_size: number of rows updated in a single statement
+    """
+
+    if not rows:
+        return
+
+    qn = connection.ops.quote_name
+    table = qn(model._meta.db_table)
+    key_field = model._meta.get_field(key)
+    update_fields = [model._meta.get_field(name) for name in fields]
+    all_fields = [key_field] + update_fields
+
+    sql = (
+        "UPDATE {table} SET {columns} FROM (VALUES {{values}}) AS v({aliases}) "
+        "WHERE {table}.{key} = v.c0"
+    ).format(
+        table=table,
+        columns=", ".join(
+            "{} = v.c{}".format(qn(field.column), i)
+            for i, field in enumerate(update_fields, 1)
+        ),
+        aliases=", ".join("c{}".format(i) for i in range(len(all_fields))),
+        key=qn(key_field.column),
+    )
+    extra_params = []
+    if panels is not None:
+        sql += " AND {}.{} = ANY(%s)".format(
+            table, qn(model._meta.get_field("panel").column)
+        )
+        extra_params.append(list(panels))
+
+    placeholder = "({})".format(
+        ", ".join("%s::{}".format(field.db_type(connection)) for field in all_fields)
+    )
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start : start + batch_size]
+            params = [
+                field.get_db_prep_save(value, connection)
+                for row in batch
+                for field, value in zip(all_fields, row)
+            ]
+            cursor.execute(
+                sql.format(values=", ".join([placeholder] * len(batch))),
+                params + extra_params,
+            )
+
+
+def get_gene_values(gene):
+    """Gene values converted to python types, used to check if gene has changed"""
+
+    return {
+        field.attname: field.to_python(getattr(gene, field.attname))
+        for field in Gene._meta.concrete_fields
+    }
+
+
 def update_gene_collection(results):
+    """Update genes with the new HGNC and Ensembl data
+
+    Incoming records are compared with the stored genes, only changed genes are
+    saved and only panels which have these genes get a new version. Gene data
+    copied to genes, STRs and regions in the panels is updated with a few
+    bulk statements.
+
+    :param results: dict with the lists of genes to `insert`, `update`, `delete`
+        and `update_symbol` (tuples with the new gene and the old gene symbol)
+    """
+
     with transaction.atomic():
         to_insert = results["insert"]
         to_update = results["update"]
         to_update_gene_symbol = results["update_symbol"]
         to_delete = results["delete"]
 
-        for p in GenePanelSnapshot.objects.get_active(
-            all=True, internal=True, superpanels=False
-        ):
-            p = p.increment_version()
+        gene_symbols = set(to_delete)
+        gene_symbols.update(record["gene_symbol"] for record in to_insert)
+        gene_symbols.update(record["gene_symbol"] for record in to_update)
+        for record in to_update_gene_symbol:
+            gene_symbols.update([record[0]["gene_symbol"], record[1]])
+
+        stored_genes = Gene.objects.in_bulk(gene_symbols)
+        stored_values = {
+            gene_symbol: get_gene_values(gene)
+            for gene_symbol, gene in stored_genes.items()
+        }
+        genes = {}  # gene symbol: gene with the new values
 
         for record in to_insert:
             new_gene = Gene.from_dict(record)
             if not new_gene.ensembl_genes:
                 new_gene.active = False
-            new_gene.save()
-            logger.debug("Inserted {} gene".format(record["gene_symbol"]))
+            genes[new_gene.gene_symbol] = new_gene
 
         to_insert = None
         results["insert"] = None
 
-        try:
-            user = User.objects.get(username="GEL")
-        except User.DoesNotExist:
-            user = User.objects.create(username="GEL", first_name="Genomics England")
-            Reviewer.objects.create(
-                user=user,
-                user_type="GEL",
-                affiliation="Genomics England",
-                workplace="Other",
-                role="Other",
-                group="Other",
-            )
-
-        genes_in_panels = GenePanelEntrySnapshot.objects.get_active()
-        grouped_genes = {gp.gene_core.gene_symbol: [] for gp in genes_in_panels}
-        for gene_in_panel in genes_in_panels:
-            grouped_genes[gene_in_panel.gene_core.gene_symbol].append(gene_in_panel)
-
-        strs_in_panels = STR.objects.get_active()
-        grouped_strs = {
-            gp.gene_core.gene_symbol: [] for gp in strs_in_panels if gp.gene_core
-        }
-        for str_in_panel in strs_in_panels:
-            grouped_strs[str_in_panel.gene_core.gene_symbol].append(str_in_panel)
-
-        regions_in_panels = Region.objects.get_active()
-        grouped_regions = {
-            gp.gene_core.gene_symbol: [] for gp in regions_in_panels if gp.gene_core
-        }
-        for region_in_panel in regions_in_panels:
-            grouped_regions[region_in_panel.gene_core.gene_symbol].append(
-                region_in_panel
-            )
-
         for record in to_update:
-            try:
-                gene = Gene.objects.get(gene_symbol=record["gene_symbol"])
-            except Gene.DoesNotExist:
+            gene = genes.get(record["gene_symbol"]) or stored_genes.get(
+                record["gene_symbol"]
+            )
+            if not gene:
                 gene = Gene(gene_symbol=record["gene_symbol"])
 
             gene.gene_name = record.get("gene_name", None)
@@ -127,30 +188,12 @@ def update_gene_collection(results):
                 gene.active = False
 
             gene.clean_import_dates(record)
+            genes[gene.gene_symbol] = gene
 
-            gene.save()
-
-            for gene_entry in grouped_genes.get(record["gene_symbol"], []):
-                gene_entry.gene_core = gene
-                gene_entry.gene = gene.dict_tr()
-                gene_entry.save()
-
-            for str_entry in grouped_strs.get(record["gene_symbol"], []):
-                str_entry.gene_core = gene
-                str_entry.gene = gene.dict_tr()
-                str_entry.save()
-
-            for region_entry in grouped_regions.get(record["gene_symbol"], []):
-                region_entry.gene_core = gene
-                region_entry.gene = gene.dict_tr()
-                region_entry.save()
-
-            logger.debug("Updated {} gene".format(record["gene_symbol"]))
-
-        grouped_genes = None
         to_update = None
         results["update"] = None
 
+        renamed_genes = {}  # old gene symbol: new gene
         for record in to_update_gene_symbol:
             active = True
             ensembl_genes = record[0].get("ensembl_genes", {})
@@ -172,14 +215,13 @@ def update_gene_collection(results):
                     record[0]["hgnc_release"], "%d-%m-%y"
                 )
 
-            try:
-                new_gene = Gene.objects.get(gene_symbol=record[0]["gene_symbol"])
-            except Gene.DoesNotExist:
-                new_gene = Gene()
+            new_gene = genes.get(record[0]["gene_symbol"]) or stored_genes.get(
+                record[0]["gene_symbol"]
+            )
 
             # check if record has ensembl genes data if it doesn't and gene has
             # it - keep it as it is and mark gene as active
-            if new_gene.pk:
+            if new_gene:
                 if not new_gene.ensembl_genes:
                     new_gene.active = active
                     new_gene.ensembl_genes = ensembl_genes
@@ -187,6 +229,7 @@ def update_gene_collection(results):
                     if not ensembl_genes:
                         new_gene.active = True
             else:
+                new_gene = Gene()
                 new_gene.active = active
                 new_gene.ensembl_genes = ensembl_genes
 
@@ -204,89 +247,142 @@ def update_gene_collection(results):
             new_gene.hgnc_id = record[0].get("hgnc_id", None)
 
             new_gene.clean_import_dates(record[0])
-            new_gene.save()
-
-            for gene_entry in GenePanelEntrySnapshot.objects.get_active().filter(
-                gene_core__gene_symbol=record[1]
-            ):
-                panel = gene_entry.panel
-                panel.update_gene(user, record[1], {"gene": new_gene})
-
-            for str_entry in STR.objects.get_active().filter(
-                gene_core__gene_symbol=record[1]
-            ):
-                panel = str_entry.panel
-                panel.update_str(user, str_entry.name, {"gene": new_gene})
-
-            for region_entry in Region.objects.get_active().filter(
-                gene_core__gene_symbol=record[1]
-            ):
-                panel = region_entry.panel
-                panel.update_region(user, region_entry.name, {"gene": new_gene})
+            genes[new_gene.gene_symbol] = new_gene
 
-            try:
-                d = Gene.objects.get(gene_symbol=record[1])
-                d.active = False
-                d.save()
+            old_gene = genes.get(record[1]) or stored_genes.get(record[1])
+            if old_gene:
+                old_gene.active = False
+                genes[record[1]] = old_gene
+                new_gene.previous_symbols = sorted(
+                    set(new_gene.previous_symbols or [])
+                    .union(old_gene.previous_symbols or [], [record[1]])
+                    .difference([new_gene.gene_symbol])
+                )
+                renamed_genes[record[1]] = new_gene
                 logger.debug(
                     "Updated {} gene. Renamed to {}".format(
                         record[1], record[0]["gene_symbol"]
                     )
                 )
-            except Gene.DoesNotExist:
+            else:
                 logger.debug(
                     "Created {} gene. Old gene {} didn't exist".format(
                         record[0]["gene_symbol"], record[1]
                     )
                 )
 
-        for record in to_delete:
-            gene_in_panels = GenePanelEntrySnapshot.objects.get_active().filter(
-                gene_core__gene_symbol=record
-            )
-            if gene_in_panels.count() > 0:
-                distinct_panels = gene_in_panels.distinct().values_list(
-                    "panel__panel__name", flat=True
+        for gene_symbol in to_delete:
+            old_gene = genes.get(gene_symbol) or stored_genes.get(gene_symbol)
+            if old_gene:
+                old_gene.active = False
+                genes[gene_symbol] = old_gene
+                logger.debug("Deleted {} gene".format(gene_symbol))
+            else:
+                logger.debug(
+                    "Didn't delete {} gene - doesn't exist".format(gene_symbol)
                 )
+
+        for model in [GenePanelEntrySnapshot, STR, Region]:
+            used_genes = defaultdict(set)
+            for gene_symbol, panel_name in model.objects.filter(
+                panel_id__in=model.objects.get_latest_ids(), gene_core__in=to_delete
+            ).values_list("gene_core_id", "panel__panel__name"):
+                used_genes[gene_symbol].add(panel_name)
+            for gene_symbol, panel_names in used_genes.items():
                 logger.warning(
                     "Deleted {} gene, this one is still used in {}".format(
-                        record, distinct_panels
+                        gene_symbol, sorted(panel_names)
                     )
                 )
 
-            strs_in_panels = STR.objects.get_active().filter(
-                gene_core__gene_symbol=record
+        new_genes = []
+        changed_genes = []
+        changed_gene_data = set()
+        for gene_symbol, gene in genes.items():
+            if gene_symbol not in stored_genes:
+                new_genes.append(gene)
+                continue
+
+            values = get_gene_values(gene)
+            if values != stored_values[gene_symbol]:
+                changed_genes.append(gene)
+                for name in ("active", "previous_symbols"):
+                    values.pop(name)
+                    stored_values[gene_symbol].pop(name)
+                if values != stored_values[gene_symbol]:
+                    changed_gene_data.add(gene_symbol)
+
+        changed_gene_data.difference_update(renamed_genes.keys())
+        changed_symbols = changed_gene_data.union(renamed_genes.keys())
+
+        panel_ids = set()
+        for model in [GenePanelEntrySnapshot, STR, Region]:
+            panel_ids.update(
+                model.objects.filter(
+                    panel_id__in=model.objects.get_latest_ids(),
+                    gene_core__in=changed_symbols,
+                ).values_list("panel_id", flat=True)
             )
-            if strs_in_panels.count() > 0:
-                distinct_panels = strs_in_panels.distinct().values_list(
-                    "panel__panel__name", flat=True
-                )
-                logger.warning(
-                    "Deleted {} gene, this one is still used in {}".format(
-                        record, distinct_panels
-                    )
-                )
 
-            regions_in_panels = Region.objects.get_active().filter(
-                gene_core__gene_symbol=record
+        panels = list(
+            GenePanelSnapshot.objects.get_active(
+                all=True, internal=True, superpanels=False
+            ).filter(pk__in=panel_ids)
+        )
+        HistoricalSnapshot.import_panels(panels)
+        for p in panels:
+            p = p.increment_version(historical_snapshot=False)
+
+        Gene.objects.bulk_create(new_genes)
+        logger.debug("Inserted {} genes".format(len(new_genes)))
+
+        gene_fields = [
+            field.name for field in Gene._meta.concrete_fields if not field.primary_key
+        ]
+        update_from_values(
+            Gene,
+            "gene_symbol",
+            gene_fields,
+            [
+                [gene.gene_symbol] + [getattr(gene, name) for name in gene_fields]
+                for gene in changed_genes
+            ],
+        )
+        logger.debug("Updated {} genes".format(len(changed_genes)))
+
+        for model in [GenePanelEntrySnapshot, STR, Region]:
+            update_from_values(
+                model,
+                "gene_core",
+                ["gene"],
+                [
+                    (gene_symbol, genes[gene_symbol].dict_tr())
+                    for gene_symbol in changed_gene_data
+                ],
+                panels=panel_ids,
             )
-            if regions_in_panels.count() > 0:
-                distinct_panels = regions_in_panels.distinct().values_list(
-                    "panel__panel__name", flat=True
+
+        if renamed_genes:
+            try:
+                user = User.objects.get(username="GEL")
+            except User.DoesNotExist:
+                user = User.objects.create(
+                    username="GEL", first_name="Genomics England"
                 )
-                logger.warning(
-                    "Deleted {} gene, this one is still used in {}".format(
-                        record, distinct_panels
-                    )
+                Reviewer.objects.create(
+                    user=user,
+                    user_type="GEL",
+                    affiliation="Genomics England",
+                    workplace="Other",
+                    role="Other",
+                    group="Other",
                 )
 
-            try:
-                old_gene = Gene.objects.get(gene_symbol=record)
-                old_gene.active = False
-                old_gene.save()
-                logger.debug("Deleted {} gene".format(record))
-            except Gene.DoesNotExist:
-                logger.debug("Didn't delete {} gene - doesn't exist".format(record))
+            rename_genes_in_panels(user, renamed_genes, panel_ids)
+
+        entities_cache.invalidate()
+        entity_search.add_panels(panel_ids)
+        gene_names.invalidate()
 
         duplicated_genes = get_duplicated_genes_in_panels()
         if duplicated_genes:
@@ -296,6 +392,118 @@ def update_gene_collection(results):
                 print(g)
 
 
+def rename_genes_in_panels(user, renamed_genes, panel_ids):
+    """Replace old genes in the panels with the renamed ones
+
+    Adds TrackRecord and Activity for each changed entity, same as
+    `update_gene`, `update_str` and `update_region`.
+
+    :param user: User changing the genes
+    :param renamed_genes: dict with the old gene symbol and the new Gene
+    :param panel_ids: ids of the active panel snapshots to update
+    """
+
+    panels = GenePanelSnapshot.objects.select_related("panel").in_bulk(panel_ids)
+
+    for model, entity_type in [
+        (GenePanelEntrySnapshot, "gene"),
+        (STR, "str"),
+        (Region, "region"),
+    ]:
+        entities = list(
+            model.objects.filter(
+                panel_id__in=panel_ids, gene_core__in=renamed_genes.keys()
+            ).values_list("pk", "panel_id", "gene_core_id", "saved_gel_status")
+        )
+        if not entities:
+            continue
+
+        names = {}
+        if entity_type != "gene":
+            names = dict(
+                model.objects.filter(
+                    pk__in=[entity[0] for entity in entities]
+                ).values_list("pk", "name")
+            )
+
+        tracks = []
+        activities = []
+        mitochondrial = []
+        for pk, panel_id, old_gene_symbol, status in entities:
+            new_gene_symbol = renamed_genes[old_gene_symbol].gene_symbol
+            if entity_type == "gene":
+                description = "{} was changed to {}".format(
+                    old_gene_symbol, new_gene_symbol
+                )
+                issue_type = TrackRecord.ISSUE_TYPES.ChangedGeneName
+            else:
+                description = "Gene: {} was changed to {}.".format(
+                    old_gene_symbol, new_gene_symbol
+                )
+                issue_type = TrackRecord.ISSUE_TYPES.AddedTag
+
+            entity_tracks = [(issue_type, description)]
+            if entity_type == "gene" and old_gene_symbol.startswith("MT-"):
+                mitochondrial.append(pk)
+                entity_tracks.append(
+                    (
+                        TrackRecord.ISSUE_TYPES.SetModeofInheritance,
+                        "Mode of inheritance for gene {} was set to {}".format(
+                            old_gene_symbol, "MITOCHONDRIAL"
+                        ),
+                    )
+                )
+
+            for issue_type, description in entity_tracks:
+                tracks.append(
+                    (
+                        pk,
+                        TrackRecord(
+                            gel_status=status or 0,
+                            curator_status=0,
+                            user=user,
+                            issue_type=issue_type,
+                            issue_description=description,
+                        ),
+                    )
+                )
+                activities.append(
+                    Activity.build(
+                        user,
+                        panels[panel_id],
+                        description,
+                        {
+                            "entity_name": names.get(pk, new_gene_symbol),
+                            "entity_type": entity_type,
+                        },
+                    )
+                )
+
+        update_from_values(
+            model,
+            "gene_core",
+            ["gene_core", "gene"],
+            [
+                (old_gene_symbol, new_gene.gene_symbol, new_gene.dict_tr())
+                for old_gene_symbol, new_gene in renamed_genes.items()
+            ],
+            panels=panel_ids,
+        )
+        if mitochondrial:
+            model.objects.filter(pk__in=mitochondrial).update(moi="MITOCHONDRIAL")
+
+        TrackRecord.objects.bulk_create([track for _, track in tracks])
+        track_through = model.track.through
+        entity_field = "{}_id".format(model._meta.model_name)
+        track_through.objects.bulk_create(
+            [
+                track_through(**{entity_field: pk, "trackrecord_id": track.pk})
+                for pk, track in tracks
+            ]
+        )
+        Activity.objects.bulk_create(activities)
+
+
 def get_duplicated_genes_in_panels():
     duplicated_genes = []
     items = GenePanelSnapshot.objects.get_active_annotated(True)
@@ -378,10 +586,10 @@ class UploadedPanelList(TimeStampedModel):
 
     _map_type_to_methods = {
         "gene": {
-            "check_exists": "has_gene",
-            "add": "add_gene",
+            "build": "build_gene",
             "update": "update_gene",
             "clear": [
+                "entities_index",
                 "cached_genes",
                 "current_genes_count",
                 "current_genes_duplicates",
@@ -391,16 +599,28 @@ class UploadedPanelList(TimeStampedModel):
             ],
         },
         "str": {
-            "check_exists": "has_str",
-            "add": "add_str",
+            "build": "build_str",
             "update": "update_str",
-            "clear": ["cached_strs", "get_all_strs", "get_all_strs_extra"],
+            "clear": [
+                "entities_index",
+                "cached_strs",
+                "current_strs_count",
+                "current_strs",
+                "get_all_strs",
+                "get_all_strs_extra",
+            ],
         },
         "region": {
-            "check_exists": "has_region",
-            "add": "add_region",
+            "build": "build_region",
             "update": "update_region",
-            "clear": ["cached_regions", "get_all_regions", "get_all_regions_extra"],
+            "clear": [
+                "entities_index",
+                "cached_regions",
+                "current_regions_count",
+                "current_regions",
+                "get_all_regions",
+                "get_all_regions_extra",
+            ],
         },
     }
 
@@ -511,43 +731,53 @@ class UploadedPanelList(TimeStampedModel):
 
         return entity_data
 
-    def process_line(self, key, line, user):
-        entity_data = self.get_entity_data(key, line)
+    def import_entities(self, user, panel, entities):
+        """Add new entities to the panel in bulk and update the existing ones
 
-        panel = self.get_panel(entity_data)
+        :param user: User importing the file
+        :param panel: GenePanelSnapshot
+        :param entities: list of entity data dicts, see `get_entity_data`
+        """
 
-        # Add or update entity
-        methods = self._map_type_to_methods[entity_data["entity_type"]]
+        names = {
+            entity_type: set(entity_names)
+            for entity_type, entity_names in panel.entities_index.items()
+        }
 
-        if entity_data["entity_type"] == "gene" or entity_data["gene_symbol"]:
-            # Check if we want to add a gene which doesn't exist in our database
-            try:
-                entity_data["gene"] = Gene.objects.get(
-                    gene_symbol=entity_data["gene_symbol"], active=True
-                )
-            except Gene.DoesNotExist:
-                raise GeneDoesNotExist(
-                    "{}, Gene: {}".format(key + 2, entity_data["gene_symbol"])
-                )
+        new_entities = []
+        existing_entities = []
+        for entity_data in entities:
+            entity_type = entity_data["entity_type"]
+            entity_name = entity_data["entity_name"]
 
-        if not getattr(panel, methods["check_exists"])(entity_data["entity_name"]):
-            getattr(panel, methods["add"])(
-                user, entity_data["entity_name"], entity_data, False
-            )
-        else:
+            if entity_name in names[entity_type]:
+                existing_entities.append(entity_data)
+                continue
+
+            names[entity_type].add(entity_name)
+            if entity_type == "gene":
+                entity = panel.build_gene(user, entity_data["gene"], entity_data)
+            else:
+                build = getattr(panel, self._map_type_to_methods[entity_type]["build"])
+                entity = build(user, entity_name, entity_data)
+            new_entities.append((entity, entity_data))
+
+        panel.bulk_add_entities(user, new_entities)
+
+        # entities which were already in the panel or repeated in the file
+        for entity_data in existing_entities:
+            methods = self._map_type_to_methods[entity_data["entity_type"]]
             getattr(panel, methods["update"])(
                 user, entity_data["entity_name"], entity_data, True
             )
-
-        getattr(panel, "clear_cache")(methods["clear"])
-
-    def get_panel(self, line_data):
-        return self._cached_panels[line_data["level4"]]
+            panel.clear_cache(methods["clear"])
 
     def process_file(self, user, background=False):
         """Process uploaded file
 
         If the file has too many lines it wil run the import in the background.abs
+        Genes are checked with a single query and new entities are added in bulk
+        for each panel, see `import_entities`.
 
         returns ProcessingRunCode
         """
@@ -607,20 +837,43 @@ class UploadedPanelList(TimeStampedModel):
                         panel.add_activity(user, "Added panel {}".format(panel.name))
                         self._cached_panels[line_data["level4"]] = active_panel
 
+                entities = []
                 for key, line in enumerate(lines):
                     try:
-                        self.process_line(key + 1, line, user)
-                    except GeneDoesNotExist as gene_error:
-                        errors["invalid_genes"].append(str(gene_error))
+                        entities.append((key + 1, self.get_entity_data(key + 1, line)))
                     except TSVIncorrectFormat as line_error:
                         errors["invalid_lines"].append(str(line_error))
 
+                # check if we want to add genes which don't exist in our database
+                genes = Gene.objects.filter(active=True).in_bulk(
+                    {entity_data["gene_symbol"] for _, entity_data in entities}
+                )
+                panel_entities = defaultdict(list)
+                for key, entity_data in entities:
+                    if (
+                        entity_data["entity_type"] == "gene"
+                        or entity_data["gene_symbol"]
+                    ):
+                        entity_data["gene"] = genes.get(entity_data["gene_symbol"])
+                        if not entity_data["gene"]:
+                            errors["invalid_genes"].append(
+                                "{}, Gene: {}".format(
+                                    key + 2, entity_data["gene_symbol"]
+                                )
+                            )
+                    panel_entities[entity_data["level4"]].append(entity_data)
+
                 if errors["invalid_genes"]:
                     raise GenesDoNotExist(", ".join(errors["invalid_genes"]))
 
                 if errors["invalid_lines"]:
                     raise TSVIncorrectFormat(", ".join(errors["invalid_lines"]))
 
+                for panel_name, entities_data in panel_entities.items():
+                    self.import_entities(
+                        user, self._cached_panels[panel_name], entities_data
+                    )
+
             self.imported = True
             self.save()
 
@@ -634,19 +887,34 @@ class UploadedReviewsList(TimeStampedModel):
     reviews = models.FileField(upload_to="reviews", max_length=255)
     import_log = models.TextField(default="")
 
+    CHUNK_SIZE = 1000
+
     panels = {}
     database_users = {}
 
-    def process_line(self, key, line):
-        """Process individual line"""
+    @staticmethod
+    def clean_gene_symbol(gene_symbol):
+        # TODO (Oleg) should be unified (in settings?)
+        return re.sub("[^0-9a-zA-Z~#_@-]", "", gene_symbol)
+
+    def read_lines(self):
+        """Lazily read the uploaded file, yields (key, line) skipping the header"""
+
+        with open(self.reviews.path, encoding="utf-8", errors="ignore") as file:
+            reader = csv.reader(file, delimiter="\t")
+            next(reader)  # skip header
+            yield from enumerate(reader)
+
+    def parse_line(self, key, line):
+        """Parse individual line
+
+        Returns tuple (gene symbol, panel name, username, evaluation data)"""
 
         aline = line
-        if len(aline) < 21:
+        if len(aline) < 22:
             raise TSVIncorrectFormat(str(key + 2))
 
-        gene_symbol = re.sub(
-            "[^0-9a-zA-Z~#_@-]", "", aline[0]
-        )  # TODO (Oleg) should be unified (in settings?)
+        gene_symbol = self.clean_gene_symbol(aline[0])
         # source = aline[1].split(";")
         level4 = aline[2].rstrip(" ")
         # level3 = aline[3]
@@ -687,95 +955,216 @@ class UploadedReviewsList(TimeStampedModel):
         comments = aline[20]
         username = aline[21]
 
-        active_panel = self.panels.get(level4)
-        if active_panel:
-            if not active_panel.has_gene(gene_symbol):
-                raise GeneDoesNotExist("Line: {} Gene: {}".format(key + 2, gene_symbol))
-
-            gene = active_panel.get_gene(gene_symbol)
-
-            evaluation_data = {
-                "comment": comments,
-                "mode_of_pathogenicity": mop,
-                "phenotypes": phenotype,
-                "moi": model_of_inheritance,
-                "current_diagnostic": current_diagnostic,
-                "rating": rate,
-                "publications": publication,
-            }
-            user = self.database_users.get(username)
-            gene.update_evaluation(user, evaluation_data)
+        evaluation_data = {
+            "comment": comments,
+            "mode_of_pathogenicity": mop,
+            "phenotypes": phenotype,
+            "moi": model_of_inheritance,
+            "current_diagnostic": current_diagnostic,
+            "rating": rate,
+            "publications": publication,
+        }
+        return gene_symbol, level4, username, evaluation_data
 
-    def process_file(self, user, background=False):
-        """Process uploaded file.
+    def process_chunk(self, chunk, errors):
+        """Process a chunk of lines
 
-        If file has more than 200 lines process it in the background.
+        Genes for the whole chunk are loaded with a single query, new evaluations
+        are added with bulk inserts. Users who already reviewed the gene update
+        their evaluation one by one.
 
-        Returns ProcessingRunCode"""
+        :param chunk: list of (key, line) tuples
+        :param errors: dict with lists of invalid genes and lines, new errors are
+            appended to it
+        """
 
-        with open(self.reviews.path, encoding="utf-8", errors="ignore") as file:
-            logger.info("Started importing list of genes")
-            reader = csv.reader(file, delimiter="\t")
-            next(reader)  # skip header
+        reviews = []
+        for key, line in chunk:
+            try:
+                gene_symbol, panel_name, username, evaluation_data = self.parse_line(
+                    key, line
+                )
+            except TSVIncorrectFormat as line_error:
+                errors["invalid_lines"].append(str(line_error))
+                continue
+
+            active_panel = self.panels.get(panel_name)
+            if active_panel:
+                reviews.append(
+                    (
+                        key,
+                        gene_symbol,
+                        active_panel,
+                        self.database_users.get(username),
+                        evaluation_data,
+                    )
+                )
 
-            with transaction.atomic():
-                lines = [line for line in reader]
-                users = set([line[21] for line in lines])
-
-                self.database_users = {
-                    u.username: u for u in User.objects.filter(username__in=users)
-                }
-                non_existing_users = users.symmetric_difference(
-                    self.database_users.keys()
+        if not reviews:
+            return
+
+        panels = {
+            active_panel.pk: active_panel for active_panel in self.panels.values()
+        }
+        entries = {}
+        for entry in GenePanelEntrySnapshot.objects.filter(
+            panel__in=set(review[2].pk for review in reviews),
+            gene_core__in=set(review[1] for review in reviews),
+        ):
+            entry.panel = panels[entry.panel_id]
+            entries[(entry.panel.pk, entry.gene_core_id)] = entry
+
+        evaluation_through = GenePanelEntrySnapshot.evaluation.through
+        reviewed = set(
+            evaluation_through.objects.filter(
+                genepanelentrysnapshot__in=[entry.pk for entry in entries.values()],
+                evaluation__user__in=set(review[3].pk for review in reviews),
+            ).values_list("genepanelentrysnapshot_id", "evaluation__user_id")
+        )
+
+        new_reviews = []
+        updated_reviews = []
+        for key, gene_symbol, active_panel, user, evaluation_data in reviews:
+            entry = entries.get((active_panel.pk, gene_symbol))
+            if not entry:
+                errors["invalid_genes"].append(
+                    "Line: {} Gene: {}".format(key + 2, gene_symbol)
                 )
-                if len(non_existing_users) > 0:
-                    raise UsersDoNotExist(", ".join(non_existing_users))
+                continue
 
-                # TODO (Oleg) replace with a constant
-                genes = set(
-                    [re.sub("[^0-9a-zA-Z~#_@-]", "", line[0]) for line in lines]
+            if (entry.pk, user.pk) in reviewed:
+                updated_reviews.append((entry, user, evaluation_data))
+            else:
+                reviewed.add((entry.pk, user.pk))
+                new_reviews.append(
+                    (
+                        entry,
+                        user,
+                        evaluation_data,
+                        entry.build_evaluation(user, evaluation_data),
+                    )
                 )
-                database_genes = Gene.objects.filter(gene_symbol__in=genes).values_list(
-                    "gene_symbol", flat=True
+
+        Evaluation.objects.bulk_create([review[3] for review in new_reviews])
+
+        comments = []
+        for entry, user, evaluation_data, evaluation in new_reviews:
+            if evaluation_data.get("comment"):
+                comments.append(
+                    (
+                        evaluation,
+                        Comment(
+                            user=user,
+                            comment=evaluation_data.get("comment"),
+                            version=entry.panel.version,
+                            last_updated=timezone.now(),
+                        ),
+                    )
                 )
-                non_existing_genes = genes.symmetric_difference(database_genes)
-                if len(non_existing_genes) > 0:
-                    raise GenesDoNotExist(", ".join(non_existing_genes))
-
-                if (
-                    not background and len(lines) > 50
-                ):  # panel is too big, process in the background
-                    import_reviews.delay(user.pk, self.pk)
-                    return ProcessingRunCode.PROCESS_BACKGROUND
-
-                panel_names = set([line[2] for line in lines])
-                self.panels = {
-                    panel.name: panel.active_panel
-                    for panel in GenePanel.objects.filter(name__in=panel_names)
-                }
-                for active_panel in list(self.panels.values()):
-                    if active_panel.is_super_panel:
-                        raise IsSuperPanelException
-                    self.panels[
-                        active_panel.panel.name
-                    ] = active_panel.increment_version()
-
-                errors = {"invalid_genes": [], "invalid_lines": []}
+        Comment.objects.bulk_create([comment for _, comment in comments])
 
-                for key, line in enumerate(lines):
-                    try:
-                        self.process_line(key, line)
-                    except GeneDoesNotExist as gene_error:
-                        errors["invalid_genes"].append(str(gene_error))
-                    except TSVIncorrectFormat as line_error:
-                        errors["invalid_lines"].append(str(line_error))
+        comments_through = Evaluation.comments.through
+        comments_through.objects.bulk_create(
+            [
+                comments_through(evaluation_id=evaluation.pk, comment_id=comment.pk)
+                for evaluation, comment in comments
+            ]
+        )
+        evaluation_through.objects.bulk_create(
+            [
+                evaluation_through(
+                    genepanelentrysnapshot_id=entry.pk, evaluation_id=evaluation.pk
+                )
+                for entry, _, _, evaluation in new_reviews
+            ]
+        )
+        Activity.objects.bulk_create(
+            [
+                Activity.build(
+                    user,
+                    entry.panel,
+                    entry.get_new_evaluation_activity(evaluation, evaluation_data),
+                    {"entity_name": entry.name, "entity_type": entry._entity_type},
+                )
+                for entry, user, evaluation_data, evaluation in new_reviews
+            ]
+        )
 
-                if errors["invalid_genes"]:
-                    raise GenesDoNotExist(", ".join(errors["invalid_genes"]))
+        for entry, user, evaluation_data in updated_reviews:
+            entry.update_evaluation(user, evaluation_data)
 
-                if errors["invalid_lines"]:
-                    raise TSVIncorrectFormat(", ".join(errors["invalid_lines"]))
+    def process_file(self, user, background=False):
+        """Process uploaded file.
 
-                self.imported = True
-                self.save()
-                return ProcessingRunCode.PROCESSED
+        If file has more than 50 lines process it in the background.
+
+        The file is read twice: first to check users and genes, then it's
+        processed in chunks of `CHUNK_SIZE` lines so we don't keep it in memory.
+
+        Returns ProcessingRunCode"""
+
+        logger.info("Started importing list of reviews")
+
+        users = set()
+        genes = set()
+        panel_names = set()
+        lines_count = 0
+        for key, line in self.read_lines():
+            lines_count += 1
+            if len(line) < 22:
+                continue  # reported as invalid line below
+            users.add(line[21])
+            genes.add(self.clean_gene_symbol(line[0]))
+            panel_names.add(line[2].rstrip(" "))
+
+        with transaction.atomic():
+            self.database_users = {
+                u.username: u for u in User.objects.filter(username__in=users)
+            }
+            non_existing_users = users.symmetric_difference(self.database_users.keys())
+            if len(non_existing_users) > 0:
+                raise UsersDoNotExist(", ".join(non_existing_users))
+
+            database_genes = Gene.objects.filter(gene_symbol__in=genes).values_list(
+                "gene_symbol", flat=True
+            )
+            non_existing_genes = genes.symmetric_difference(database_genes)
+            if len(non_existing_genes) > 0:
+                raise GenesDoNotExist(", ".join(non_existing_genes))
+
+            if (
+                not background and lines_count > 50
+            ):  # panel is too big, process in the background
+                import_reviews.delay(user.pk, self.pk)
+                return ProcessingRunCode.PROCESS_BACKGROUND
+
+            self.panels = {
+                panel.name: panel.active_panel
+                for panel in GenePanel.objects.filter(name__in=panel_names)
+            }
+            for active_panel in list(self.panels.values()):
+                if active_panel.is_super_panel:
+                    raise IsSuperPanelException
+                self.panels[active_panel.panel.name] = active_panel.increment_version()
+
+            errors = {"invalid_genes": [], "invalid_lines": []}
+
+            lines = self.read_lines()
+            chunk = list(islice(lines, self.CHUNK_SIZE))
+            while chunk:
+                self.process_chunk(chunk, errors)
+                chunk = list(islice(lines, self.CHUNK_SIZE))
+
+            if errors["invalid_genes"]:
+                raise GenesDoNotExist(", ".join(errors["invalid_genes"]))
+
+            if errors["invalid_lines"]:
+                raise TSVIncorrectFormat(", ".join(errors["invalid_lines"]))
+
+            for active_panel in self.panels.values():
+                active_panel.clear_cache()
+                active_panel._update_saved_stats()
+
+            self.imported = True
+            self.save()
+            return ProcessingRunCode.PROCESSED
@@ -26,6 +26,9 @@ from django_extensions.db.fields import AutoSlugField
 
 
 class PanelType(models.Model):
+    class Meta:
+        ordering = ["name"]
+
     name = models.CharField(max_length=128, unique=True)
     slug = AutoSlugField(populate_from="name", unique=True)
     description = models.TextField()
@@ -36,6 +36,7 @@ from django.core.serializers.json import DjangoJSONEncoder
 from django.contrib.postgres.fields import JSONField
 from django.contrib.postgres.fields import ArrayField
 from django.contrib.postgres.fields import IntegerRangeField
+from django.contrib.postgres.indexes import GistIndex
 from django.core import validators
 from django.urls import reverse
 
@@ -44,7 +45,6 @@ from model_utils import Choices
 from .entity import AbstractEntity
 from .entity import EntityManager
 from .gene import Gene
-from .genepanel import GenePanel
 from .evidence import Evidence
 from .evaluation import Evaluation
 from .trackrecord import TrackRecord
@@ -56,20 +56,7 @@ from .genepanelsnapshot import GenePanelSnapshot
 class RegionManager(EntityManager):
     """Regions Objects manager."""
 
-    def get_latest_ids(self, deleted=False):
-        """Get Region ids"""
-
-        qs = super().get_queryset()
-        if not deleted:
-            qs = qs.exclude(panel__panel__status=GenePanel.STATUS.deleted)
-
-        return (
-            qs.distinct("panel__panel_id")
-            .values_list("panel_id", flat=True)
-            .order_by(
-                "panel__panel_id", "-panel__major_version", "-panel__minor_version"
-            )
-        )
+    entity_type = "region"
 
     def get_active_slim(self, pks):
         qs = super().get_queryset().filter(panel_id__in=pks)
@@ -192,7 +179,12 @@ class Region(AbstractEntity, TimeStampedModel):
     class Meta:
         get_latest_by = "created"
         ordering = ["-saved_gel_status"]
-        indexes = [models.Index(fields=["name"])]
+        indexes = [
+            models.Index(fields=["name"]),
+            models.Index(fields=["panel", "name"]),
+            GistIndex(fields=["position_37"]),
+            GistIndex(fields=["position_38"]),
+        ]
 
     panel = models.ForeignKey(GenePanelSnapshot, on_delete=models.CASCADE)
 
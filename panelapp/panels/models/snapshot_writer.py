@@ -0,0 +1,283 @@
+##
+## Copyright (c) 2016-2019 Genomics England Ltd.
+##
+## This file is part of PanelApp
+## (see https://panelapp.genomicsengland.co.uk).
+##
+## Licensed to the Apache Software Foundation (ASF) under one
+## or more contributor license agreements.  See the NOTICE file
+## distributed with this work for additional information
+## regarding copyright ownership.  The ASF licenses this file
+## to you under the Apache License, Version 2.0 (the
+## "License"); you may not use this file except in compliance
+## with the License.  You may obtain a copy of the License at
+##
+##   http://www.apache.org/licenses/LICENSE-2.0
+##
+## Unless required by applicable law or agreed to in writing,
+## software distributed under the License is distributed on an
+## "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+## KIND, either express or implied.  See the License for the
+## specific language governing permissions and limitations
+## under the License.
+##
+import heapq
+from collections import defaultdict
+from rest_framework.fields import DateTimeField
+
+from .genepanel import GenePanel
+from .genepanelsnapshot import GenePanelSnapshot
+from .genepanelentrysnapshot import GenePanelEntrySnapshot
+from .strs import STR
+from .region import Region
+
+
+class SnapshotWriter:
+    """Build historical snapshot data for a list of panels
+
+    Data is the same as `PanelSerializer(panel, include_entities=True).data`,
+    but it's read with `values()` queries. The number of queries doesn't depend
+    on the number of panels, so many panels can be stored in one go.
+    """
+
+    STATS = ["number_of_genes", "number_of_strs", "number_of_regions"]
+
+    ENTITIES = [
+        (
+            "genes",
+            GenePanelEntrySnapshot,
+            "gene",
+            "gene_core__gene_symbol",
+            ["penetrance", "mode_of_pathogenicity"],
+        ),
+        (
+            "strs",
+            STR,
+            "str",
+            "name",
+            [
+                "penetrance",
+                "repeated_sequence",
+                "chromosome",
+                "position_37",
+                "position_38",
+                "normal_repeats",
+                "pathogenic_repeats",
+            ],
+        ),
+        (
+            "regions",
+            Region,
+            "region",
+            "name",
+            [
+                "verbose_name",
+                "penetrance",
+                "mode_of_pathogenicity",
+                "haploinsufficiency_score",
+                "triplosensitivity_score",
+                "required_overlap_percentage",
+                "type_of_variants",
+                "chromosome",
+                "position_37",
+                "position_38",
+            ],
+        ),
+    ]
+
+    def __init__(self, panel_ids):
+        """
+        :param panel_ids: list of GenePanelSnapshot ids
+        """
+
+        self.panel_ids = list(panel_ids)
+
+    def get_data(self):
+        """Snapshot data for each panel
+
+        :return: dict with GenePanelSnapshot id and the panel data
+        """
+
+        child_panels = defaultdict(list)
+        for panel_id, child_panel_id in (
+            GenePanelSnapshot.child_panels.through.objects.filter(
+                from_genepanelsnapshot_id__in=self.panel_ids
+            )
+            .order_by("pk")
+            .values_list("from_genepanelsnapshot_id", "to_genepanelsnapshot_id")
+        ):
+            child_panels[panel_id].append(child_panel_id)
+
+        entity_panel_ids = set()
+        for panel_id in self.panel_ids:
+            entity_panel_ids.update(child_panels.get(panel_id, [panel_id]))
+
+        panels = self.get_panels(entity_panel_ids.union(self.panel_ids))
+        entities = {
+            key: self.get_entities(
+                model, entity_type, entity_name, fields, entity_panel_ids
+            )
+            for key, model, entity_type, entity_name, fields in self.ENTITIES
+        }
+
+        out = {}
+        for panel_id in self.panel_ids:
+            data = dict(panels[panel_id])
+            for key in entities:
+                if panel_id in child_panels:
+                    items = heapq.merge(
+                        *[
+                            entities[key][child_panel_id]
+                            for child_panel_id in child_panels[panel_id]
+                        ]
+                    )
+                    data[key] = [
+                        dict(item, panel=panels[item_panel_id])
+                        for _, item_panel_id, item in items
+                    ]
+                else:
+                    data[key] = [item for _, _, item in entities[key][panel_id]]
+            out[panel_id] = data
+        return out
+
+    def get_panels(self, panel_ids):
+        """Panel data without entities, same as `PanelSerializer(panel).data`"""
+
+        snapshots = list(
+            GenePanelSnapshot.objects.filter(pk__in=panel_ids).values(
+                "pk",
+                "panel_id",
+                "panel__old_pk",
+                "level4title__name",
+                "level4title__level2title",
+                "level4title__level3title",
+                "panel__status",
+                "major_version",
+                "minor_version",
+                "created",
+                "old_panels",
+                "stats",
+            )
+        )
+
+        types = defaultdict(list)
+        for panel_id, name, slug, description in (
+            GenePanel.types.through.objects.filter(
+                genepanel_id__in=set(snapshot["panel_id"] for snapshot in snapshots)
+            )
+            .order_by("paneltype__name")
+            .values_list(
+                "genepanel_id",
+                "paneltype__name",
+                "paneltype__slug",
+                "paneltype__description",
+            )
+        ):
+            types[panel_id].append(
+                {"name": name, "slug": slug, "description": description}
+            )
+
+        created_field = DateTimeField()
+
+        panels = {}
+        for snapshot in snapshots:
+            panels[snapshot["pk"]] = {
+                "id": snapshot["panel_id"],
+                "hash_id": self.to_str(snapshot["panel__old_pk"]),
+                "name": self.to_str(snapshot["level4title__name"]),
+                "disease_group": self.to_str(snapshot["level4title__level2title"]),
+                "disease_sub_group": self.to_str(snapshot["level4title__level3title"]),
+                "status": self.to_str(snapshot["panel__status"]),
+                "version": "{}.{}".format(
+                    snapshot["major_version"], snapshot["minor_version"]
+                ),
+                "version_created": created_field.to_representation(snapshot["created"]),
+                "relevant_disorders": self.non_empty_items(snapshot["old_panels"]),
+                "stats": {
+                    key: value
+                    for key, value in (snapshot["stats"] or {}).items()
+                    if key in self.STATS
+                },
+                "types": types[snapshot["panel_id"]],
+            }
+        return panels
+
+    def get_entities(self, model, entity_type, entity_name, fields, panel_ids):
+        """Serialised entities grouped by the panel
+
+        :return: dict with GenePanelSnapshot id and list of
+            (position, panel id, entity data) tuples, position is used to keep
+            the order when entities from child panels are merged
+        """
+
+        entity_field = "{}_id".format(model._meta.model_name)
+
+        evidences = defaultdict(list)
+        for entity_id, name in (
+            model.evidence.through.objects.filter(
+                **{"{}__panel__in".format(model._meta.model_name): panel_ids}
+            )
+            .order_by("-evidence__created")
+            .values_list(entity_field, "evidence__name")
+        ):
+            evidences[entity_id].append(name)
+
+        tags = defaultdict(list)
+        for entity_id, name in (
+            model.tags.through.objects.filter(
+                **{"{}__panel__in".format(model._meta.model_name): panel_ids}
+            )
+            .order_by("pk")
+            .values_list(entity_field, "tag__name")
+        ):
+            tags[entity_id].append(name)
+
+        entities = defaultdict(list)
+        qs = model.objects.filter(panel__in=panel_ids).order_by(
+            "-saved_gel_status", entity_name
+        )
+        for index, entity in enumerate(
+            qs.values(
+                "pk",
+                "panel_id",
+                "gene",
+                "saved_gel_status",
+                "publications",
+                "phenotypes",
+                "moi",
+                entity_name,
+                *fields
+            )
+        ):
+            item = {
+                "gene_data": entity["gene"],
+                "entity_type": entity_type,
+                "entity_name": self.to_str(entity[entity_name]),
+                "confidence_level": self.to_str(entity["saved_gel_status"]),
+                "publications": self.non_empty_items(entity["publications"]),
+                "evidence": evidences[entity["pk"]],
+                "phenotypes": self.non_empty_items(entity["phenotypes"]),
+                "mode_of_inheritance": self.to_str(entity["moi"]),
+                "tags": tags[entity["pk"]],
+            }
+            for field in fields:
+                if field.startswith("position_"):
+                    value = entity[field]
+                    item[field.replace("position_", "grch") + "_coordinates"] = (
+                        [value.lower, value.upper] if value else None
+                    )
+                else:
+                    item[field] = entity[field]
+
+            entities[entity["panel_id"]].append((index, entity["panel_id"], item))
+        return entities
+
+    @staticmethod
+    def to_str(value):
+        return str(value) if value is not None else None
+
+    @staticmethod
+    def non_empty_items(items):
+        if items is None:
+            return None
+        return [item.strip() for item in items if item]
@@ -36,13 +36,13 @@ from django.core.serializers.json import DjangoJSONEncoder
 from django.contrib.postgres.fields import JSONField
 from django.contrib.postgres.fields import ArrayField
 from django.contrib.postgres.fields import IntegerRangeField
+from django.contrib.postgres.indexes import GistIndex
 from django.urls import reverse
 
 from model_utils.models import TimeStampedModel
 from .entity import AbstractEntity
 from .entity import EntityManager
 from .gene import Gene
-from .genepanel import GenePanel
 from .evidence import Evidence
 from .evaluation import Evaluation
 from .trackrecord import TrackRecord
@@ -54,20 +54,7 @@ from .genepanelsnapshot import GenePanelSnapshot
 class STRManager(EntityManager):
     """Objects manager for STR."""
 
-    def get_latest_ids(self, deleted=False):
-        """Get STR ids"""
-
-        qs = super().get_queryset()
-        if not deleted:
-            qs = qs.exclude(panel__panel__status=GenePanel.STATUS.deleted)
-
-        return (
-            qs.distinct("panel__panel_id")
-            .values_list("panel_id", flat=True)
-            .order_by(
-                "panel__panel_id", "-panel__major_version", "-panel__minor_version"
-            )
-        )
+    entity_type = "str"
 
     def get_active_slim(self, pks):
         qs = super().get_queryset().filter(panel_id__in=pks)
@@ -163,7 +150,12 @@ class STR(AbstractEntity, TimeStampedModel):
     class Meta:
         get_latest_by = "created"
         ordering = ["-saved_gel_status"]
-        indexes = [models.Index(fields=["name"])]
+        indexes = [
+            models.Index(fields=["name"]),
+            models.Index(fields=["panel", "name"]),
+            GistIndex(fields=["position_37"]),
+            GistIndex(fields=["position_38"]),
+        ]
 
     panel = models.ForeignKey(GenePanelSnapshot, on_delete=models.CASCADE)
 
@@ -0,0 +1,109 @@
+##
+## Copyright (c) 2016-2019 Genomics England Ltd.
+##
+## This file is part of PanelApp
+## (see https://panelapp.genomicsengland.co.uk).
+##
+## Licensed to the Apache Software Foundation (ASF) under one
+## or more contributor license agreements.  See the NOTICE file
+## distributed with this work for additional information
+## regarding copyright ownership.  The ASF licenses this file
+## to you under the Apache License, Version 2.0 (the
+## "License"); you may not use this file except in compliance
+## with the License.  You may obtain a copy of the License at
+##
+##   http://www.apache.org/licenses/LICENSE-2.0
+##
+## Unless required by applicable law or agreed to in writing,
+## software distributed under the License is distributed on an
+## "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+## KIND, either express or implied.  See the License for the
+## specific language governing permissions and limitations
+## under the License.
+##
+from array import array
+from bisect import bisect_left
+
+from panels.cache import GenerationMixin
+
+
+class PanelNames(GenerationMixin):
+    """Find panels by id, old id, name, relevant disorder or part of the name
+
+    Old ids, names and relevant disorders of all panels are kept in each
+    process with a sorted list of the suffixes of the names, so finding a panel
+    is a dict lookup and a binary search instead of a scan of the panels. The
+    index is rebuilt when the shared generation changes, i.e. after a panel is
+    added, renamed or its relevant disorders change.
+    """
+
+    generation_key = "panel_names:generation"
+
+    ID, OLD_PK, NAME, ALIAS, SUBSTRING = range(5)
+
+    @staticmethod
+    def build():
+        """Dict with the old ids and the panel numbers, dict with the lowercase
+        names and relevant disorders and the list of (rank, panel number)
+        tuples, the sorted suffixes of the lowercase names, array with the
+        panel number of each suffix and the panel ids sorted by the name"""
+
+        from panels.models import GenePanel
+
+        panel_ids = []
+        old_pks = {}
+        names = {}
+        suffixes = []
+        for panel_id, old_pk, name, aliases in (
+            GenePanel.objects.filter(active_snapshot__isnull=False)
+            .order_by("name", "pk")
+            .values_list("pk", "old_pk", "name", "active_snapshot__old_panels")
+        ):
+            panel = len(panel_ids)
+            panel_ids.append(panel_id)
+            name = name.lower()
+            if old_pk:
+                old_pks.setdefault(old_pk, []).append(panel)
+            names.setdefault(name, []).append((PanelNames.NAME, panel))
+            for alias in set(alias.lower() for alias in aliases or [] if alias):
+                names.setdefault(alias, []).append((PanelNames.ALIAS, panel))
+            suffixes.extend((name[start:], panel) for start in range(len(name)))
+
+        suffixes.sort()
+        keys = [suffix for suffix, _ in suffixes]
+        values = array("l", (panel for _, panel in suffixes))
+        return old_pks, names, keys, values, panel_ids
+
+    def find(self, identifier):
+        """Panels matching the identifier, the best matches first
+
+        Numeric identifiers only match the panel id.
+
+        :param identifier: panel id, old id, name, relevant disorder or part
+            of the name
+        :return: list of (GenePanel id, rank) tuples
+        """
+
+        if identifier.isdigit():
+            return [(int(identifier), self.ID)]
+
+        old_pks, names, keys, values, panel_ids = self.get_index()
+        term = identifier.lower()
+
+        ranks = {panel: self.OLD_PK for panel in old_pks.get(identifier, [])}
+        for rank, panel in names.get(term, []):
+            ranks.setdefault(panel, rank)
+
+        # every part of a name is the beginning of one of its suffixes
+        position = bisect_left(keys, term)
+        while position < len(keys) and keys[position].startswith(term):
+            ranks.setdefault(values[position], self.SUBSTRING)
+            position += 1
+
+        return [
+            (panel_ids[panel], rank)
+            for panel, rank in sorted(ranks.items(), key=lambda r: (r[1], r[0]))
+        ]
+
+
+panel_names = PanelNames()
@@ -56,6 +56,40 @@ def increment_panel_async(panel_pk, user_pk=None, version_comment=None, major=Fa
         gps._update_saved_stats()
 
 
+@shared_task
+def increment_super_panel(panel_pk, user_pk=None, major=False):
+    """Increment the super panel once for all changes of its child panels"""
+
+    from panels.cache import super_panel_increments
+
+    super_panel_increments.dequeue(panel_pk, major)
+    increment_panel_async(panel_pk, user_pk=user_pk, major=major, update_stats=False)
+
+    logging.debug(
+        "Super panel increments: {requested} requested, {coalesced} coalesced".format(
+            **super_panel_increments.stats()
+        )
+    )
+
+
+@shared_task
+def prebuild_entities_cache():
+    """Build the entities list after it's been invalidated"""
+
+    from panels.cache import entities_cache
+
+    entities_cache.prebuild()
+
+
+@shared_task
+def build_all_genes_export(requested=None):
+    """Rebuild the all genes export after it's been invalidated"""
+
+    from panels.tsv import all_genes_export
+
+    all_genes_export.build(requested)
+
+
 @shared_task
 def import_panel(user_pk, upload_pk):
     """Process large panel lists in the background
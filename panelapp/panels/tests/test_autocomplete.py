@@ -23,6 +23,8 @@
 ##
 from django.test import TransactionTestCase
 from django.urls import reverse_lazy
+from panels.gene_names import gene_names
+from panels.tests.factories import GeneFactory
 
 
 class TestAutocomplete(TransactionTestCase):
@@ -30,6 +32,26 @@ class TestAutocomplete(TransactionTestCase):
         res = self.client.get(reverse_lazy("autocomplete-gene"))
         self.assertEqual(res.status_code, 200)
 
+    def test_gene_search(self):
+        GeneFactory(gene_symbol="ABCD1", alias=["ALD"], gene_name="ATP binding")
+        GeneFactory(gene_symbol="ABCD", alias=["ABCD1B"], hgnc_id="HGNC:61")
+        GeneFactory(gene_symbol="ALD2", gene_name="Abcd like", active=False)
+        GeneFactory(gene_symbol="ATP7B", alias=["ABCD1"])
+
+        res = self.client.get(reverse_lazy("autocomplete-gene"), {"q": "abcd1"})
+        self.assertEqual(
+            [r["id"] for r in res.json()["results"]], ["ABCD1", "ATP7B", "ABCD"]
+        )
+        res = self.client.get(reverse_lazy("autocomplete-gene"), {"q": "ald"})
+        self.assertEqual([r["id"] for r in res.json()["results"]], ["ABCD1"])
+        res = self.client.get(reverse_lazy("autocomplete-gene"), {"q": "ATP7C"})
+        self.assertEqual([r["id"] for r in res.json()["results"]], ["ATP7B"])
+
+        self.assertEqual(gene_names.resolve("hgnc:61"), "ABCD")
+        self.assertEqual(gene_names.resolve("abcd1"), "ABCD1")
+        self.assertEqual(gene_names.resolve("ALD"), "ABCD1")
+        self.assertIsNone(gene_names.resolve("ALD2"))
+
     def test_source(self):
         res = self.client.get(reverse_lazy("autocomplete-source"))
         self.assertEqual(res.status_code, 200)
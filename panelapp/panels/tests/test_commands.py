@@ -2,10 +2,12 @@ from random import randint
 from django.urls import reverse_lazy
 from faker import Factory
 from django.core.management import call_command
+from django.test import override_settings
 from accounts.tests.setup import LoginGELUser
 from panels.models import GenePanelSnapshot, GenePanelEntrySnapshot
 from panels.models import Evidence
 from panels.models import Evaluation
+from panels.checks import check_entities_cache
 from panels.tests.factories import GeneFactory
 from panels.tests.factories import GenePanelSnapshotFactory
 
@@ -42,3 +44,12 @@ class CommandTest(LoginGELUser):
         )[0]
 
         assert panel.genepanelentrysnapshot_set.all()[0].saved_gel_status == 3
+
+    def test_entities_cache_check(self):
+        self.assertEqual(check_entities_cache(None), [])
+        with override_settings(ENTITIES_CACHE_SHARED=False):
+            self.assertEqual(
+                [error.id for error in check_entities_cache(None)], ["panels.E001"]
+            )
+            with override_settings(DEBUG=True):
+                self.assertEqual(check_entities_cache(None), [])
@@ -0,0 +1,127 @@
+##
+## Copyright (c) 2016-2019 Genomics England Ltd.
+##
+## This file is part of PanelApp
+## (see https://panelapp.genomicsengland.co.uk).
+##
+## Licensed to the Apache Software Foundation (ASF) under one
+## or more contributor license agreements.  See the NOTICE file
+## distributed with this work for additional information
+## regarding copyright ownership.  The ASF licenses this file
+## to you under the Apache License, Version 2.0 (the
+## "License"); you may not use this file except in compliance
+## with the License.  You may obtain a copy of the License at
+##
+##   http://www.apache.org/licenses/LICENSE-2.0
+##
+## Unless required by applicable law or agreed to in writing,
+## software distributed under the License is distributed on an
+## "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+## KIND, either express or implied.  See the License for the
+## specific language governing permissions and limitations
+## under the License.
+##
+from unittest.mock import patch
+from django.db import transaction
+from accounts.tests.setup import LoginGELUser
+from accounts.tests.setup import TestMigrations
+from panels.models import EntitySearchEntry
+from panels.models import GenePanel
+from panels.models.entity_search import EntitySearchManager
+from panels.genomic_intervals import GenomicIntervals
+from panels.tests.factories import GenePanelSnapshotFactory
+from panels.tests.factories import GenePanelEntrySnapshotFactory
+from panels.tests.factories import PanelTypeFactory
+from panels.tests.factories import RegionFactory
+from panels.tests.factories import STRFactory
+from panels.tests.factories import TagFactory
+
+
+class EntitySearchTest(LoginGELUser):
+    def test_entities_added(self):
+        gps = GenePanelSnapshotFactory(panel__status=GenePanel.STATUS.public)
+        gpes = GenePanelEntrySnapshotFactory(panel=gps)
+        str_item = STRFactory(panel=gps)
+        region = RegionFactory(panel=gps)
+
+        entries = {
+            entry.entity_type: entry for entry in EntitySearchEntry.objects.get_active()
+        }
+        self.assertEqual(entries["gene"].entity_id, gpes.pk)
+        self.assertEqual(entries["gene"].entity_name, gpes.gene_core.gene_symbol)
+        self.assertEqual(entries["gene"].panel_id, gps.panel_id)
+        self.assertEqual(
+            sorted(entries["gene"].evidences),
+            sorted(set(gpes.evidence.values_list("name", flat=True))),
+        )
+        self.assertEqual(entries["gene"].tags, [gpes.tags.get().name])
+        self.assertEqual(entries["str"].entity_name, str_item.name)
+        self.assertEqual(entries["region"].entity_name, region.name)
+
+    def test_entities_updated(self):
+        gps = GenePanelSnapshotFactory(panel__status=GenePanel.STATUS.public)
+        gpes = GenePanelEntrySnapshotFactory(panel=gps)
+        gene_symbol = gpes.gene_core.gene_symbol
+
+        tag = TagFactory()
+        gpes.tags.add(tag)
+        panel_type = PanelTypeFactory()
+        gps.panel.types.add(panel_type)
+        entry = EntitySearchEntry.objects.get(entity_id=gpes.pk)
+        self.assertIn(tag.name, entry.tags)
+        self.assertEqual(entry.panel_types, [panel_type.slug])
+
+        gps = gps.panel.active_panel
+        gps.delete_gene(gene_symbol)
+        self.assertFalse(EntitySearchEntry.objects.filter(entity_name=gene_symbol))
+
+    def test_panel_status(self):
+        gpes = GenePanelEntrySnapshotFactory(
+            panel__panel__status=GenePanel.STATUS.internal
+        )
+        self.assertFalse(EntitySearchEntry.objects.get_active())
+
+        panel = gpes.panel.panel
+        panel.status = GenePanel.STATUS.public
+        panel.save()
+        self.assertEqual(
+            [entry.entity_id for entry in EntitySearchEntry.objects.get_active()],
+            [gpes.pk],
+        )
+
+    def test_genomic_intervals_invalidated(self):
+        gps = GenePanelSnapshotFactory(panel__status=GenePanel.STATUS.public)
+
+        with patch.object(GenomicIntervals, "set_generation") as set_generation:
+            with transaction.atomic():
+                STRFactory.create_batch(3, panel=gps)
+                RegionFactory(panel=gps)
+            # once right away and once after the commit
+            self.assertEqual(set_generation.call_count, 2)
+
+        with patch.object(GenomicIntervals, "set_generation") as set_generation:
+            gps.panel.types.add(PanelTypeFactory())
+            set_generation.assert_not_called()
+
+
+class EntitySearchMigrationTest(TestMigrations):
+    app = "panels"
+    migrate_from = "0083_entities_cache_table"
+    migrate_to = "0084_fill_entity_search"
+
+    def setUpBeforeMigration(self, apps):
+        # entries of the live model don't match the schema of this migration
+        with patch.object(EntitySearchManager, "refresh"):
+            gps = GenePanelSnapshotFactory(panel__status=GenePanel.STATUS.public)
+            self.gpes = GenePanelEntrySnapshotFactory(panel=gps)
+            self.region = RegionFactory(panel=gps)
+
+    def test_entries_filled(self):
+        self.assertEqual(
+            sorted(
+                EntitySearchEntry.objects.get_active().values_list(
+                    "entity_type", "entity_id"
+                )
+            ),
+            [("gene", self.gpes.pk), ("region", self.region.pk)],
+        )
@@ -23,6 +23,7 @@
 ##
 from datetime import timedelta
 from random import randint
+from unittest.mock import patch
 from django.shortcuts import reverse
 from django.urls import reverse_lazy
 from django.utils import timezone
@@ -37,6 +38,7 @@ from panels.models import Evidence
 from panels.models import Evaluation
 from panels.models import GenePanelEntrySnapshot
 from panels.models import Activity
+from panels.views import ActivityListView
 
 
 fake = Factory.create()
@@ -243,6 +245,34 @@ class TestActivities(LoginReviewerUser):
         res = self.client.get(activities_url)
         self.assertEqual(len(res.context["activities"]), 0)
 
+    def test_activities_keyset_pages(self):
+        gps = GenePanelSnapshotFactory(panel__status=GenePanel.STATUS.public)
+        for i in range(5):
+            Activity.log(self.verified_user, gps, "Activity {}".format(i), {})
+        ids = list(
+            Activity.objects.order_by("-created", "-pk").values_list("pk", flat=True)
+        )
+
+        with patch.object(ActivityListView, "paginate_by", 2):
+            res = self.client.get(reverse("panels:activity"))
+            self.assertEqual([a.pk for a in res.context["activities"]], ids[:2])
+            self.assertIsNone(res.context["newer_activity"])
+            self.assertEqual(res.context["older_activity"], ids[1])
+
+            res = self.client.get(reverse("panels:activity") + "?before=" + str(ids[1]))
+            self.assertEqual([a.pk for a in res.context["activities"]], ids[2:4])
+            self.assertEqual(res.context["newer_activity"], ids[2])
+            self.assertEqual(res.context["older_activity"], ids[3])
+
+            res = self.client.get(reverse("panels:activity") + "?before=" + str(ids[3]))
+            self.assertEqual([a.pk for a in res.context["activities"]], ids[4:])
+            self.assertIsNone(res.context["older_activity"])
+
+            res = self.client.get(reverse("panels:activity") + "?after=" + str(ids[2]))
+            self.assertEqual([a.pk for a in res.context["activities"]], ids[:2])
+            self.assertIsNone(res.context["newer_activity"])
+            self.assertEqual(res.context["older_activity"], ids[1])
+
 
 class TestExportActivities(LoginGELUser):
     def test_export_activities_functionality(self):
@@ -271,4 +301,6 @@ class TestExportActivities(LoginGELUser):
             reverse("panels:activity") + "?format=csv&panel=" + str(gps.panel.pk)
         )
         res = self.client.get(activities_url)
-        self.assertTrue(gps.panel.name.encode() in res.content)
+        content = b"".join(res.streaming_content)
+        self.assertTrue(gps.panel.name.encode() in content)
+        self.assertTrue(content.startswith(b"Created,Panel,Panel ID"))
@@ -29,11 +29,16 @@ from faker import Factory
 from accounts.tests.setup import LoginGELUser
 from panels.models import GenePanel
 from panels.models import GenePanelEntrySnapshot
+from panels.models import GenePanelSnapshot
 from panels.models import HistoricalSnapshot
+from panels.models import TrackRecord
+from panels.models import Activity
+from panels.panel_names import panel_names
 from panels.tasks import email_panel_promoted
 from panels.tests.factories import GeneFactory
 from panels.tests.factories import STRFactory
 from panels.tests.factories import EvidenceFactory
+from panels.tests.factories import EvaluationFactory
 from panels.tests.factories import GenePanelSnapshotFactory
 from panels.tests.factories import GenePanelEntrySnapshotFactory
 from panels.tests.factories import PanelTypeFactory
@@ -137,6 +142,50 @@ class GenePanelTest(LoginGELUser):
         gp = GenePanel.objects.get(pk=gps.panel.pk)
         assert gp.status == data["status"]
 
+    def test_update_panel_names(self):
+        gps = GenePanelSnapshotFactory()
+        old_name = gps.panel.name
+        assert GenePanelSnapshot.objects.get_active(
+            all=True, internal=True, name=old_name
+        )
+
+        url = reverse_lazy("panels:update", kwargs={"pk": gps.panel.pk})
+        data = self.create_panel_data()
+        data["old_panels"] = ["Relevant disorder"]
+        self.client.post(url, data)
+
+        for name in [data["level4"], "relevant disorder"]:
+            qs = GenePanelSnapshot.objects.get_active(
+                all=True, internal=True, name=name
+            )
+            assert [p.panel_id for p in qs] == [gps.panel.pk]
+        assert not GenePanelSnapshot.objects.get_active(
+            all=True, internal=True, name=old_name
+        )
+
+    def test_find_panel_names(self):
+        first = GenePanelSnapshotFactory(panel__name="Cardiomyopathy")
+        second = GenePanelSnapshotFactory(
+            panel__name="Familial cardiomyopathy", old_panels=["Cardiomyopathy"]
+        )
+        third = GenePanelSnapshotFactory(panel__name="Arrhythmia")
+        GenePanel.objects.filter(pk=third.panel.pk).update(old_pk="CARDIO")
+        panel_names.invalidate()
+
+        assert panel_names.find("cardiomyopathy") == [
+            (first.panel.pk, panel_names.NAME),
+            (second.panel.pk, panel_names.ALIAS),
+        ]
+        assert panel_names.find("ial cardio") == [
+            (second.panel.pk, panel_names.SUBSTRING)
+        ]
+        assert panel_names.find("CARDIO") == [
+            (third.panel.pk, panel_names.OLD_PK),
+            (first.panel.pk, panel_names.SUBSTRING),
+            (second.panel.pk, panel_names.SUBSTRING),
+        ]
+        assert panel_names.find("cardiology") == []
+
     def test_update_panel_many_to_many(self):
         gpes = GenePanelEntrySnapshotFactory()
         url = reverse_lazy("panels:update", kwargs={"pk": gpes.panel.panel.pk})
@@ -249,6 +298,30 @@ class GenePanelTest(LoginGELUser):
         gp2 = GenePanel.objects.get(pk=gps2.panel.pk)
         assert gp2.active_panel == gps2
 
+    def test_active_snapshot_pointer(self):
+        """
+        GenePanel.active_snapshot should follow the latest version of the panel
+        """
+
+        gps = GenePanelSnapshotFactory(panel__status=GenePanel.STATUS.public)
+        gps.increment_version()
+        assert GenePanel.objects.get(pk=gps.panel.pk).active_snapshot == gps
+
+        # legacy snapshots with the lower version don't change active snapshot
+        old_gps = GenePanelSnapshotFactory(panel=gps.panel, minor_version=0)
+        assert GenePanel.objects.get(pk=gps.panel.pk).active_snapshot == gps
+        assert list(GenePanelSnapshot.objects.get_active()) == [gps]
+
+        # stale panel instance can't reset the pointer
+        old_gps.panel.name = "New name"
+        old_gps.panel.active_snapshot = old_gps
+        old_gps.panel.save()
+        assert GenePanel.objects.get(pk=gps.panel.pk).active_snapshot == gps
+
+        gps.delete()
+        assert GenePanel.objects.get(pk=old_gps.panel.pk).active_snapshot == old_gps
+        assert list(GenePanelSnapshot.objects.get_active()) == [old_gps]
+
     def prepare_compare(self):
         gene = GeneFactory()
 
@@ -307,6 +380,29 @@ class GenePanelTest(LoginGELUser):
         )
         self.assertEqual(res.status_code, 302)
 
+    def test_copy_reviews_entity_search(self):
+        gene, gps, gps2 = self.prepare_compare()
+        gps.panel.status = GenePanel.STATUS.public
+        gps.panel.save()
+
+        copy_from = gps2.get_gene(gene.gene_symbol)
+        copy_from.evaluation.add(EvaluationFactory(user=self.gel_user))
+        copy_from.evidence.add(
+            EvidenceFactory(name="Copied evidence", reviewer=self.gel_user.reviewer)
+        )
+
+        gps.copy_gene_reviews_from([gene.gene_symbol], gps2)
+
+        res = self.client.get(reverse_lazy("api:v1:entities-list"))
+        evidences = [
+            entity["evidence"]
+            for entity in res.json()["results"]
+            if entity["entity_name"] == gene.gene_symbol
+            and entity["panel"]["id"] == gps.panel.pk
+        ]
+        self.assertEqual(len(evidences), 1)
+        self.assertIn("Copied evidence", evidences[0])
+
     def test_compare_genes(self):
         gene, gps, gps2 = self.prepare_compare()
         res = self.client.get(
@@ -419,6 +515,35 @@ class GenePanelTest(LoginGELUser):
         self.assertEqual(ap.get_gene(gene.gene_symbol).evidence.count(), 1)
         self.assertEqual(sorted(ap.get_gene("A1CF").phenotypes), sorted(["57h", "wef"]))
 
+    def test_import_panel_bulk(self):
+        GeneFactory(gene_symbol="ABCC5-AS1")
+        GeneFactory(gene_symbol="A1CF")
+        GeneFactory(gene_symbol="STR_1")
+        GeneFactory(gene_symbol="STR_2")
+
+        file_path = os.path.join(os.path.dirname(__file__), "import_panel_data.tsv")
+        test_panel_file = os.path.abspath(file_path)
+
+        with open(test_panel_file) as f:
+            url = reverse_lazy("panels:upload_panels")
+            self.client.post(url, {"panel_list": f})
+
+        ap = GenePanel.objects.get(name="Panel One").active_panel
+        gene = ap.get_gene("ABCC5-AS1")
+        self.assertEqual(gene.saved_gel_status, 3)
+        self.assertEqual(
+            list(gene.evidence.values_list("name", flat=True)), ["Expert Review Green"]
+        )
+        track = gene.track.get()
+        self.assertEqual(track.gel_status, 3)
+        self.assertIn(TrackRecord.ISSUE_TYPES.Created, track.issue_type)
+        self.assertTrue(
+            Activity.objects.filter(
+                panel=ap.panel, entity_name="ABCC5-AS1", text=track.issue_description
+            ).exists()
+        )
+        self.assertEqual(ap.stats, ap._get_stats())
+
     def test_import_incorrect_position(self):
         GeneFactory(gene_symbol="STR_1")
 
@@ -461,7 +586,38 @@ class GenePanelTest(LoginGELUser):
             reverse_lazy("panels:download_panel_tsv", args=(gps.panel.pk, "01234"))
         )
         self.assertEqual(res.status_code, 200)
-        self.assertEqual(res.content.find(grey_gene.encode()), -1)
+        self.assertEqual(b"".join(res.streaming_content).find(grey_gene.encode()), -1)
+
+    def test_download_panel_rows(self):
+        gps = GenePanelSnapshotFactory()
+        evaluations = [
+            EvaluationFactory(rating=rating)
+            for rating in ("GREEN", "GREEN", "AMBER", "RED")
+        ]
+        gpes = GenePanelEntrySnapshotFactory(
+            panel=gps, saved_gel_status=3, evaluation=evaluations
+        )
+        GenePanelEntrySnapshotFactory.create_batch(5, panel=gps, saved_gel_status=2)
+        GenePanelEntrySnapshotFactory(panel=gps, saved_gel_status=3, flagged=True)
+
+        res = self.client.get(
+            reverse_lazy("panels:download_panel_tsv", args=(gps.panel.pk, "3"))
+        )
+        self.assertEqual(res.status_code, 200)
+        with self.assertNumQueries(3):
+            content = b"".join(res.streaming_content).decode()
+
+        rows = [line.split("\t") for line in content.splitlines()]
+        self.assertEqual(len(rows), 2)
+        row = dict(zip(rows[0], rows[1]))
+        self.assertEqual(row["Entity Name"], gpes.gene_core.gene_symbol)
+        self.assertEqual(row["GEL_Status"], "3")
+        self.assertEqual(row["Flagged"], "False")
+        self.assertEqual(row["UserRatings_Green_amber_red"], "50;25;25")
+        self.assertEqual(
+            set(row["Sources(; separated)"].split(";")),
+            set(gpes.evidence.values_list("name", flat=True)),
+        )
 
     def test_download_old_panel(self):
         gene, gps, gps2 = self.prepare_compare()
@@ -486,9 +642,25 @@ class GenePanelTest(LoginGELUser):
     def test_download_all_panels(self):
         gps = GenePanelSnapshotFactory()
         GenePanelEntrySnapshotFactory.create_batch(2, panel=gps)
+        STRFactory(panel=gps)
+        GenePanelEntrySnapshotFactory.create_batch(2)
 
         res = self.client.get(reverse_lazy("panels:download_panels"))
         self.assertEqual(res.status_code, 200)
+        with self.assertNumQueries(4):
+            content = b"".join(res.streaming_content).decode()
+
+        rows = [line.split("\t") for line in content.splitlines()]
+        self.assertEqual(len(rows), 4)
+        row = [
+            dict(zip(rows[0], row)) for row in rows if row[0] == gps.level4title.name
+        ][0]
+        contributors = gps.contributors
+        self.assertEqual(row["#reviewers"], str(len(contributors)))
+        self.assertEqual(
+            set(row["Reviewer emails (;)"].split(";")),
+            set(user.email for user in contributors),
+        )
 
     def test_email_panel_promoted(self):
         gpes = GenePanelEntrySnapshotFactory()
@@ -121,6 +121,24 @@ class GenePanelSnapshotReviewerTest(LoginReviewerUser):
 
         assert panel.version == gps.version
 
+    def test_add_gene_by_alias(self):
+        gene = GeneFactory(alias=["OLD1"])
+        gps = GenePanelSnapshotFactory()
+        url = reverse_lazy(
+            "panels:add_entity", kwargs={"pk": gps.panel.pk, "entity_type": "gene"}
+        )
+        gene_data = {
+            "gene": "old1",
+            "source": Evidence.OTHER_SOURCES[0],
+            "rating": Evaluation.RATINGS.AMBER,
+            "moi": "BIALLELIC, autosomal or pseudoautosomal",
+            "mode_of_pathogenicity": "",
+            "penetrance": GenePanelEntrySnapshot.PENETRANCE.Incomplete,
+        }
+        res = self.client.post(url, gene_data)
+        self.assertEqual(res.status_code, 302)
+        self.assertTrue(gps.panel.active_panel.has_gene(gene.gene_symbol))
+
 
 class GenePanelSnapshotTest(LoginGELUser):
     """GeL currator tests"""
@@ -23,8 +23,13 @@
 ##
 import json
 import os
+import tempfile
+import time
+from unittest.mock import patch
 from datetime import datetime
 from datetime import date
+from django.db import transaction
+from django.test import override_settings
 from django.urls import reverse_lazy
 from faker import Factory
 from accounts.tests.setup import LoginGELUser
@@ -37,11 +42,16 @@ from panels.models import STR
 from panels.models import Region
 from panels.models import GenePanelEntrySnapshot
 from panels.models import HistoricalSnapshot
+from panels.models import TrackRecord
 from panels.tests.factories import GeneFactory
 from panels.tests.factories import GenePanelSnapshotFactory
 from panels.tests.factories import GenePanelEntrySnapshotFactory
 from panels.tests.factories import STRFactory
 from panels.tests.factories import RegionFactory
+from panels.tests.factories import TagFactory
+from panels.cache import entities_cache
+from panels.tasks import prebuild_entities_cache
+from panels.tsv import all_genes_export
 
 
 fake = Factory.create()
@@ -97,11 +107,130 @@ class GeneTest(LoginGELUser):
         res = self.client.get(reverse_lazy("panels:download_genes"))
         self.assertEqual(res.status_code, 200)
 
+    def test_download_genes_super_panel(self):
+        child = GenePanelSnapshotFactory(panel__status=GenePanel.STATUS.public)
+        gpes = GenePanelEntrySnapshotFactory(panel=child, saved_gel_status=3)
+        parent = GenePanelSnapshotFactory(panel__status=GenePanel.STATUS.public)
+        parent.child_panels.set([child])
+
+        res = self.client.get(reverse_lazy("panels:download_genes"))
+        self.assertEqual(res.status_code, 200)
+        content = b"".join(res.streaming_content).decode()
+        rows = [line.split("\t") for line in content.splitlines()]
+        self.assertEqual(len(rows), 3)
+
+        header = rows[0]
+        rows = [dict(zip(header, row)) for row in rows[1:]]
+        for row in rows:
+            self.assertEqual(row["Symbol"], gpes.gene_core.gene_symbol)
+            self.assertEqual(row["Panel Id"], str(child.panel.pk))
+            self.assertEqual(row["List"], "green")
+        self.assertEqual(
+            sorted(row["Super Panel Id"] for row in rows),
+            sorted(["-", str(parent.panel.pk)]),
+        )
+
+    def test_download_genes_prebuilt(self):
+        gpes = GenePanelEntrySnapshotFactory()
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "exports", "all_genes.tsv")
+            with override_settings(ALL_GENES_EXPORT_FILE=path):
+                self.assertTrue(all_genes_export.build())
+                self.assertFalse(all_genes_export.build(requested=time.time() - 60))
+
+                res = self.client.get(reverse_lazy("panels:download_genes"))
+                self.assertEqual(res.status_code, 200)
+                content = b"".join(res.streaming_content)
+                res.close()
+
+        self.assertIn(gpes.gene_core.gene_symbol.encode(), content)
+
+    def test_download_genes_prebuilt_tags(self):
+        gpes = GenePanelEntrySnapshotFactory()
+        tag = TagFactory()
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "all_genes.tsv")
+            with override_settings(ALL_GENES_EXPORT_FILE=path):
+                all_genes_export.build()
+                gpes.update_tags(self.gel_user, [tag])
+
+                with open(path) as f:
+                    content = f.read()
+
+        self.assertIn(tag.name, content)
+
     def test_list_genes(self):
         GenePanelEntrySnapshotFactory.create_batch(3)
         r = self.client.get(reverse_lazy("panels:entities_list"))
         self.assertEqual(r.status_code, 200)
 
+    def test_list_genes_cache(self):
+        gps = GenePanelSnapshotFactory(panel__status=GenePanel.STATUS.public)
+        gpes = GenePanelEntrySnapshotFactory(panel=gps)
+        gene_symbol = gpes.gene_core.gene_symbol
+        url = reverse_lazy("panels:entities_list")
+
+        self.client.logout()
+        r = self.client.get(url)
+        self.assertIn(("gene", gene_symbol, gene_symbol), r.context["entities"])
+
+        gps.delete_gene(gene_symbol)
+        r = self.client.get(url)
+        self.assertNotIn(("gene", gene_symbol, gene_symbol), r.context["entities"])
+
+        gpes = GenePanelEntrySnapshotFactory(panel=gps.panel.active_panel)
+        gene_symbol = gpes.gene_core.gene_symbol
+        gps.clear_django_cache()
+        r = self.client.get(url)
+        self.assertIn(("gene", gene_symbol, gene_symbol), r.context["entities"])
+
+        gps.panel.status = GenePanel.STATUS.internal
+        gps.panel.save()
+        r = self.client.get(url)
+        self.assertNotIn(("gene", gene_symbol, gene_symbol), r.context["entities"])
+
+    def test_list_genes_cache_invalidated_after_commit(self):
+        with transaction.atomic():
+            entities_cache.invalidate()
+            generation = entities_cache.get_generation()
+            entities_cache.get()
+        self.assertNotEqual(entities_cache.get_generation(), generation)
+
+    def test_list_genes_cache_invalidated_once(self):
+        with override_settings(ENTITIES_CACHE_PREBUILD=True):
+            with patch.object(prebuild_entities_cache, "delay") as delay:
+                with transaction.atomic():
+                    for _ in range(3):
+                        entities_cache.invalidate()
+                        with transaction.atomic():
+                            entities_cache.invalidate()
+                    generation = entities_cache.get_generation()
+                self.assertEqual(delay.call_count, 1)
+
+                # the queued prebuild hasn't run yet
+                entities_cache.invalidate()
+                self.assertEqual(delay.call_count, 1)
+                self.assertNotEqual(entities_cache.get_generation(), generation)
+
+                entities_cache.prebuild()
+                entities_cache.invalidate()
+                self.assertEqual(delay.call_count, 2)
+
+    def test_list_genes_cache_invalidated_after_rollback(self):
+        with patch.object(entities_cache, "run") as run:
+            with self.assertRaises(ValueError):
+                with transaction.atomic():
+                    entities_cache.invalidate()
+                    raise ValueError
+            run.assert_not_called()
+
+            # the rolled back callback doesn't hold back the next transaction
+            with transaction.atomic():
+                entities_cache.invalidate()
+            run.assert_called_once_with()
+
     def test_gene_not_ready(self):
         gpes = GenePanelEntrySnapshotFactory()
         url = reverse_lazy(
@@ -132,6 +261,10 @@ class GeneTest(LoginGELUser):
         RegionFactory.create_batch(2, panel=gps)  # random STRs
         RegionFactory.create(gene_core=gene_to_update_symbol, panel=gps)
 
+        not_changed_gps = GenePanelSnapshotFactory()
+        GenePanelEntrySnapshotFactory.create_batch(2, panel=not_changed_gps)
+        not_changed_version = not_changed_gps.version
+
         to_insert = [
             Gene(gene_symbol="A", ensembl_genes={"inserted": True}).dict_tr(),
             Gene(gene_symbol="B", ensembl_genes={"inserted": True}).dict_tr(),
@@ -215,6 +348,10 @@ class GeneTest(LoginGELUser):
             Gene.objects.get(gene_symbol=gene_to_delete.gene_symbol).active
         )
         self.assertTrue(Gene.objects.get(gene_symbol="A").active)
+        self.assertEqual(
+            Gene.objects.get(gene_symbol="C").previous_symbols,
+            [gene_to_update_symbol.gene_symbol],
+        )
 
         self.assertTrue(
             GenePanelEntrySnapshot.objects.get(gene_core__gene_symbol="C").gene.get(
@@ -233,6 +370,14 @@ class GeneTest(LoginGELUser):
                 "updated"
             ]
         )
+        self.assertTrue(
+            GenePanelEntrySnapshot.objects.get(gene_core__gene_symbol="C")
+            .track.filter(issue_type=TrackRecord.ISSUE_TYPES.ChangedGeneName)
+            .exists()
+        )
+
+        not_changed_gps.refresh_from_db()
+        self.assertEqual(not_changed_gps.version, not_changed_version)
 
     def test_get_panels_for_a_gene(self):
         gene = GeneFactory()
@@ -288,6 +433,51 @@ class GeneTest(LoginGELUser):
             2,
         )
 
+        res = self.client.get(
+            reverse_lazy("panels:index") + "?gene=" + gene.gene_symbol
+        )
+        self.assertEqual(
+            sorted(panel.pk for panel in res.context_data["panels"]), [gps.pk, gps2.pk]
+        )
+
         url = reverse_lazy("panels:entity_detail", kwargs={"slug": gene.gene_symbol})
         res = self.client.get(url)
         self.assertEqual(len(res.context_data["entries"]), 2)
+
+    def test_entity_detail_from_index(self):
+        gene = GeneFactory()
+        tag = TagFactory()
+
+        gps = GenePanelSnapshotFactory(panel__status=GenePanel.STATUS.public)
+        GenePanelEntrySnapshotFactory.create(gene_core=gene, panel=gps, tags=[tag])
+        str_item = STRFactory.create(gene_core=gene, panel=gps)
+
+        gps2 = GenePanelSnapshotFactory(panel__status=GenePanel.STATUS.public)
+        GenePanelEntrySnapshotFactory.create(gene_core=gene, panel=gps2)
+        GenePanelEntrySnapshotFactory.create_batch(2, panel=gps2)  # random genes
+
+        gps3 = GenePanelSnapshotFactory(panel__status=GenePanel.STATUS.deleted)
+        GenePanelEntrySnapshotFactory.create(gene_core=gene, panel=gps3)
+
+        url = reverse_lazy("panels:entity_detail", kwargs={"slug": gene.gene_symbol})
+        res = self.client.get(url)
+        self.assertEqual(
+            sorted(
+                (entry._entity_type, entry.panel.pk)
+                for entry in res.context_data["entries"]
+            ),
+            sorted([("gene", gps.pk), ("gene", gps2.pk), ("str", gps.pk)]),
+        )
+        self.assertEqual(list(res.context_data["entries_regions"]), [])
+
+        res = self.client.get(url + "?tag_filter=" + tag.name)
+        self.assertEqual(
+            [entry.panel.pk for entry in res.context_data["entries"]], [gps.pk]
+        )
+
+        str_item.gene_core = None
+        str_item.gene = None
+        str_item.save()
+        url = reverse_lazy("panels:entity_detail", kwargs={"slug": str_item.name})
+        res = self.client.get(url)
+        self.assertEqual(list(res.context_data["entries_strs"]), [str_item])
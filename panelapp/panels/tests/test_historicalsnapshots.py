@@ -22,11 +22,13 @@
 ## under the License.
 ##
 import json
+from django.core.serializers.json import DjangoJSONEncoder
 from django.urls import reverse_lazy
 from django.test import Client
 from faker import Factory
 from random import choice
 from accounts.tests.setup import LoginGELUser
+from api.v1.serializers import PanelSerializer
 from panels.models import GenePanelEntrySnapshot
 from panels.models import Region
 from panels.models import GenePanelSnapshot
@@ -34,8 +36,12 @@ from panels.models import Evidence
 from panels.models import GenePanel
 from panels.models import Evaluation
 from panels.models import HistoricalSnapshot
+from panels.models import HistoricalGeneData
+from panels.models.snapshot_writer import SnapshotWriter
 from panels.tests.factories import GeneFactory
 from panels.tests.factories import RegionFactory
+from panels.tests.factories import STRFactory
+from panels.tests.factories import PanelTypeFactory
 from panels.tests.factories import GenePanelSnapshotFactory
 from panels.tests.factories import GenePanelEntrySnapshotFactory
 from panels.tests.factories import TagFactory
@@ -74,8 +80,45 @@ class HistoricalSnapshotTest(LoginGELUser):
         assert snap.major_version == gpes.major_version
         assert snap.minor_version == gpes.minor_version
 
+    def test_snapshot_writer(self):
+        gps = GenePanelSnapshotFactory()
+        gps.panel.types.add(PanelTypeFactory(), PanelTypeFactory())
+        GenePanelEntrySnapshotFactory.create_batch(3, panel=gps)
+        GenePanelEntrySnapshotFactory.create(panel=gps, tags=TagFactory.create_batch(2))
+        STRFactory.create_batch(2, panel=gps)
+        RegionFactory.create_batch(2, panel=gps)
+
+        child = GenePanelSnapshotFactory()
+        GenePanelEntrySnapshotFactory.create_batch(2, panel=child)
+        super_panel = GenePanelSnapshotFactory()
+        super_panel.child_panels.set([gps, child])
+
+        data = SnapshotWriter([gps.pk, super_panel.pk]).get_data()
+        for panel in [gps, super_panel]:
+            panel = GenePanelSnapshot.objects.get(pk=panel.pk)
+            serializer = PanelSerializer(panel, include_entities=True)
+            self.assertEqual(
+                json.loads(json.dumps(data[panel.pk], cls=DjangoJSONEncoder)),
+                json.loads(json.dumps(serializer.data, cls=DjangoJSONEncoder)),
+            )
+
+    def test_packed_snapshot(self):
+        gps = GenePanelSnapshotFactory()
+        GenePanelEntrySnapshotFactory.create_batch(2, panel=gps)
+        STRFactory.create(panel=gps, gene_core=None, gene=None)
+        data = SnapshotWriter([gps.pk]).get_data()[gps.pk]
+
+        HistoricalSnapshot.import_panel(gps)
+        HistoricalSnapshot.import_panel(gps)
+        self.assertEqual(HistoricalGeneData.objects.count(), 2)
+
+        snap = HistoricalSnapshot.objects.first()
+        self.assertIsNone(snap.raw_data)
+        self.assertEqual(snap.data, json.loads(json.dumps(data, cls=DjangoJSONEncoder)))
+
     def test_download_historical_snapshot_tsv(self):
         gps = GenePanelSnapshotFactory()
+        gpes = GenePanelEntrySnapshotFactory(panel=gps)
 
         HistoricalSnapshot.import_panel(gps)
         gps.increment_version()
@@ -84,6 +127,14 @@ class HistoricalSnapshotTest(LoginGELUser):
         )
         assert res.status_code == 200
 
+        content = b"".join(res.streaming_content).decode()
+        rows = [line.split("\t") for line in content.splitlines()]
+        assert len(rows) == 2
+        row = dict(zip(rows[0], rows[1]))
+        assert row["Entity Name"] == gpes.gene_core.gene_symbol
+        assert row["Level2"] == gps.level4title.level2title
+        assert row["version"] == "0.0"
+
     def test_legacy_api_retrieve_historical_snapshot(self):
         gps = GenePanelSnapshotFactory()
         GenePanelEntrySnapshotFactory.create_batch(2, panel=gps)  # random genes
@@ -688,7 +688,7 @@ class RegionTest(LoginGELUser):
             reverse_lazy("panels:download_panel_tsv", args=(gps.panel.pk, "01234"))
         )
         self.assertEqual(res.status_code, 200)
-        self.assertTrue(res.content.find(b"region") != 1)
+        self.assertTrue(b"".join(res.streaming_content).find(b"region") != 1)
 
     def test_download_all_regions(self):
         gpes = GenePanelEntrySnapshotFactory()
@@ -23,6 +23,8 @@
 ##
 import os
 from random import randint
+from unittest.mock import patch
+from django.core.files.uploadedfile import SimpleUploadedFile
 from django.urls import reverse_lazy
 from django.utils import timezone
 from faker import Factory
@@ -31,6 +33,7 @@ from panels.models import GenePanel
 from panels.models import Comment
 from panels.models import Evaluation
 from panels.models import Activity
+from panels.models import UploadedReviewsList
 from panels.tests.factories import TagFactory
 from panels.tests.factories import GeneFactory
 from panels.tests.factories import GenePanelSnapshotFactory
@@ -80,6 +83,42 @@ class GeneEvaluationTest(LoginGELUser):
         )
         assert current_version == gpes.panel.panel.active_panel.version
 
+    def test_incremental_stats(self):
+        """Stats updated on review match the full recount"""
+
+        gpes = GenePanelEntrySnapshotFactory()
+        gpes.panel._update_saved_stats()
+        url = reverse_lazy(
+            "panels:review_entity",
+            kwargs={
+                "pk": gpes.panel.panel.pk,
+                "entity_type": "gene",
+                "entity_name": gpes.gene.get("gene_symbol"),
+            },
+        )
+        gene_data = {
+            "rating": Evaluation.RATINGS.GREEN,
+            "current_diagnostic": True,
+            "comments": fake.sentence(),
+            "publications": "",
+            "phenotypes": "",
+            "moi": [x for x in Evaluation.MODES_OF_INHERITANCE][randint(1, 12)][0],
+            "mode_of_pathogenicity": [x for x in Evaluation.MODES_OF_PATHOGENICITY][
+                randint(1, 2)
+            ][0],
+        }
+        res = self.client.post(url, gene_data)
+        assert res.status_code == 302
+
+        panel = gpes.panel.panel.active_panel
+        assert str(self.gel_user.pk) in panel.stats["gene_reviewer_counts"]
+        assert panel.stats == panel._get_stats()
+
+        panel.delete_gene(gpes.gene.get("gene_symbol"))
+        panel.refresh_from_db()
+        assert panel.stats["number_of_genes"] == 0
+        assert panel.stats == panel._get_stats()
+
     def test_add_evaluation_comments_only(self):
         """Add comments"""
 
@@ -746,3 +785,63 @@ class GeneReviewTest(LoginGELUser):
         ap = GenePanel.objects.get(name="Panel One").active_panel
         assert ap.get_gene(gene.gene_symbol).evaluation.count() == 1
         assert current_version != ap.version
+
+    def test_import_reviews_chunks(self):
+        gene = GeneFactory(gene_symbol="ABCC5-AS1")
+        gene2 = GeneFactory(gene_symbol="ABCC5")
+        gps = GenePanelSnapshotFactory()
+        gps.panel.name = "Panel One"
+        gps.panel.save()
+        GenePanelEntrySnapshotFactory.create(
+            gene_core=gene, panel=gps, evaluation=(None,)
+        )
+        gpes2 = GenePanelEntrySnapshotFactory.create(
+            gene_core=gene2, panel=gps, evaluation=(None,)
+        )
+        gpes2.update_evaluation(
+            self.verified_user,
+            {
+                "rating": "RED",
+                "publications": [],
+                "phenotypes": [],
+                "current_diagnostic": False,
+            },
+        )
+
+        file_path = os.path.join(os.path.dirname(__file__), "import_reviews_data.tsv")
+        with open(file_path) as f:
+            header, line = f.read().splitlines()[:2]
+        line = line.split("\t")
+
+        def review(gene_symbol, rating, username):
+            line[0], line[18], line[21] = gene_symbol, rating, username
+            return "\t".join(line)
+
+        content = "\n".join(
+            [
+                header,
+                review(gene.gene_symbol, "GREEN", "verified_user"),
+                review(gene.gene_symbol, "AMBER", "gel_user"),
+                review(gene2.gene_symbol, "GREEN", "verified_user"),
+                review(gene.gene_symbol, "RED", "verified_user"),
+            ]
+        )
+
+        with patch.object(UploadedReviewsList, "CHUNK_SIZE", 2):
+            url = reverse_lazy("panels:upload_reviews")
+            self.client.post(
+                url,
+                {"review_list": SimpleUploadedFile("reviews.tsv", content.encode())},
+            )
+
+        ap = GenePanel.objects.get(name="Panel One").active_panel
+        evaluations = ap.get_gene(gene.gene_symbol).evaluation.all()
+        assert evaluations.count() == 2
+        assert evaluations.get(user=self.verified_user).rating == "RED"
+        assert evaluations.get(user=self.gel_user).rating == "AMBER"
+        assert evaluations.get(user=self.gel_user).comments.count() == 1
+
+        evaluation = ap.get_gene(gene2.gene_symbol).evaluation.get()
+        assert evaluation.rating == "GREEN"
+        assert Activity.objects.filter(panel=ap.panel).count() == 5
+        assert ap.stats["number_of_reviewers"] == 2
@@ -774,4 +774,6 @@ class STRTest(LoginGELUser):
             reverse_lazy("panels:download_panel_tsv", args=(gps.panel.pk, "01234"))
         )
         self.assertEqual(res.status_code, 200)
-        self.assertTrue(res.content.find(strs.repeated_sequence.encode()) != 1)
+        self.assertTrue(
+            b"".join(res.streaming_content).find(strs.repeated_sequence.encode()) != 1
+        )
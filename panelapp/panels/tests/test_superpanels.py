@@ -22,15 +22,20 @@
 ## under the License.
 ##
 from random import randint
+from unittest.mock import patch
+from django.db import transaction
+from django.test import override_settings
 from django.urls import reverse_lazy
 from faker import Factory
 from accounts.tests.setup import LoginGELUser
 from accounts.tests.setup import LoginReviewerUser
+from panels.cache import super_panel_increments
 from panels.models import GenePanelEntrySnapshot
 from panels.models import GenePanelSnapshot
 from panels.models import Evidence
 from panels.models import GenePanel
 from panels.models import Evaluation
+from panels.tasks import increment_super_panel
 from panels.tests.factories import GeneFactory
 from panels.tests.factories import GenePanelSnapshotFactory
 from panels.tests.factories import GenePanelEntrySnapshotFactory
@@ -84,7 +89,8 @@ class SuperPanelsTest(LoginGELUser):
 
         parent.child_panels.set([child1, child2])
         parent._update_saved_stats()
-        del parent.is_super_panel
+        child1.refresh_from_db()
+        child2.refresh_from_db()
 
         self.assertEqual(len(parent.get_all_entities_extra), 3)
         self.assertTrue(parent.is_super_panel)
@@ -93,6 +99,16 @@ class SuperPanelsTest(LoginGELUser):
         self.assertIn(child1.get_gene(gene1.gene_symbol), parent.get_all_entities_extra)
         self.assertIn(child1.get_gene(gene2.gene_symbol), parent.get_all_entities_extra)
         self.assertTrue(parent.genepanelentrysnapshot_set.count() == 0)
+        self.assertEqual(
+            parent.current_genes_count, {gene1.gene_symbol: 2, gene2.gene_symbol: 1}
+        )
+        self.assertEqual(parent.current_genes_duplicates, [gene1.gene_symbol])
+
+        self.assertTrue(child2.has_gene(gene1.gene_symbol))
+        self.assertFalse(child2.has_gene(gene2.gene_symbol))
+        self.assertEqual(child2.current_genes, [gene1.gene_symbol])
+        child2.add_gene(self.gel_user, gene2.gene_symbol, gene2_data)
+        self.assertTrue(child2.has_gene(gene2.gene_symbol))
 
     def test_increment_version(self):
         gene1 = GeneFactory()
@@ -374,3 +390,130 @@ class SuperPanelsTest(LoginGELUser):
         del parent2.panel.active_panel
         parent2 = parent2.panel.active_panel
         self.assertEqual(parent2.version, "0.3")
+
+    def test_coalesce_super_panel_increments(self):
+        child1 = GenePanelSnapshotFactory(panel__status=GenePanel.STATUS.public)
+        child2 = GenePanelSnapshotFactory(panel__status=GenePanel.STATUS.public)
+        parent = GenePanelSnapshotFactory(panel__status=GenePanel.STATUS.public)
+        parent.child_panels.set([child1, child2])
+        stats = super_panel_increments.stats()
+
+        # the task waits for the countdown, it doesn't run while the changes
+        # are made
+        with patch.object(increment_super_panel, "apply_async") as apply_async:
+            self.add_genes([child1, child1, child1, child2])
+
+        self.assertEqual(GenePanelSnapshot.objects.get(pk=child1.pk).version, "0.3")
+        self.assertEqual(apply_async.call_count, 1)
+        args, _ = apply_async.call_args
+        increment_super_panel(*args[0], **args[1])
+        self.assertEqual(GenePanelSnapshot.objects.get(pk=parent.pk).version, "0.1")
+
+        new_stats = super_panel_increments.stats()
+        self.assertEqual(new_stats["requested"] - stats["requested"], 4)
+        self.assertEqual(new_stats["queued"] - stats["queued"], 1)
+        self.assertEqual(new_stats["coalesced"] - stats["coalesced"], 3)
+
+    def test_super_panel_increment_rolled_back(self):
+        child = GenePanelSnapshotFactory(panel__status=GenePanel.STATUS.public)
+        parent = GenePanelSnapshotFactory(panel__status=GenePanel.STATUS.public)
+        parent.child_panels.set([child])
+
+        with self.assertRaises(ValueError):
+            with transaction.atomic():
+                self.add_genes([child])
+                raise ValueError
+
+        # the next commit only increments the super panels of its own changes
+        other_child = GenePanelSnapshotFactory(panel__status=GenePanel.STATUS.public)
+        other_parent = GenePanelSnapshotFactory(panel__status=GenePanel.STATUS.public)
+        other_parent.child_panels.set([other_child])
+        self.add_genes([other_child])
+
+        self.assertEqual(GenePanelSnapshot.objects.get(pk=child.pk).version, "0.0")
+        self.assertEqual(GenePanelSnapshot.objects.get(pk=parent.pk).version, "0.0")
+        self.assertEqual(
+            GenePanelSnapshot.objects.get(pk=other_parent.pk).version, "0.1"
+        )
+
+    def test_super_panel_increment_local_cache(self):
+        child = GenePanelSnapshotFactory(panel__status=GenePanel.STATUS.public)
+        parent = GenePanelSnapshotFactory(panel__status=GenePanel.STATUS.public)
+        parent.child_panels.set([child])
+        stats = super_panel_increments.stats()
+
+        with override_settings(ENTITIES_CACHE_SHARED=False):
+            with patch.object(increment_super_panel, "apply_async") as apply_async:
+                self.add_genes([child, child])
+
+        self.assertFalse(apply_async.called)
+        self.assertEqual(GenePanelSnapshot.objects.get(pk=parent.pk).version, "0.2")
+        self.assertEqual(super_panel_increments.stats(), stats)
+
+    def add_genes(self, panels):
+        with transaction.atomic():
+            for child, gene in zip(panels, GeneFactory.create_batch(len(panels))):
+                child.add_gene(
+                    self.gel_user,
+                    gene.gene_symbol,
+                    {
+                        "gene": gene.pk,
+                        "sources": [Evidence.OTHER_SOURCES[0]],
+                        "phenotypes": fake.sentences(nb=3),
+                        "rating": Evaluation.RATINGS.AMBER,
+                        "moi": [x for x in Evaluation.MODES_OF_INHERITANCE][
+                            randint(1, 12)
+                        ][0],
+                        "penetrance": GenePanelEntrySnapshot.PENETRANCE.Incomplete,
+                        "current_diagnostic": False,
+                    },
+                )
+
+    def test_super_panel_increment_already_queued(self):
+        child = GenePanelSnapshotFactory(panel__status=GenePanel.STATUS.public)
+        parent = GenePanelSnapshotFactory(panel__status=GenePanel.STATUS.public)
+        parent.child_panels.set([child])
+
+        super_panel_increments.cache.add(
+            super_panel_increments.queued_key.format(parent.pk, False), True
+        )
+        child.increment_version()
+        self.assertEqual(GenePanelSnapshot.objects.get(pk=parent.pk).version, "0.0")
+
+        super_panel_increments.dequeue(parent.pk)
+        GenePanelSnapshot.objects.get(pk=child.pk).increment_version()
+        self.assertEqual(GenePanelSnapshot.objects.get(pk=parent.pk).version, "0.1")
+
+    def test_panel_roles(self):
+        child = GenePanelSnapshotFactory(panel__status=GenePanel.STATUS.public)
+        parent = GenePanelSnapshotFactory(panel__status=GenePanel.STATUS.public)
+        loaded_child = GenePanelSnapshot.objects.get(pk=child.pk)
+
+        parent.child_panels.set([child])
+        self.assertTrue(parent.is_super_panel)
+        self.assertFalse(parent.is_child_panel)
+
+        loaded_child.save()
+        child.refresh_from_db()
+        self.assertTrue(child.is_child_panel)
+        self.assertFalse(child.is_super_panel)
+
+        panels = GenePanelSnapshot.objects.get_active_annotated()
+        self.assertNotIn("GROUP BY", str(panels.query))
+        self.assertEqual(
+            {panel.pk for panel in panels if panel.is_super_panel}, {parent.pk}
+        )
+        self.assertEqual(
+            panels.get(pk=parent.pk).panel_type_slugs,
+            sorted(parent.panel.types.values_list("slug", flat=True)),
+        )
+
+        child.genepanelsnapshot_set.clear()
+        parent.refresh_from_db()
+        self.assertFalse(parent.is_super_panel)
+        self.assertFalse(child.is_child_panel)
+
+        parent.child_panels.set([child])
+        child.delete()
+        parent.refresh_from_db()
+        self.assertFalse(parent.is_super_panel)
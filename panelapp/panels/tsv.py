@@ -0,0 +1,534 @@
+##
+## Copyright (c) 2016-2019 Genomics England Ltd.
+##
+## This file is part of PanelApp
+## (see https://panelapp.genomicsengland.co.uk).
+##
+## Licensed to the Apache Software Foundation (ASF) under one
+## or more contributor license agreements.  See the NOTICE file
+## distributed with this work for additional information
+## regarding copyright ownership.  The ASF licenses this file
+## to you under the Apache License, Version 2.0 (the
+## "License"); you may not use this file except in compliance
+## with the License.  You may obtain a copy of the License at
+##
+##   http://www.apache.org/licenses/LICENSE-2.0
+##
+## Unless required by applicable law or agreed to in writing,
+## software distributed under the License is distributed on an
+## "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+## KIND, either express or implied.  See the License for the
+## specific language governing permissions and limitations
+## under the License.
+##
+"""TSV exports of panels and genes
+
+Current panel versions and historical snapshots share the same row builder.
+Rows are streamed to the client as soon as they are ready, so the response
+starts straight away and the memory usage doesn't depend on the panel size.
+"""
+
+import csv
+import os
+import tempfile
+import time
+from collections import defaultdict
+from django.conf import settings
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.db.models import Case
+from django.db.models import Count
+from django.db.models import F
+from django.db.models import When
+from django.db import transaction
+from django.http import StreamingHttpResponse
+
+from panels.utils import EchoWriter
+from panels.utils import remove_non_ascii
+
+
+HEADER = (
+    "Entity Name",
+    "Entity type",
+    "Gene Symbol",
+    "Sources(; separated)",
+    "Level4",
+    "Level3",
+    "Level2",
+    "Model_Of_Inheritance",
+    "Phenotypes",
+    "Omim",
+    "Orphanet",
+    "HPO",
+    "Publications",
+    "Description",
+    "Flagged",
+    "GEL_Status",
+    "UserRatings_Green_amber_red",
+    "version",
+    "ready",
+    "Mode of pathogenicity",
+    "EnsemblId(GRch37)",
+    "EnsemblId(GRch38)",
+    "HGNC",
+    "Position Chromosome",
+    "Position GRCh37 Start",
+    "Position GRCh37 End",
+    "Position GRCh38 Start",
+    "Position GRCh38 End",
+    "STR Repeated Sequence",
+    "STR Normal Repeats",
+    "STR Pathogenic Repeats",
+    "Region Haploinsufficiency Score",
+    "Region Triplosensitivity Score",
+    "Region Required Overlap Percentage",
+    "Region Variant Type",
+    "Region Verbose Name",
+)
+
+ALL_GENES_HEADER = (
+    "Symbol",
+    "Panel Id",
+    "Panel Name",
+    "Panel Version",
+    "Panel Status",
+    "List",
+    "Sources",
+    "Mode of inheritance",
+    "Mode of pathogenicity",
+    "Tags",
+    "EnsemblId(GRch37)",
+    "EnsemblId(GRch38)",
+    "HGNC",
+    "Biotype",
+    "Phenotypes",
+    "GeneLocation((GRch37)",
+    "GeneLocation((GRch38)",
+    "Panel Types",
+    "Super Panel Id",
+    "Super Panel Name",
+    "Super Panel Version",
+)
+
+ENTITY_FIELDS = {
+    "gene": ["mode_of_pathogenicity"],
+    "str": [
+        "chromosome",
+        "position_37",
+        "position_38",
+        "repeated_sequence",
+        "normal_repeats",
+        "pathogenic_repeats",
+    ],
+    "region": [
+        "chromosome",
+        "position_37",
+        "position_38",
+        "haploinsufficiency_score",
+        "triplosensitivity_score",
+        "required_overlap_percentage",
+        "type_of_variants",
+        "verbose_name",
+    ],
+}
+
+
+def get_ratings(green, amber, red):
+    """Percentage of green, amber and red reviews"""
+
+    total = green + amber + red
+    if not total:
+        return 0, 0, 0
+    return tuple(round(count * 100.0 / total) for count in (green, amber, red))
+
+
+def get_ensembl_data(gene_data, assembly, release, key="ensembl_id"):
+    if not gene_data:
+        return ""
+    try:
+        return gene_data["ensembl_genes"][assembly][release][key]
+    except (KeyError, TypeError):
+        return "-"
+
+
+def join_items(items):
+    return ";".join(map(remove_non_ascii, items)) if items else ""
+
+
+def get_row(entity, panel, version):
+    """TSV row for the entity
+
+    :param entity: entity data in the same format as historical snapshots,
+        current versions also include `flagged`, `ready` and `ratings`
+    :param panel: dict with panel name, disease group and disease sub group,
+        current versions also include `omim`, `orphanet` and `hpo`
+    :param version: panel version
+    :return: tuple with the values for `HEADER` columns
+    """
+
+    gene_data = entity.get("gene_data") or {}
+    is_gene = entity["entity_type"] == "gene"
+    grch37 = entity.get("grch37_coordinates") or ("", "")
+    grch38 = entity.get("grch38_coordinates") or ("", "")
+
+    # historical snapshots don't store panel OMIM, use gene OMIM instead
+    omim = panel.get("omim", gene_data.get("omim_gene"))
+
+    return (
+        entity["entity_name"],
+        entity["entity_type"],
+        entity["entity_name"] if is_gene else gene_data.get("gene_symbol", ""),
+        ";".join([ev for ev in entity.get("evidence") or [] if ev]),
+        panel["name"],
+        panel["disease_sub_group"],
+        panel["disease_group"],
+        entity.get("mode_of_inheritance"),
+        join_items(entity.get("phenotypes")),
+        join_items(omim),
+        join_items(panel.get("orphanet")),
+        join_items(panel.get("hpo")),
+        join_items(entity.get("publications")),
+        "",
+        str(entity["flagged"]) if "flagged" in entity else "",
+        str(entity.get("confidence_level", "")),
+        ";".join(map(str, entity["ratings"])) if "ratings" in entity else "",
+        str(version),
+        entity.get("ready", ""),
+        entity.get("mode_of_pathogenicity") if is_gene else "",
+        get_ensembl_data(gene_data, "GRch37", "82"),
+        get_ensembl_data(gene_data, "GRch38", "90"),
+        gene_data.get("hgnc_id", "-") if gene_data else "",
+        entity.get("chromosome", ""),
+        grch37[0],
+        grch37[1],
+        grch38[0],
+        grch38[1],
+        entity.get("repeated_sequence", ""),
+        entity.get("normal_repeats", ""),
+        entity.get("pathogenic_repeats", ""),
+        entity.get("haploinsufficiency_score", ""),
+        entity.get("triplosensitivity_score", ""),
+        entity.get("required_overlap_percentage", ""),
+        entity.get("type_of_variants", ""),
+        entity.get("verbose_name", ""),
+    )
+
+
+def get_panel_entities(panel, categories):
+    """Entities of the current panel version
+
+    Evidences and reviews are aggregated in the entities query, so there is
+    one query per entity type whatever the number of entities. Entities are
+    read with a server side cursor.
+
+    :param panel: GenePanelSnapshot instance
+    :param categories: string with the confidence levels to include
+    :return: generator with entities in the same format as historical snapshots
+    """
+
+    from panels.models import GenePanelEntrySnapshot
+    from panels.models import STR
+    from panels.models import Region
+
+    if panel.is_super_panel:
+        panel_ids = list(panel.child_panels.values_list("pk", flat=True))
+    else:
+        panel_ids = [panel.pk]
+
+    statuses = [int(category) for category in categories if category != "0"]
+
+    for model, entity_type, entity_name in (
+        (GenePanelEntrySnapshot, "gene", "gene_core__gene_symbol"),
+        (STR, "str", "name"),
+        (Region, "region", "name"),
+    ):
+        fields = ENTITY_FIELDS[entity_type]
+        qs = (
+            model.objects.filter(
+                panel_id__in=panel_ids, flagged=False, saved_gel_status__in=statuses
+            )
+            .annotate(
+                entity_name=F(entity_name),
+                evidences=ArrayAgg("evidence__name", distinct=True),
+                **{
+                    "number_of_{}_evaluations".format(rating.lower()): Count(
+                        Case(When(evaluation__rating=rating, then=F("evaluation"))),
+                        distinct=True,
+                    )
+                    for rating in ("GREEN", "AMBER", "RED")
+                }
+            )
+            .order_by("-saved_gel_status", "entity_name")
+            .values(
+                "entity_name",
+                "gene",
+                "evidences",
+                "moi",
+                "phenotypes",
+                "publications",
+                "flagged",
+                "saved_gel_status",
+                "ready",
+                "number_of_green_evaluations",
+                "number_of_amber_evaluations",
+                "number_of_red_evaluations",
+                *fields
+            )
+        )
+
+        for entity in qs.iterator():
+            item = {
+                "entity_type": entity_type,
+                "entity_name": entity["entity_name"],
+                "gene_data": entity["gene"],
+                "evidence": entity["evidences"],
+                "mode_of_inheritance": entity["moi"],
+                "phenotypes": entity["phenotypes"],
+                "publications": entity["publications"],
+                "flagged": entity["flagged"],
+                "confidence_level": entity["saved_gel_status"],
+                "ready": entity["ready"],
+                "ratings": get_ratings(
+                    entity["number_of_green_evaluations"],
+                    entity["number_of_amber_evaluations"],
+                    entity["number_of_red_evaluations"],
+                ),
+            }
+            for field in fields:
+                if field.startswith("position_"):
+                    value = entity[field]
+                    item[field.replace("position_", "grch") + "_coordinates"] = (
+                        [value.lower, value.upper] if value else None
+                    )
+                else:
+                    item[field] = entity[field]
+            yield item
+
+
+def tsv_response(panel, version, entities):
+    """Stream panel entities as a TSV file
+
+    :param panel: dict with panel info, see `get_row`
+    :param version: panel version
+    :param entities: iterable with entities data
+    :return: StreamingHttpResponse
+    """
+
+    panel = dict(panel, name=remove_non_ascii(panel["name"], replacemenet="_"))
+
+    def rows():
+        yield HEADER
+        for entity in entities:
+            yield get_row(entity, panel, version)
+
+    writer = csv.writer(EchoWriter(), delimiter="\t")
+    response = StreamingHttpResponse(
+        (writer.writerow(row) for row in rows()),
+        content_type="text/tab-separated-values",
+    )
+    response["Content-Disposition"] = 'attachment; filename="' + panel["name"] + '.tsv"'
+    return response
+
+
+def get_all_genes_rows(chunk_size=2000):
+    """Rows of the export with the genes of all active panels, header included
+
+    Panel details are read upfront, then the genes of all panels are read in
+    one query with a server side cursor. Super panels don't have their own
+    genes, so child panel genes are written once for the child panel (if it's
+    active) and once for each super panel which includes it.
+
+    :param chunk_size: number of genes fetched from the cursor at once
+    :return: generator with rows
+    """
+
+    from panels.models import GenePanel
+    from panels.models import GenePanelSnapshot
+    from panels.models import GenePanelEntrySnapshot
+    from panels.templatetags.panel_helpers import GeneDataType
+    from panels.templatetags.panel_helpers import get_gene_list_data
+
+    yield ALL_GENES_HEADER
+
+    panel_fields = (
+        "pk",
+        "panel_id",
+        "panel__status",
+        "level4title__name",
+        "major_version",
+        "minor_version",
+    )
+
+    panels = {
+        panel["pk"]: panel
+        for panel in GenePanelSnapshot.objects.get_active(all=True, internal=True)
+        .prefetch_related(None)
+        .values(*panel_fields)
+    }
+    order = {panel_id: index for index, panel_id in enumerate(panels)}
+
+    super_panels = defaultdict(list)
+    for super_panel_id, child_panel_id in (
+        GenePanelSnapshot.child_panels.through.objects.filter(
+            from_genepanelsnapshot_id__in=list(panels)
+        )
+        .order_by("pk")
+        .values_list("from_genepanelsnapshot_id", "to_genepanelsnapshot_id")
+    ):
+        super_panels[child_panel_id].append(super_panel_id)
+    for panel_ids in super_panels.values():
+        panel_ids.sort(key=order.get)
+
+    super_panel_ids = set(
+        super_panel_id
+        for panel_ids in super_panels.values()
+        for super_panel_id in panel_ids
+    )
+    own_panels = set(panels) - super_panel_ids
+
+    child_panels = set(super_panels) - set(panels)
+    if child_panels:
+        for panel in GenePanelSnapshot.objects.filter(pk__in=child_panels).values(
+            *panel_fields
+        ):
+            panels[panel["pk"]] = panel
+
+    types = defaultdict(list)
+    for panel_id, name in (
+        GenePanel.types.through.objects.filter(
+            genepanel_id__in=set(panel["panel_id"] for panel in panels.values())
+        )
+        .order_by("pk")
+        .values_list("genepanel_id", "paneltype__name")
+    ):
+        types[panel_id].append(name)
+
+    qs = (
+        GenePanelEntrySnapshot.objects.filter(
+            panel_id__in=own_panels.union(super_panels)
+        )
+        .annotate(
+            entity_evidences=ArrayAgg("evidence__name", distinct=True),
+            entity_tags=ArrayAgg("tags__name", distinct=True),
+        )
+        .order_by(
+            "panel__level4title__name",
+            "panel_id",
+            "-saved_gel_status",
+            "gene_core__gene_symbol",
+        )
+        .values(
+            "panel_id",
+            "gene",
+            "saved_gel_status",
+            "flagged",
+            "moi",
+            "mode_of_pathogenicity",
+            "phenotypes",
+            "entity_evidences",
+            "entity_tags",
+        )
+    )
+
+    for entry in qs.iterator(chunk_size=chunk_size):
+        panel = panels[entry["panel_id"]]
+        gene_data = entry["gene"] or {}
+        phenotypes = entry["phenotypes"]
+
+        row = [
+            gene_data.get("gene_symbol"),
+            panel["panel_id"],
+            panel["level4title__name"],
+            "{}.{}".format(panel["major_version"], panel["minor_version"]),
+            str(panel["panel__status"]).upper(),
+            get_gene_list_data(
+                None,
+                GeneDataType.COLOR.value,
+                entry["saved_gel_status"],
+                flagged=entry["flagged"],
+            ),
+            ";".join([ev for ev in entry["entity_evidences"] if ev]),
+            entry["moi"],
+            entry["mode_of_pathogenicity"],
+            ";".join([tag for tag in entry["entity_tags"] if tag]),
+            get_ensembl_data(gene_data, "GRch37", "82"),
+            get_ensembl_data(gene_data, "GRch38", "90"),
+            gene_data.get("hgnc_id", "-"),
+            gene_data.get("biotype", "-"),
+            ";".join(phenotypes) if isinstance(phenotypes, list) else "-",
+            get_ensembl_data(gene_data, "GRch37", "82", "location"),
+            get_ensembl_data(gene_data, "GRch38", "90", "location"),
+            ";".join(types[panel["panel_id"]]),
+        ]
+
+        if entry["panel_id"] in own_panels:
+            yield row + ["-", "-", "-"]
+
+        for super_panel_id in super_panels.get(entry["panel_id"], []):
+            super_panel = panels[super_panel_id]
+            yield row + [
+                super_panel["panel_id"],
+                super_panel["level4title__name"],
+                "{}.{}".format(
+                    super_panel["major_version"], super_panel["minor_version"]
+                ),
+            ]
+
+
+class AllGenesExport:
+    """Prebuilt export with the genes of all active panels
+
+    The export is saved to `ALL_GENES_EXPORT_FILE` and served from there, it's
+    rebuilt in the background after the panels change. If the setting is empty
+    the export is streamed from the database on each request.
+    """
+
+    @property
+    def path(self):
+        return settings.ALL_GENES_EXPORT_FILE
+
+    def exists(self):
+        return bool(self.path) and os.path.exists(self.path)
+
+    def get_created(self):
+        """Time when the export build started"""
+
+        return os.path.getmtime(self.path)
+
+    def build(self, requested=None):
+        """Write the export to a temporary file and move it into place
+
+        :param requested: timestamp of the change which invalidated the export,
+            nothing is done if the current export was started after it
+        :return: True if the export has been built
+        """
+
+        if requested is not None and self.exists():
+            if self.get_created() >= requested:
+                return False
+
+        started = time.time()
+        directory = os.path.dirname(self.path)
+        os.makedirs(directory, exist_ok=True)
+
+        fd, tmp_path = tempfile.mkstemp(suffix=".tsv", dir=directory)
+        try:
+            with open(fd, "w", encoding="utf-8", newline="") as f:
+                csv.writer(f, delimiter="\t").writerows(get_all_genes_rows())
+            os.utime(tmp_path, (started, started))
+            os.replace(tmp_path, self.path)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+        return True
+
+    def invalidate(self):
+        """Rebuild the export in the background after the commit"""
+
+        if self.path:
+            from panels.tasks import build_all_genes_export
+
+            requested = time.time()
+            transaction.on_commit(lambda: build_all_genes_export.delay(requested))
+
+
+all_genes_export = AllGenesExport()
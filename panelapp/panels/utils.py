@@ -26,3 +26,8 @@ import re
 
 def remove_non_ascii(text, replacemenet=" "):
     return re.sub(r"[^\x00-\x7F]+", " ", text)
+
+
+class EchoWriter(object):
+    def write(self, value):
+        return value
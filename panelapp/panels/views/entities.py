@@ -21,9 +21,9 @@
 ## specific language governing permissions and limitations
 ## under the License.
 ##
+from collections import defaultdict
 from django.http import Http404
 from django.contrib import messages
-from django.core.cache import cache
 from django.views.generic import DetailView
 from django.views.generic import RedirectView
 from django.views.generic import CreateView
@@ -63,6 +63,8 @@ from panels.forms.ajax import UpdateRegionPublicationsForm
 from panels.forms.ajax import UpdateRegionRatingForm
 from panels.mixins import PanelMixin
 from panels.mixins import ActAndRedirectMixin
+from panels.cache import entities_cache
+from panels.utils import EchoWriter  # noqa
 from panels.models import STR
 from panels.models import Tag
 from panels.models import Gene
@@ -70,11 +72,7 @@ from panels.models import Region
 from panels.models import GenePanel
 from panels.models import GenePanelSnapshot
 from panels.models import GenePanelEntrySnapshot
-
-
-class EchoWriter(object):
-    def write(self, value):
-        return value
+from panels.models import EntitySearchEntry
 
 
 class EntityMixin:
@@ -619,55 +617,41 @@ class EntityDetailView(DetailView):
         is_admin_user = (
             self.request.user.is_authenticated and self.request.user.reviewer.is_GEL()
         )
-        gps = list(
-            GenePanelSnapshot.objects.get_shared_panels(
-                self.kwargs["slug"], all=is_admin_user, internal=is_admin_user
-            ).values_list("pk", flat=True)
-        )
-
-        entries_genes = GenePanelEntrySnapshot.objects.get_gene_panels(
-            self.kwargs["slug"], pks=gps
-        )
-
-        if isinstance(self.object, STR):
-            # we couldn't find a gene linked to this STR, lookup by name
-            entries_strs = STR.objects.get_str_panels(name=self.kwargs["slug"], pks=gps)
-        else:
-            entries_strs = STR.objects.get_gene_panels(
-                gene_symbol=self.kwargs["slug"], pks=gps
-            )
 
-        if isinstance(self.object, Region):
-            # we couldn't find a gene linked to this STR, lookup by name
-            entries_regions = Region.objects.get_region_panels(
-                name=self.kwargs["slug"], pks=gps
+        # panels with the entity are read from the index, only the entities
+        # found there are loaded
+        index = EntitySearchEntry.objects.get_active(
+            all=is_admin_user, internal=is_admin_user
+        ).order_by()
+        if isinstance(self.object, (STR, Region)):
+            # we couldn't find a gene linked to this STR or region, lookup by name
+            entity_type = self.object._entity_type
+            index = index.filter(
+                Q(entity_type=entity_type, entity_name=self.kwargs["slug"])
+                | (Q(gene_symbol=self.kwargs["slug"]) & ~Q(entity_type=entity_type))
             )
         else:
-            entries_regions = Region.objects.get_gene_panels(
-                gene_symbol=self.kwargs["slug"], pks=gps
-            )
+            index = index.filter(gene_symbol=self.kwargs["slug"])
+
+        if tag_filter:
+            index = index.filter(tags__contains=[tag_filter])
 
-        if (
-            not self.request.user.is_authenticated
-            or not self.request.user.reviewer.is_GEL()
+        entity_ids = defaultdict(list)
+        gps = set()
+        for entity_type, entity_id, snapshot_id in index.values_list(
+            "entity_type", "entity_id", "snapshot_id"
         ):
-            entries_genes = entries_genes.filter(
-                Q(panel__panel__status=GenePanel.STATUS.public)
-                | Q(panel__panel__status=GenePanel.STATUS.promoted)
-            )
-            entries_strs = entries_strs.filter(
-                Q(panel__panel__status=GenePanel.STATUS.public)
-                | Q(panel__panel__status=GenePanel.STATUS.promoted)
-            )
-            entries_regions = entries_regions.filter(
-                Q(panel__panel__status=GenePanel.STATUS.public)
-                | Q(panel__panel__status=GenePanel.STATUS.promoted)
-            )
+            entity_ids[entity_type].append(entity_id)
+            gps.add(snapshot_id)
 
-        if tag_filter:
-            entries_genes = entries_genes.filter(tag__name=tag_filter)
-            entries_strs = entries_strs.filter(tag__name=tag_filter)
-            entries_regions = entries_regions.filter(tag__name=tag_filter)
+        entries_genes, entries_strs, entries_regions = [
+            model.objects.get_active(pks=list(gps)).filter(
+                pk__in=entity_ids[model.objects.entity_type]
+            )
+            if entity_ids[model.objects.entity_type]
+            else model.objects.none()
+            for model in (GenePanelEntrySnapshot, STR, Region)
+        ]
 
         ctx["entries_genes"] = entries_genes
         ctx["entries_strs"] = entries_strs
@@ -691,51 +675,7 @@ class EntitiesListView(ListView):
         )
         tag_filter = self.request.GET.get("tag", "")
 
-        cache_key = "entities_admin" if is_admin_user else "entities"
-
-        if tag_filter:
-            cache_key = "{}_{}".format(cache_key, tag_filter)
-
-        cached_entities = cache.get(cache_key)
-        if cached_entities:
-            return cached_entities
-        else:
-            panel_ids = GenePanelSnapshot.objects.get_active(
-                all=is_admin_user, internal=is_admin_user
-            ).values_list("pk", flat=True)
-
-            qs = GenePanelEntrySnapshot.objects.filter(
-                gene_core__active=True, panel__in=panel_ids
-            )
-
-            strs_qs = STR.objects.filter(panel__in=panel_ids)
-            regions_qs = Region.objects.filter(panel__in=panel_ids)
-
-            if tag_filter:
-                qs = qs.filter(tags__name=tag_filter)
-                strs_qs = strs_qs.filter(tags__name=tag_filter)
-                regions_qs = regions_qs.filter(tags__name=tag_filter)
-
-            entities = []
-            for gene in (
-                qs.order_by()
-                .distinct("gene_core__gene_symbol")
-                .values_list("gene_core__gene_symbol", flat=True)
-                .iterator()
-            ):
-                entities.append(("gene", gene, gene))
-
-            for str_item in strs_qs.values_list("name", "name").iterator():
-                entities.append(("str", str_item[0], str_item[1]))
-
-            for region in regions_qs.values_list("name", "name").iterator():
-                entities.append(("region", region[0], region[1]))
-
-            entities = list(set(entities))
-
-            sorted_entities = sorted(entities, key=lambda i: i[1].lower())
-            cache.set(cache_key, sorted_entities)
-        return sorted_entities
+        return entities_cache.get(admin=is_admin_user, tag=tag_filter)
 
     def get_context_data(self, *args, **kwargs):
         ctx = super().get_context_data(*args, **kwargs)
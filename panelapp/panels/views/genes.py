@@ -31,7 +31,7 @@ from django.views.generic import DetailView
 from django.shortcuts import redirect
 from django.urls import reverse_lazy
 from django.template.defaultfilters import pluralize
-from django.http import HttpResponse
+from django.http import FileResponse
 from django.http import StreamingHttpResponse
 
 from panelapp.mixins import GELReviewerRequiredMixin
@@ -43,7 +43,10 @@ from panels.models import GenePanelSnapshot
 from panels.models import ProcessingRunCode
 from panels.models import HistoricalSnapshot
 from panels.mixins import PanelMixin
-from panels.utils import remove_non_ascii
+from panels.tsv import all_genes_export
+from panels.tsv import get_all_genes_rows
+from panels.tsv import get_panel_entities
+from panels.tsv import tsv_response
 from .entities import EchoWriter
 
 
@@ -56,258 +59,17 @@ class DownloadPanelTSVMixin(PanelMixin, DetailView):
     def process(self):
         self.object = self.get_object()
 
-        panel_name = self.object.panel.name
-        version = self.object.version
-
-        response = HttpResponse(content_type="text/tab-separated-values")
-        panel_name = remove_non_ascii(panel_name, replacemenet="_")
-        response["Content-Disposition"] = (
-            'attachment; filename="' + panel_name + '.tsv"'
-        )
-        writer = csv.writer(response, delimiter="\t")
-
-        writer.writerow(
-            (
-                "Entity Name",
-                "Entity type",
-                "Gene Symbol",
-                "Sources(; separated)",
-                "Level4",
-                "Level3",
-                "Level2",
-                "Model_Of_Inheritance",
-                "Phenotypes",
-                "Omim",
-                "Orphanet",
-                "HPO",
-                "Publications",
-                "Description",
-                "Flagged",
-                "GEL_Status",
-                "UserRatings_Green_amber_red",
-                "version",
-                "ready",
-                "Mode of pathogenicity",
-                "EnsemblId(GRch37)",
-                "EnsemblId(GRch38)",
-                "HGNC",
-                "Position Chromosome",
-                "Position GRCh37 Start",
-                "Position GRCh37 End",
-                "Position GRCh38 Start",
-                "Position GRCh38 End",
-                "STR Repeated Sequence",
-                "STR Normal Repeats",
-                "STR Pathogenic Repeats",
-                "Region Haploinsufficiency Score",
-                "Region Triplosensitivity Score",
-                "Region Required Overlap Percentage",
-                "Region Variant Type",
-                "Region Verbose Name",
-            )
-        )
-
-        categories = self.get_categories()
-        for gpentry in self.object.get_all_genes_extra:
-            if (
-                not gpentry.flagged
-                and gpentry.saved_gel_status > 0
-                and str(gpentry.status) in categories
-            ):
-                amber_perc, green_perc, red_prec = gpentry.aggregate_ratings()
-
-                ensembl_id_37 = "-"
-                try:
-                    ensembl_id_37 = (
-                        gpentry.gene.get("ensembl_genes", {})
-                        .get("GRch37", {})
-                        .get("82", {})
-                        .get("ensembl_id", "-")
-                    )
-                except AttributeError:
-                    pass
-
-                ensembl_id_38 = "-"
-                try:
-                    ensembl_id_38 = (
-                        gpentry.gene.get("ensembl_genes", {})
-                        .get("GRch38", {})
-                        .get("90", {})
-                        .get("ensembl_id", "-")
-                    )
-                except AttributeError:
-                    pass
-
-                evidence = ";".join([ev for ev in gpentry.entity_evidences if ev])
-                export_gpentry = (
-                    gpentry.gene.get("gene_symbol"),
-                    "gene",
-                    gpentry.gene.get("gene_symbol"),
-                    evidence,
-                    panel_name,
-                    self.object.level4title.level3title,
-                    self.object.level4title.level2title,
-                    gpentry.moi,
-                    ";".join(map(remove_non_ascii, gpentry.phenotypes)),
-                    ";".join(map(remove_non_ascii, self.object.level4title.omim)),
-                    ";".join(map(remove_non_ascii, self.object.level4title.orphanet)),
-                    ";".join(map(remove_non_ascii, self.object.level4title.hpo)),
-                    ";".join(map(remove_non_ascii, gpentry.publications))
-                    if gpentry.publications
-                    else "",
-                    "",
-                    str(gpentry.flagged),
-                    str(gpentry.saved_gel_status),
-                    ";".join(map(str, [green_perc, amber_perc, red_prec])),
-                    str(version),
-                    gpentry.ready,
-                    gpentry.mode_of_pathogenicity,
-                    ensembl_id_37,
-                    ensembl_id_38,
-                    gpentry.gene.get("hgnc_id", "-"),
-                    "",
-                    "",
-                    "",
-                    "",
-                    "",
-                    "",
-                    "",
-                    "",
-                    "",
-                    "",
-                    "",
-                    "",
-                    "",
-                )
-                writer.writerow(export_gpentry)
-
-        for strentry in self.object.get_all_strs_extra:
-            if (
-                not strentry.flagged
-                and strentry.saved_gel_status > 0
-                and str(strentry.status) in categories
-            ):
-                amber_perc, green_perc, red_prec = strentry.aggregate_ratings()
-
-                evidence = ";".join(
-                    [evidence.name for evidence in strentry.evidence.all()]
-                )
-                export_strentry = (
-                    strentry.name,
-                    "str",
-                    strentry.gene.get("gene_symbol") if strentry.gene else "",
-                    evidence,
-                    panel_name,
-                    self.object.level4title.level3title,
-                    self.object.level4title.level2title,
-                    strentry.moi,
-                    ";".join(map(remove_non_ascii, strentry.phenotypes)),
-                    ";".join(map(remove_non_ascii, self.object.level4title.omim)),
-                    ";".join(map(remove_non_ascii, self.object.level4title.orphanet)),
-                    ";".join(map(remove_non_ascii, self.object.level4title.hpo)),
-                    ";".join(map(remove_non_ascii, strentry.publications))
-                    if strentry.publications
-                    else "",
-                    "",
-                    str(strentry.flagged),
-                    str(strentry.saved_gel_status),
-                    ";".join(map(str, [green_perc, amber_perc, red_prec])),
-                    str(version),
-                    strentry.ready,
-                    "",
-                    strentry.gene.get("ensembl_genes", {})
-                    .get("GRch37", {})
-                    .get("82", {})
-                    .get("ensembl_id", "-")
-                    if strentry.gene
-                    else "",
-                    strentry.gene.get("ensembl_genes", {})
-                    .get("GRch38", {})
-                    .get("90", {})
-                    .get("ensembl_id", "-")
-                    if strentry.gene
-                    else "",
-                    strentry.gene.get("hgnc_id", "-") if strentry.gene else "",
-                    strentry.chromosome,
-                    strentry.position_37.lower if strentry.position_37 else "",
-                    strentry.position_37.upper if strentry.position_37 else "",
-                    strentry.position_38.lower,
-                    strentry.position_38.upper,
-                    strentry.repeated_sequence,
-                    strentry.normal_repeats,
-                    strentry.pathogenic_repeats,
-                    "",
-                    "",
-                    "",
-                    "",
-                    "",
-                )
-                writer.writerow(export_strentry)
-
-        for region in self.object.get_all_regions_extra:
-            if (
-                not region.flagged
-                and region.saved_gel_status > 0
-                and str(region.status) in categories
-            ):
-                amber_perc, green_perc, red_prec = region.aggregate_ratings()
-
-                evidence = ";".join(
-                    [evidence.name for evidence in region.evidence.all()]
-                )
-                export_region = (
-                    region.name,
-                    "region",
-                    region.gene.get("gene_symbol") if region.gene else "",
-                    evidence,
-                    panel_name,
-                    self.object.level4title.level3title,
-                    self.object.level4title.level2title,
-                    region.moi,
-                    ";".join(map(remove_non_ascii, region.phenotypes)),
-                    ";".join(map(remove_non_ascii, self.object.level4title.omim)),
-                    ";".join(map(remove_non_ascii, self.object.level4title.orphanet)),
-                    ";".join(map(remove_non_ascii, self.object.level4title.hpo)),
-                    ";".join(map(remove_non_ascii, region.publications))
-                    if region.publications
-                    else "",
-                    "",
-                    str(region.flagged),
-                    str(region.saved_gel_status),
-                    ";".join(map(str, [green_perc, amber_perc, red_prec])),
-                    str(version),
-                    region.ready,
-                    "",
-                    region.gene.get("ensembl_genes", {})
-                    .get("GRch37", {})
-                    .get("82", {})
-                    .get("ensembl_id", "-")
-                    if region.gene
-                    else "",
-                    region.gene.get("ensembl_genes", {})
-                    .get("GRch38", {})
-                    .get("90", {})
-                    .get("ensembl_id", "-")
-                    if region.gene
-                    else "",
-                    region.gene.get("hgnc_id", "-") if region.gene else "",
-                    region.chromosome,
-                    region.position_37.lower if region.position_37 else "",
-                    region.position_37.upper if region.position_37 else "",
-                    region.position_38.lower,
-                    region.position_38.upper,
-                    "",
-                    "",
-                    "",
-                    region.haploinsufficiency_score,
-                    region.triplosensitivity_score,
-                    region.required_overlap_percentage,
-                    region.type_of_variants,
-                    region.verbose_name,
-                )
-                writer.writerow(export_region)
-
-        return response
+        level4title = self.object.level4title
+        panel = {
+            "name": self.object.panel.name,
+            "disease_sub_group": level4title.level3title,
+            "disease_group": level4title.level2title,
+            "omim": level4title.omim,
+            "orphanet": level4title.orphanet,
+            "hpo": level4title.hpo,
+        }
+        entities = get_panel_entities(self.object, self.get_categories())
+        return tsv_response(panel, self.object.version, entities)
 
 
 class DownloadPanelTSVView(DownloadPanelTSVMixin):
@@ -545,118 +307,24 @@ class CopyReviewsView(GELReviewerRequiredMixin, FormView):
 
 
 class DownloadAllGenes(GELReviewerRequiredMixin, View):
-    def gene_iterator(self):
-        yield (
-            "Symbol",
-            "Panel Id",
-            "Panel Name",
-            "Panel Version",
-            "Panel Status",
-            "List",
-            "Sources",
-            "Mode of inheritance",
-            "Mode of pathogenicity",
-            "Tags",
-            "EnsemblId(GRch37)",
-            "EnsemblId(GRch38)",
-            "HGNC",
-            "Biotype",
-            "Phenotypes",
-            "GeneLocation((GRch37)",
-            "GeneLocation((GRch38)",
-            "Panel Types",
-            "Super Panel Id",
-            "Super Panel Name",
-            "Super Panel Version",
-        )
-
-        for gps in GenePanelSnapshot.objects.get_active(
-            all=True, internal=True
-        ).iterator():
-            is_super_panel = gps.is_super_panel
-            super_panel_id = gps.panel_id
-            super_panel_name = gps.level4title.name
-            super_panel_version = gps.version
-
-            for entry in gps.get_all_genes_extra:
-                color = entry.entity_color_name
-
-                if isinstance(entry.phenotypes, list):
-                    phenotypes = ";".join(entry.phenotypes)
-                else:
-                    phenotypes = "-"
-
-                ensembl_id_37 = "-"
-                location_37 = "-"
-                try:
-                    ensembl_id_37 = (
-                        entry.gene.get("ensembl_genes", {})
-                        .get("GRch37", {})
-                        .get("82", {})
-                        .get("ensembl_id", "-")
-                    )
-                    location_37 = (
-                        entry.gene.get("ensembl_genes", {})
-                        .get("GRch37", {})
-                        .get("82", {})
-                        .get("location", "-")
-                    )
-                except AttributeError:
-                    pass
-
-                ensembl_id_38 = "-"
-                location_38 = "-"
-                try:
-                    ensembl_id_38 = (
-                        entry.gene.get("ensembl_genes", {})
-                        .get("GRch38", {})
-                        .get("90", {})
-                        .get("ensembl_id", "-")
-                    )
-                    location_38 = (
-                        entry.gene.get("ensembl_genes", {})
-                        .get("GRch38", {})
-                        .get("90", {})
-                        .get("location", "-")
-                    )
-                except AttributeError:
-                    pass
-
-                row = [
-                    entry.gene.get("gene_symbol"),
-                    entry.panel.panel.pk,
-                    entry.panel.level4title.name,
-                    entry.panel.version,
-                    str(entry.panel.panel.status).upper(),
-                    color,
-                    ";".join([ev for ev in entry.entity_evidences if ev]),
-                    entry.moi,
-                    entry.mode_of_pathogenicity,
-                    ";".join([tag for tag in entry.entity_tags if tag]),
-                    ensembl_id_37,
-                    ensembl_id_38,
-                    entry.gene.get("hgnc_id", "-"),
-                    entry.gene.get("biotype", "-"),
-                    phenotypes,
-                    location_37,
-                    location_38,
-                    ";".join([t.name for t in entry.panel.panel.types.all()]),
-                    super_panel_id if is_super_panel else "-",
-                    super_panel_name if is_super_panel else "-",
-                    super_panel_version if is_super_panel else "-",
-                ]
-                yield row
-
     def get(self, request, *args, **kwargs):
-        pseudo_buffer = EchoWriter()
-        writer = csv.writer(pseudo_buffer, delimiter="\t")
+        if all_genes_export.exists():
+            created = datetime.fromtimestamp(all_genes_export.get_created())
+            response = FileResponse(
+                open(all_genes_export.path, "rb"),
+                content_type="text/tab-separated-values",
+            )
+        else:
+            created = datetime.now()
+            pseudo_buffer = EchoWriter()
+            writer = csv.writer(pseudo_buffer, delimiter="\t")
+            response = StreamingHttpResponse(
+                (writer.writerow(row) for row in get_all_genes_rows()),
+                content_type="text/tab-separated-values",
+            )
 
-        response = StreamingHttpResponse(
-            (writer.writerow(row) for row in self.gene_iterator()),
-            content_type="text/tab-separated-values",
-        )
         attachment = "attachment; filename=All_genes_{}.tsv".format(
-            datetime.now().strftime("%Y%m%d-%H%M")
+            created.strftime("%Y%m%d-%H%M")
         )
         response["Content-Disposition"] = attachment
         return response
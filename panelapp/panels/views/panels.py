@@ -22,10 +22,10 @@
 ## under the License.
 ##
 import csv
+from collections import defaultdict
 from datetime import datetime
 from django.db.models import Q
 from django.contrib import messages
-from django.http import HttpResponse
 from django.core.exceptions import ValidationError
 from django.views.generic import ListView
 from django.views.generic import CreateView
@@ -56,6 +56,9 @@ from panels.models import ProcessingRunCode
 from panels.models import Activity
 from panels.models import GenePanel
 from panels.models import GenePanelSnapshot
+from panels.models import GenePanelEntrySnapshot
+from panels.models import STR
+from panels.models import Region
 from .entities import EchoWriter
 
 
@@ -257,43 +260,96 @@ class ActivityListView(ListView):
             and request.user.is_authenticated
             and request.user.reviewer.is_GEL
         ):
-            response = HttpResponse(content_type="text/csv")
+            pseudo_buffer = EchoWriter()
+            writer = csv.writer(pseudo_buffer)
+            response = StreamingHttpResponse(
+                (writer.writerow(row) for row in self.csv_rows()),
+                content_type="text/csv",
+            )
             response[
                 "Content-Disposition"
             ] = 'attachment; filename="export-panelapp-activities-{}.csv"'.format(
                 timezone.now()
             )
-            writer = csv.writer(response)
-            writer.writerow(
-                [
-                    "Created",
-                    "Panel",
-                    "Panel ID",
-                    "Panel Version",
-                    "Entity Type",
-                    "Entity Name",
-                    "User",
-                    "Activity",
-                ]
-            )
-            self.object_list = self.get_queryset()
-            context = self.get_context_data()
-            for activity in context["activities"]:
-                writer.writerow(
-                    [
-                        activity.created,
-                        activity.extra_data.get("panel_name"),
-                        activity.extra_data.get("panel_id"),
-                        activity.extra_data.get("panel_version"),
-                        activity.extra_data.get("entity_type"),
-                        activity.extra_data.get("entity_name"),
-                        activity.extra_data.get("user_name"),
-                        activity.text,
-                    ]
-                )
             return response
         return super().get(request, *args, **kwargs)
 
+    def csv_rows(self):
+        """All filtered activities, read with a server side cursor"""
+
+        yield (
+            "Created",
+            "Panel",
+            "Panel ID",
+            "Panel Version",
+            "Entity Type",
+            "Entity Name",
+            "User",
+            "Activity",
+        )
+
+        for created, extra_data, text in (
+            self.get_queryset()
+            .prefetch_related(None)
+            .values_list("created", "extra_data", "text")
+            .iterator()
+        ):
+            yield (
+                created,
+                extra_data.get("panel_name"),
+                extra_data.get("panel_id"),
+                extra_data.get("panel_version"),
+                extra_data.get("entity_type"),
+                extra_data.get("entity_name"),
+                extra_data.get("user_name"),
+                text,
+            )
+
+    def paginate_queryset(self, queryset, page_size):
+        """Keyset pagination on (created, id)
+
+        `before` and `after` are ids of the last activity on the newer page
+        and the first activity on the older page, so the page is found with
+        the (created, id) index instead of an OFFSET scan.
+        """
+
+        before = self.get_activity_created("before")
+        after = self.get_activity_created("after")
+
+        if after:
+            activities = list(
+                queryset.filter(
+                    Q(created__gt=after[0]) | Q(created=after[0], pk__gt=after[1])
+                ).order_by("created", "pk")[: page_size + 1]
+            )
+            has_newer = len(activities) > page_size
+            activities = activities[:page_size][::-1]
+            has_older = True
+        else:
+            if before:
+                queryset = queryset.filter(
+                    Q(created__lt=before[0]) | Q(created=before[0], pk__lt=before[1])
+                )
+            activities = list(queryset.order_by("-created", "-pk")[: page_size + 1])
+            has_older = len(activities) > page_size
+            activities = activities[:page_size]
+            has_newer = before is not None
+
+        self.newer_activity = activities[0].pk if activities and has_newer else None
+        self.older_activity = activities[-1].pk if activities and has_older else None
+        return None, None, activities, has_newer or has_older
+
+    def get_activity_created(self, param):
+        """(created, id) of the activity in the request parameter"""
+
+        pk = self.request.GET.get(param, "")
+        if pk.isdigit():
+            created = (
+                Activity.objects.filter(pk=pk).values_list("created", flat=True).first()
+            )
+            if created:
+                return created, int(pk)
+
     def _filter_queryset_kwargs(self):
         filters = {}
         if self.request.user.is_authenticated and self.request.user.reviewer.is_GEL:
@@ -345,6 +401,8 @@ class ActivityListView(ListView):
         ctx["filter_form"] = ActivityFilterForm(
             self.request.GET if self.request.GET else None, **form_kwargs
         )
+        ctx["newer_activity"] = self.newer_activity
+        ctx["older_activity"] = self.older_activity
         return ctx
 
     def get_queryset(self):
@@ -356,9 +414,9 @@ class ActivityListView(ListView):
         filter_kwargs = {}
 
         if self.request.GET.get("panel", "").isdigit():
-            filter_kwargs["extra_data__panel_id"] = int(self.request.GET.get("panel"))
+            filter_kwargs["panel_id"] = int(self.request.GET.get("panel"))
         if self.request.GET.get("version"):
-            filter_kwargs["extra_data__panel_version"] = self.request.GET.get("version")
+            filter_kwargs["panel_version"] = self.request.GET.get("version")
         if self.request.GET.get("date_from"):
             filter_kwargs["created__gte"] = self.request.GET.get("date_from")
         if self.request.GET.get("date_to"):
@@ -368,11 +426,7 @@ class ActivityListView(ListView):
 
         if self.request.GET.get("entity"):
             entity = self.request.GET.get("entity")
-            qs = qs.filter(
-                Q(extra_data__entity_name=entity)
-                | Q(entity_name=entity)
-                | Q(text__icontains=entity)
-            )
+            qs = qs.filter(Q(entity_name=entity) | Q(text__icontains=entity))
 
         return qs.prefetch_related("user", "panel", "user__reviewer")
 
@@ -395,31 +449,21 @@ class DownloadAllPanels(GELReviewerRequiredMixin, View):
             "Types",
         )
 
-        panels = (
-            GenePanelSnapshot.objects.get_active_annotated(all=True, internal=True)
-            .prefetch_related(
-                "panel",
-                "level4title",
-                "panel__types",
-                "genepanelentrysnapshot_set",
-                "genepanelentrysnapshot_set__evaluation",
-                "genepanelentrysnapshot_set__evaluation__user",
-                "genepanelentrysnapshot_set__evaluation__user__reviewer",
-                "str_set__evaluation",
-                "str_set__evaluation__user",
-                "str_set__evaluation__user__reviewer",
-            )
-            .all()
-            .iterator()
-        )
+        panels = GenePanelSnapshot.objects.get_active(all=True, internal=True)
+        contributors = self.get_contributors(panels)
+        types = self.get_panel_types(panels)
 
-        for panel in panels:
+        for panel in (
+            panels.select_related("panel", "level4title")
+            .prefetch_related(None)
+            .iterator()
+        ):
             rate = "{} of {} genes reviewed".format(
                 panel.stats.get("number_of_evaluated_genes"),
                 panel.stats.get("number_of_genes"),
             )
-            reviewers = panel.contributors
-            contributors = [
+            reviewers = contributors.get(panel.pk, [])
+            reviewers_names = [
                 "{} {} ({})".format(user.first_name, user.last_name, user.email)
                 if user.first_name
                 else user.username
@@ -437,12 +481,62 @@ class DownloadAllPanels(GELReviewerRequiredMixin, View):
                 panel.created,
                 rate,
                 len(reviewers),
-                ";".join(contributors),  # aff
+                ";".join(reviewers_names),  # aff
                 ";".join([user.email for user in reviewers if user.email]),  # email
                 panel.panel.status.upper(),
                 ";".join(panel.old_panels),
-                ";".join(panel.panel.types.values_list("name", flat=True)),
+                ";".join(types.get(panel.panel_id, [])),
+            )
+
+    @staticmethod
+    def get_contributors(panels):
+        """Users who reviewed the entities of the panels, see `contributors`
+
+        Evaluators of genes, STRs and regions are read in one query, and
+        the users are loaded once.
+
+        :param panels: GenePanelSnapshot queryset
+        :return: dict with GenePanelSnapshot id and the list of users
+        """
+
+        panel_ids = panels.order_by().values("pk")
+        evaluators = [
+            model.objects.filter(panel__in=panel_ids, evaluation__user__isnull=False)
+            .order_by()
+            .values_list("panel_id", "evaluation__user_id")
+            for model in (GenePanelEntrySnapshot, STR, Region)
+        ]
+        index = defaultdict(list)
+        for panel_id, user_id in evaluators[0].union(*evaluators[1:]):
+            index[panel_id].append(user_id)
+
+        users = User.objects.only(
+            "username", "first_name", "last_name", "email"
+        ).in_bulk(set(user_id for user_ids in index.values() for user_id in user_ids))
+
+        return {
+            panel_id: [users[user_id] for user_id in sorted(user_ids)]
+            for panel_id, user_ids in index.items()
+        }
+
+    @staticmethod
+    def get_panel_types(panels):
+        """Names of the panel types
+
+        :param panels: GenePanelSnapshot queryset
+        :return: dict with GenePanel id and the list of type names
+        """
+
+        types = defaultdict(list)
+        for panel_id, name in (
+            GenePanel.types.through.objects.filter(
+                genepanel_id__in=panels.order_by().values("panel_id")
             )
+            .order_by("pk")
+            .values_list("genepanel_id", "paneltype__name")
+        ):
+            types[panel_id].append(name)
+        return types
 
     def get(self, request, *args, **kwargs):
         pseudo_buffer = EchoWriter()
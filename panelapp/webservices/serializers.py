@@ -33,6 +33,15 @@ from .utils import convert_gel_status
 
 class EnsembleIdMixin:
     def get_ensemblId(self, gene):
+        return self.get_ensembl_ids(gene.gene)
+
+    def get_assembly(self):
+        """Assembly and Ensembl version requested, GRch37 by default
+
+        :return: (assembly, version) tuple
+        :raises NotAcceptedValue: unknown assembly
+        """
+
         query_prams = self.context["request"].query_params
         assembly = "GRch37"
         version = "82"
@@ -47,29 +56,33 @@ class EnsembleIdMixin:
                 raise NotAcceptedValue(
                     detail="Unaccepted value for assembly, please use: GRch37 or GRch38"
                 )
+        return assembly, version
+
+    def get_ensembl_ids(self, gene_data):
+        assembly, version = self.get_assembly()
 
         ensemblId = None
-        if gene.gene:
-            if assembly == "GRch38" and gene.gene.get("ensembl_genes"):
+        if gene_data:
+            if assembly == "GRch38" and gene_data.get("ensembl_genes"):
                 ensemblId = (
-                    gene.gene.get("ensembl_genes", {})
+                    gene_data.get("ensembl_genes", {})
                     .get(assembly, {})
                     .get(version, {})
                     .get("ensembl_id", None)
                 )
             elif assembly == "GRch37":
-                if gene.gene.get("ensembl_genes"):
+                if gene_data.get("ensembl_genes"):
                     ensemblId = (
-                        gene.gene.get("ensembl_genes", {})
+                        gene_data.get("ensembl_genes", {})
                         .get(assembly, {})
                         .get(version, {})
                         .get("ensembl_id", None)
                     )
                 elif (
-                    gene.gene.get("other_transcripts")
-                    and len(gene.gene.get("other_transcripts")) > 0
+                    gene_data.get("other_transcripts")
+                    and len(gene_data.get("other_transcripts")) > 0
                 ):
-                    ensemblId = gene.gene.get("other_transcripts", [{}])[0].get(
+                    ensemblId = gene_data.get("other_transcripts", [{}])[0].get(
                         "geneid", None
                     )
 
@@ -276,6 +289,36 @@ class GenesSerializer(EnsembleIdMixin, serializers.BaseSerializer):
         pass
 
 
+class GeneResultSerializer(EnsembleIdMixin, serializers.BaseSerializer):
+    """Gene search result from the entry and panel values"""
+
+    def update(self, instance, validated_data):
+        pass
+
+    def to_representation(self, gene, panel):
+        return {
+            "GeneSymbol": gene["gene"].get("gene_symbol"),
+            "EnsembleGeneIds": self.get_ensembl_ids(gene["gene"]),
+            "ModeOfInheritance": make_null(convert_moi(gene["moi"])),
+            "Penetrance": make_null(gene["penetrance"]),
+            "Publications": make_null(gene["publications"]),
+            "Phenotypes": make_null(gene["phenotypes"]),
+            "ModeOfPathogenicity": make_null(gene["mode_of_pathogenicity"]),
+            "LevelOfConfidence": convert_gel_status(gene["saved_gel_status"]),
+            "version": panel["version"],
+            "SpecificDiseaseName": panel["name"],
+            "DiseaseGroup": panel["level2title"],
+            "DiseaseSubGroup": panel["level3title"],
+            "Evidences": [name for name in gene["evidences"] if name],
+        }
+
+    def create(self, validated_data):
+        pass
+
+    def to_internal_value(self, data):
+        pass
+
+
 class ListPanelSerializer(serializers.BaseSerializer):
     def to_representation(self, array_of_panels):
         result = {"result": []}
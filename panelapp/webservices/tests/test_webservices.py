@@ -21,16 +21,22 @@
 ## specific language governing permissions and limitations
 ## under the License.
 ##
+import json
+from django.db import connection
 from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse_lazy
 from panels.models import GenePanel
+from panels.models import GenePanelEntrySnapshot
 from panels.models import PanelType
 from panels.tests.factories import GenePanelSnapshotFactory
 from panels.tests.factories import GenePanelEntrySnapshotFactory
 from panels.tests.factories import STRFactory
 from panels.tests.factories import RegionFactory
 from panels.tests.factories import PanelTypeFactory
+from webservices.utils import convert_moi
 from webservices.utils import convert_mop
+from webservices.utils import get_stored_values
 
 
 class TestWebservices(TransactionTestCase):
@@ -180,10 +186,30 @@ class TestWebservices(TransactionTestCase):
         self.assertEqual(r.status_code, 200)
 
     def test_get_panel_by_old_pk(self):
-        r = self.client.get(reverse_lazy("webservices:get_panel", args=(self.gpes.panel.panel.old_pk,)))
+        r = self.client.get(
+            reverse_lazy("webservices:get_panel", args=(self.gpes.panel.panel.old_pk,))
+        )
         self.assertEqual(r.status_code, 200)
         self.assertTrue(b"Query Error" not in r.content)
 
+    def test_get_panel_ranked_by_name(self):
+        self.gps.panel.name = "Dilated cardiomyopathy"
+        self.gps.panel.save()
+        self.gps_public.panel.name = "Cardiomyopathy"
+        self.gps_public.panel.save()
+
+        r = self.client.get(
+            reverse_lazy("webservices:get_panel", args=("cardiomyopathy",))
+        )
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(
+            r.json()["result"]["Genes"][0]["GeneSymbol"],
+            self.gpes.gene.get("gene_symbol"),
+        )
+
+        r = self.client.get(reverse_lazy("webservices:get_panel", args=("dilated",)))
+        self.assertEqual(len(r.json()["result"]["Genes"]), 4)
+
     def test_get_panel_version(self):
         self.gpes.panel.increment_version()
         del self.gpes.panel.panel.active_panel
@@ -265,6 +291,72 @@ class TestWebservices(TransactionTestCase):
         r = self.client.get(multi_genes_url)
         self.assertEqual(r.status_code, 200)
 
+    def test_search_by_gene_ndjson(self):
+        super_panel = GenePanelSnapshotFactory(panel__status=GenePanel.STATUS.public)
+        super_panel.child_panels.set([self.gps_public])
+        GenePanelEntrySnapshotFactory.create_batch(5, panel=self.gps_public)
+
+        url = reverse_lazy("webservices:search_genes", args=("all",))
+        results = self.client.get(url).json()["results"]
+
+        with CaptureQueriesContext(connection) as ctx:
+            r = self.client.get("{}?format=ndjson".format(url))
+            lines = b"".join(r.streaming_content).decode().splitlines()
+        self.assertEqual(r["Content-Type"], "application/x-ndjson")
+        self.assertEqual(len(ctx.captured_queries), 7)
+
+        def normalize(result):
+            return json.dumps(
+                dict(result, Evidences=sorted(result["Evidences"])), sort_keys=True
+            )
+
+        self.assertEqual(len(lines), 16)
+        self.assertEqual(
+            sorted(normalize(json.loads(line)) for line in lines),
+            sorted(normalize(result) for result in results),
+        )
+
+    def test_get_panel_filters(self):
+        GenePanelEntrySnapshot.objects.filter(panel=self.gps).update(
+            saved_gel_status=1, moi="BIALLELIC, autosomal or pseudoautosomal"
+        )
+        gene = self.genes[0]
+        GenePanelEntrySnapshot.objects.filter(pk=gene.pk).update(saved_gel_status=3)
+        url = reverse_lazy("webservices:get_panel", args=(self.gps.panel.pk,))
+
+        r = self.client.get(
+            "{}?LevelOfConfidence=HighEvidence&ModeOfInheritance=biallelic".format(url)
+        )
+        self.assertEqual(
+            [g["GeneSymbol"] for g in r.json()["result"]["Genes"]],
+            [gene.gene_core.gene_symbol],
+        )
+
+        r = self.client.get("{}?ModeOfInheritance=monoallelic".format(url))
+        self.assertEqual(r.json()["result"]["Genes"], [])
+
+        r = self.client.get("{}?LevelOfConfidence=LowEvidence".format(url))
+        self.assertEqual(len(r.json()["result"]["Genes"]), 3)
+
+    def test_get_panel_number_of_queries(self):
+        url = "{}?LevelOfConfidence=LowEvidence,NoList".format(
+            reverse_lazy("webservices:get_panel", args=(self.gps.panel.pk,))
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        GenePanelEntrySnapshotFactory.create_batch(4, panel=self.gps)
+        with self.assertNumQueries(len(queries)):
+            r = self.client.get(url)
+        self.assertEqual(len(r.json()["result"]["Genes"]), 8)
+
+    def test_get_stored_values(self):
+        self.assertEqual(
+            sorted(get_stored_values(convert_moi, ["unknown"])), ["Unknown", "unknown"]
+        )
+        self.assertEqual(get_stored_values(convert_moi, ["Unknown"]), [])
+        self.assertEqual(get_stored_values(convert_moi, ["other"]), ["other"])
+
     def test_strs_in_panel(self):
         r = self.client.get(
             reverse_lazy("webservices:get_panel", args=(self.str.panel.panel.pk,))
@@ -405,3 +497,23 @@ class TestWebservices(TransactionTestCase):
         self.assertEqual(
             len([r for r in res["results"] if r["EntityType"] == "region"]), 2
         )
+
+    def test_list_entities_filters(self):
+        self.gpes.saved_gel_status = 3
+        self.gpes.save()
+
+        url = reverse_lazy("webservices:list_entities")
+        with CaptureQueriesContext(connection) as ctx:
+            r = self.client.get("{}?LevelOfConfidence=HighEvidence".format(url))
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(
+            [e["GeneSymbol"] for e in r.json()["results"]],
+            [self.gpes.gene.get("gene_symbol")],
+        )
+        self.assertEqual(len(ctx.captured_queries), 9)
+
+        r = self.client.get("{}?panel_name={}".format(url, self.gps.panel.name))
+        self.assertEqual(
+            sorted(e["GeneSymbol"] for e in r.json()["results"]),
+            sorted(gene.gene.get("gene_symbol") for gene in self.genes),
+        )
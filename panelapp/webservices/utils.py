@@ -103,6 +103,19 @@ def convert_evidences(evidence, back=False):
     return evidence
 
 
+def get_stored_values(convert, values):
+    """Reverse one of the convert functions
+
+    :param convert: convert function, i.e. `convert_moi`
+    :param values: list of converted values
+    :return: list of the values in the database which are converted to one of
+        the `values`
+    """
+
+    candidates = set(values).union(convert(value, True) for value in values)
+    return [value for value in candidates if convert(value) in values]
+
+
 def convert_gel_status(gel_status):
     if gel_status > 2:
         return "HighEvidence"
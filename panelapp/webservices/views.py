@@ -21,11 +21,15 @@
 ## specific language governing permissions and limitations
 ## under the License.
 ##
+import json
+from collections import defaultdict
 from django.conf import settings
-from django.db import DatabaseError
+from django.contrib.postgres.aggregates import ArrayAgg
 from django.db.models import Q
-from django.utils.functional import cached_property
+from django.http import StreamingHttpResponse
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import renderer_classes
+from rest_framework.settings import api_settings
 from rest_framework.response import Response
 from rest_framework import permissions
 from rest_framework import pagination
@@ -33,8 +37,9 @@ from rest_framework import generics
 from .utils import convert_moi
 from .utils import convert_mop
 from .utils import convert_evidences
-from .utils import convert_gel_status
 from .utils import convert_confidence_level
+from .utils import get_stored_values
+from .renderers import NDJSONRenderer
 
 from panels.models import GenePanel
 from panels.models import GenePanelSnapshot
@@ -42,14 +47,37 @@ from panels.models import GenePanelEntrySnapshot
 from panels.models import STR
 from panels.models import Region
 from panels.models import HistoricalSnapshot
+from panels.models import EntitySearchEntry
 from .serializers import PanelSerializer
 from .serializers import GenesSerializer
+from .serializers import GeneResultSerializer
 from .serializers import EntitySerializer
 from .serializers import ListPanelSerializer
 
 
-def filter_entity_list(
-    entity_list,
+def get_confidence_level_filter(conf_level):
+    """Reverse of `convert_gel_status`
+
+    :param conf_level: list of confidence levels, i.e. HighEvidence
+    :return: Q object
+    """
+
+    levels = {
+        "HighEvidence": Q(saved_gel_status__gt=2),
+        "ModerateEvidence": Q(saved_gel_status=2),
+        "LowEvidence": Q(saved_gel_status__lt=2) & ~Q(saved_gel_status=0),
+        "NoList": Q(saved_gel_status=0),
+    }
+
+    query = Q(pk__in=[])
+    for level in conf_level:
+        if level in levels:
+            query |= levels[level]
+    return query
+
+
+def get_entity_filters(
+    model,
     moi=None,
     mop=None,
     penetrance=None,
@@ -58,47 +86,142 @@ def filter_entity_list(
     haploinsufficiency_score=None,
     triplosensitivity_score=None,
 ):
-    final_list = []
-    for entity in entity_list:
-        filters = True
-        if entity.moi is not None and (
-            moi is not None and convert_moi(entity.moi) not in moi
-        ):
-            filters = False
-
-        if entity.mode_of_pathogenicity is not None and (
-            mop is not None and convert_mop(entity.mode_of_pathogenicity) not in mop
-        ):
-            filters = False
-        if entity.penetrance is not None and (
-            penetrance is not None and entity.penetrance not in penetrance
-        ):
-            filters = False
-        if (
-            conf_level is not None
-            and convert_gel_status(entity.saved_gel_status) not in conf_level
-        ):
-            filters = False
-        if evidence is not None and not set(
-            [ev.name for ev in entity.evidence.all]
-        ).intersection(set(evidence)):
-            filters = False
-
-        if entity.is_region():
-            if (
-                haploinsufficiency_score
-                and entity.haploinsufficiency_score not in haploinsufficiency_score
-            ):
-                filters = False
-            if (
-                triplosensitivity_score
-                and entity.triplosensitivity_score not in triplosensitivity_score
-            ):
-                filters = False
-
-        if filters:
-            final_list.append(entity)
-    return final_list
+    """Translate v0 filters into a query for the entities
+
+    Values which can be empty in the database match any filter value.
+
+    :param model: GenePanelEntrySnapshot, STR or Region
+    :return: Q object
+    """
+
+    query = Q()
+    if moi is not None:
+        query &= Q(moi__isnull=True) | Q(moi__in=get_stored_values(convert_moi, moi))
+    if mop is not None:
+        query &= Q(mode_of_pathogenicity__isnull=True) | Q(
+            mode_of_pathogenicity__in=get_stored_values(convert_mop, mop)
+        )
+    if penetrance is not None:
+        query &= Q(penetrance__isnull=True) | Q(penetrance__in=penetrance)
+    if conf_level is not None:
+        query &= get_confidence_level_filter(conf_level)
+    if evidence is not None:
+        query &= Q(
+            pk__in=model.objects.filter(evidence__name__in=evidence).values("pk")
+        )
+
+    if model is Region:
+        if haploinsufficiency_score:
+            query &= Q(haploinsufficiency_score__in=haploinsufficiency_score)
+        if triplosensitivity_score:
+            query &= Q(triplosensitivity_score__in=triplosensitivity_score)
+
+    return query
+
+
+def get_panel_entities(panel, **filters):
+    """Genes, STRs and regions of the panel which match the filters
+
+    Entities of each type are read in one query with the evidences prefetched,
+    so the number of queries doesn't depend on the panel size.
+
+    :param panel: GenePanelSnapshot instance
+    :param filters: v0 filters, see `get_entity_filters`
+    :return: tuple with genes, STRs and regions querysets
+    """
+
+    # super panels don't have own entities, only the child panels do
+    panel_ids = [panel.pk] + list(panel.child_panels.values_list("pk", flat=True))
+
+    return tuple(
+        model.objects.filter(panel_id__in=panel_ids)
+        .filter(get_entity_filters(model, **filters))
+        .prefetch_related("evidence")
+        .order_by("-saved_gel_status", entity_name)
+        for model, entity_name in (
+            (GenePanelEntrySnapshot, "gene_core__gene_symbol"),
+            (STR, "name"),
+            (Region, "name"),
+        )
+    )
+
+
+def get_gene_results(serializer, panels, *args, chunk_size=2000, **filters):
+    """Gene search results streamed from the database
+
+    Genes are read in chunks with a server side cursor and their evidences
+    are aggregated in the same query. Results for the super panels follow
+    the result for the child panel.
+
+    :param serializer: GeneResultSerializer instance
+    :param panels: active GenePanelSnapshot queryset
+    :param args: Q objects to filter the genes
+    :param chunk_size: number of genes fetched at once
+    :param filters: field lookups to filter the genes
+    :return: generator with the results
+    """
+
+    panels_dict = {
+        panel.pk: {
+            "version": panel.version,
+            "name": panel.level4title.name,
+            "level2title": panel.level4title.level2title,
+            "level3title": panel.level4title.level3title,
+        }
+        for panel in panels
+    }
+
+    # the same child panel can be linked in multiple super panel versions,
+    # only the latest version of each super panel is included
+    super_panels = defaultdict(list)
+    for parent in (
+        GenePanelSnapshot.objects.filter(
+            child_panels__in=[panel.pk for panel in panels if panel.is_child_panel]
+        )
+        .order_by("child_panels__pk", "panel_id", "-major_version", "-minor_version")
+        .distinct("child_panels__pk", "panel_id")
+        .values(
+            "child_panels",
+            "major_version",
+            "minor_version",
+            "level4title__name",
+            "level4title__level2title",
+            "level4title__level3title",
+        )
+    ):
+        super_panels[parent["child_panels"]].append(
+            {
+                "version": "{}.{}".format(
+                    parent["major_version"], parent["minor_version"]
+                ),
+                "name": parent["level4title__name"],
+                "level2title": parent["level4title__level2title"],
+                "level3title": parent["level4title__level3title"],
+            }
+        )
+
+    genes = (
+        GenePanelEntrySnapshot.objects.filter(panel_id__in=list(panels_dict))
+        .filter(*args, **filters)
+        .annotate(evidences=ArrayAgg("evidence__name"))
+        .order_by("panel_id", "pk")
+        .values(
+            "panel_id",
+            "gene",
+            "moi",
+            "penetrance",
+            "publications",
+            "phenotypes",
+            "mode_of_pathogenicity",
+            "saved_gel_status",
+            "evidences",
+        )
+    )
+
+    for gene in genes.iterator(chunk_size=chunk_size):
+        yield serializer.to_representation(gene, panels_dict[gene["panel_id"]])
+        for parent in super_panels[gene["panel_id"]]:
+            yield serializer.to_representation(gene, parent)
 
 
 @api_view(["GET"])
@@ -164,44 +287,12 @@ def get_panel(request, panel_name):
             json = snap.to_api_0()
             return Response(json)
     else:
-        queryset = GenePanelSnapshot.objects.get_active()
-
-        queryset_name_exact = queryset.filter(panel__name=panel_name)
-        if not queryset_name_exact:
-            queryset_name = queryset.filter(panel__name__icontains=panel_name)
-            if not queryset_name:
-                queryset_old_names = queryset_name.filter(
-                    old_panels__icontains=panel_name
-                )
-                if not queryset_old_names:
-                    try:
-                        try:
-                            int(panel_name)
-                            queryset_pk = queryset.filter(panel__pk=panel_name)
-                        except ValueError:
-                            queryset_pk = queryset.filter(panel__old_pk=panel_name)
-
-                        if not queryset_pk:
-                            return Response(
-                                {"Query Error: " + panel_name + " not found."}
-                            )
-                        else:
-                            queryset = queryset_pk
-                    except (DatabaseError, ValueError) as e:
-                        return Response({"Query Error: " + panel_name + " not found."})
-                else:
-                    queryset = queryset_old_names
-            else:
-                queryset = queryset_name
-        else:
-            queryset = queryset_name_exact
-
-    instance = queryset.first()
+        instance = GenePanelSnapshot.objects.get_active(name=panel_name).first()
+        if not instance:
+            return Response({"Query Error: " + panel_name + " not found."})
 
     serializer = PanelSerializer(
-        filter_entity_list(instance.get_all_genes_extra, **filters),
-        filter_entity_list(instance.get_all_strs_extra, **filters),
-        filter_entity_list(instance.get_all_regions_extra, **filters),
+        *get_panel_entities(instance, **filters),
         instance=instance,
         context={"request": request},
     )
@@ -233,11 +324,12 @@ def list_panels(request):
 
 
 @api_view(["GET"])
+@renderer_classes(api_settings.DEFAULT_RENDERER_CLASSES + [NDJSONRenderer])
 @permission_classes((permissions.AllowAny,))
 def search_by_gene(request, gene):
     queryset = None
     filters = {}
-    post_filters = {}
+    conf_level_filter = Q()
     data = {"meta": {}, "results": []}
 
     genes_qs = None
@@ -263,13 +355,17 @@ def search_by_gene(request, gene):
     if "Penetrance" in request.GET:
         filters["penetrance__in"] = request.GET["Penetrance"].split(",")
     if "LevelOfConfidence" in request.GET:
-        post_filters["conf_level"] = request.GET["LevelOfConfidence"].split(",")
+        conf_level_filter = get_confidence_level_filter(
+            request.GET["LevelOfConfidence"].split(",")
+        )
     if "Evidences" in request.GET:
-        filters["evidence__name__in"] = [
-            convert_evidences(x, True)
-            for x in request.GET["Evidences"].split(",")
-            if convert_evidences(x, True)
-        ]
+        filters["pk__in"] = GenePanelEntrySnapshot.objects.filter(
+            evidence__name__in=[
+                convert_evidences(x, True)
+                for x in request.GET["Evidences"].split(",")
+                if convert_evidences(x, True)
+            ]
+        ).values("pk")
     if "panel_name" in request.GET:
         panel_names = request.GET["panel_name"].split(",")
     else:
@@ -282,18 +378,30 @@ def search_by_gene(request, gene):
     else:
         all_panels = GenePanelSnapshot.objects.get_active_annotated()
 
+    if genes_qs:
+        conf_level_filter &= genes_qs
+
+    if request.accepted_renderer.format == "ndjson":
+        serializer = GeneResultSerializer(context={"request": request})
+        # check the assembly before the response starts
+        serializer.get_assembly()
+        results = get_gene_results(
+            serializer, all_panels, conf_level_filter, **filters
+        )
+        return StreamingHttpResponse(
+            (json.dumps(result) + "\n" for result in results),
+            content_type=NDJSONRenderer.media_type,
+        )
+
     panels_ids_dict = {panel.panel.pk: (panel.panel.pk, panel) for panel in all_panels}
     filters.update({"panel__panel__pk__in": list(panels_ids_dict.keys())})
     active_genes = GenePanelEntrySnapshot.objects.get_active(
         pks=[s.pk for s in all_panels]
     )
-    genes = active_genes.filter(**filters)
-
-    if genes_qs:
-        genes = genes.filter(genes_qs)
+    genes = active_genes.filter(conf_level_filter, **filters)
 
     serializer = GenesSerializer(
-        filter_entity_list(genes, **post_filters),
+        genes,
         instance=queryset,
         context={"request": request},
     )
@@ -312,24 +420,9 @@ class EntitiesListView(generics.ListAPIView):
     serializer_class = EntitySerializer
     pagination_class = EntitiesPagination
 
-    @cached_property
-    def snapshot_ids(self):
-        if self.request.query_params.get("panel_name"):
-            panel_names = self.request.query_params.get("panel_name").split(",")
-        else:
-            panel_names = None
-
-        if panel_names:
-            all_panels = GenePanelSnapshot.objects.get_active_annotated().filter(
-                panel__name__in=panel_names
-            )
-        else:
-            all_panels = GenePanelSnapshot.objects.get_active_annotated()
-
-        return [s.pk for s in all_panels]
-
     def get_queryset(self):
         filters = {}
+        panel_names = self.request.query_params.get("panel_name")
 
         if self.request.query_params.get("entity_name"):
             filters["entity_name__in"] = self.request.query_params.get(
@@ -363,47 +456,26 @@ class EntitiesListView(generics.ListAPIView):
                 if level
             ]
         if self.request.query_params.get("Evidences"):
-            filters["evidence__name__in"] = [
+            filters["evidences__overlap"] = [
                 convert_evidences(x, True)
                 for x in self.request.query_params.get("Evidences").split(",")
                 if convert_evidences(x, True)
             ]
 
-        active_genes = GenePanelEntrySnapshot.objects.get_active_slim(
-            pks=self.snapshot_ids
-        )
-        genes = active_genes.filter(**filters)
-
-        active_strs = STR.objects.get_active_slim(pks=self.snapshot_ids)
-        strs = active_strs.filter(**filters)
-
-        active_regions = Region.objects.get_active_slim(pks=self.snapshot_ids)
-        regions = active_regions.filter(**filters)
-
         return (
-            strs.union(genes).union(regions).values("entity_name", "entity_type", "pk")
+            EntitySearchEntry.objects.get_active(
+                panel_names=panel_names.split(",") if panel_names else None
+            )
+            .filter(**filters)
+            .values("entity_type", "entity_id", "snapshot_id")
         )
 
     def list(self, request, *args, **kwargs):
-        # We can't union two queries as they have different fields which fail on PostgreSQL level, due to field types
-        # and count mismatch. Instead get the ids for a specific page, and then just get those values, create a joined
-        # list, push to serializer.
-
         queryset = self.filter_queryset(self.get_queryset())
 
         page = self.paginate_queryset(queryset)
-        genes = GenePanelEntrySnapshot.objects.get_active(pks=self.snapshot_ids).filter(
-            pk__in=[e.get("pk") for e in page if e.get("entity_type") == "gene"]
-        )
-        strs = STR.objects.get_active(pks=self.snapshot_ids).filter(
-            pk__in=[e.get("pk") for e in page if e.get("entity_type") == "str"]
-        )
-        regions = Region.objects.get_active(pks=self.snapshot_ids).filter(
-            pk__in=[e.get("pk") for e in page if e.get("entity_type") == "region"]
-        )
-        serializer = self.get_serializer(
-            list(strs) + list(genes) + list(regions), many=True
-        )
+        entities = EntitySearchEntry.objects.get_entities(page)
+        serializer = self.get_serializer(entities, many=True)
         return self.get_paginated_response(serializer.data)
 
 